@@ -19,7 +19,7 @@ from ase.atom import Atom
 from ase.data import atomic_numbers, chemical_symbols, atomic_masses
 from ase.utils import basestring
 from ase.geometry import (wrap_positions, find_mic, cellpar_to_cell,
-                          cell_to_cellpar)
+                          cell_to_cellpar, get_distances_within)
 
 
 class Atoms(object):
@@ -1448,11 +1448,26 @@ class Atoms(object):
             return D
         return D_len
 
-    def get_all_distances(self, mic=False):
+    def get_all_distances(self, mic=False, cutoff=None):
         """Return distances of all of the atoms with all of the atoms.
 
         Use mic=True to use the Minimum Image Convention.
+
+        If a cutoff is given, only distances shorter than the cutoff are
+        calculated and a symmetric scipy.sparse.csr_matrix is returned.
+        This scales linearly with the number of atoms.  See also
+        :func:`ase.geometry.get_distances_within`.
         """
+        if cutoff is not None:
+            from scipy.sparse import csr_matrix
+            pbc = self._pbc if mic else False
+            i, j, d = get_distances_within(self.arrays['positions'], cutoff,
+                                           self._cell, pbc)
+            L = len(self)
+            return csr_matrix((np.concatenate((d, d)),
+                               (np.concatenate((i, j)),
+                                np.concatenate((j, i)))), shape=(L, L))
+
         L = len(self)
         R = self.arrays['positions']
 
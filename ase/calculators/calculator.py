@@ -65,6 +65,9 @@ def equal(a, b, tol=None):
         if tol is None:
             return (a == b).all()
         else:
+            # Fast path for the common case of identical arrays:
+            if (a == b).all():
+                return True
             return np.allclose(a, b, rtol=tol, atol=tol)
     if isinstance(b, np.ndarray):
         return equal(b, a, tol)
@@ -425,6 +428,9 @@ class Calculator:
         else:
             return energy
 
+    def get_potential_energies(self, atoms=None):
+        return self.get_property('energies', atoms)
+
     def get_forces(self, atoms=None):
         return self.get_property('forces', atoms)
 
@@ -576,6 +582,78 @@ class Calculator:
         return BandStructure(calc=self)
 
 
+def prepare_batch(images, properties=['energy', 'forces']):
+    """Prepare calculators for calculating many systems in one go.
+
+    Calculators that can do that have a calculate_batch(images) method.
+    This function does for each Atoms object in images what
+    get_property() does before calling calculate().  Returns list of
+    (atoms, system_changes) tuples for the systems that need to be
+    calculated."""
+    todo = []
+    for atoms in images:
+        calc = atoms.calc
+        system_changes = calc.check_state(atoms)
+        if system_changes:
+            calc.reset()
+        elif all(name in calc.results for name in properties):
+            continue
+        Calculator.calculate(calc, atoms, properties, system_changes)
+        todo.append((atoms, system_changes))
+    return todo
+
+
+def store_batch(todo, energies, forces):
+    """Store per-atom energies and forces of concatenated systems.
+
+    todo is the list returned by prepare_batch()."""
+    a = 0
+    for atoms, system_changes in todo:
+        b = a + len(atoms)
+        results = atoms.calc.results
+        results['energies'] = energies[a:b]
+        results['energy'] = energies[a:b].sum()
+        results['forces'] = forces[a:b]
+        a = b
+
+
+def group_batches(images):
+    """Group systems that can be calculated together.
+
+    Systems with calculators of the same class and with the same
+    parameters can be calculated together with the calculate_batch()
+    method of their calculators.  Returns list of such batches (lists
+    of Atoms objects) and a list of the Atoms objects whose calculators
+    can not do that."""
+    batches = []
+    rest = []
+    for atoms in images:
+        calc = atoms.calc
+        if not hasattr(calc, 'calculate_batch'):
+            rest.append(atoms)
+            continue
+        for batch in batches:
+            other = batch[0].calc
+            if (other.__class__ is calc.__class__ and
+                equal(other.todict(), calc.todict())):
+                batch.append(atoms)
+                break
+        else:
+            batches.append([atoms])
+    return batches, rest
+
+
+def calculate_batches(images):
+    """Calculate energies and forces for many systems.
+
+    See group_batches().  Returns list of the Atoms objects that were
+    not calculated."""
+    batches, rest = group_batches(images)
+    for batch in batches:
+        batch[0].calc.calculate_batch(batch)
+    return rest
+
+
 class FileIOCalculator(Calculator):
     """Base class for calculators that write/read input/output files."""
 
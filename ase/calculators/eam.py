@@ -11,7 +11,8 @@ import os
 import numpy as np
 from ase.test import NotAvailable
 from ase.neighborlist import NeighborList
-from ase.calculators.calculator import Calculator, all_changes
+from ase.calculators.calculator import (Calculator, all_changes,
+                                         prepare_batch, store_batch)
 from scipy.interpolate import InterpolatedUnivariateSpline as spline
 from ase.units import Bohr, Hartree
 
@@ -573,6 +574,83 @@ End EAM Interface Documentation
 #        if 'potential' in parameter_changes and potential != None:
 #                self.read_potential(potential)
 
+    def calculate_batch(self, images):
+        """Calculate energies and forces of many systems in one go.
+
+        All the Atoms objects must have their own EAM calculator with
+        the same potential as this one.  The pairs of all the systems
+        are evaluated together for each pair of elements.  Systems with
+        the ADP form are calculated one at a time."""
+        todo = prepare_batch(images)
+        if not todo:
+            return
+        if self.form == 'adp':
+            for atoms, system_changes in todo:
+                atoms.calc.calculate(atoms, ['energy', 'forces'],
+                                     system_changes)
+            return
+
+        pairs = []
+        index = []
+        natoms = 0
+        for atoms, system_changes in todo:
+            calc = atoms.calc
+            calc.update(calc.atoms)
+            i, j, offsets, d = calc.neighbors.get_pairs(calc.atoms)
+            pairs.append((i + natoms, j + natoms, d))
+            index.append(calc.index)
+            natoms += len(atoms)
+        i, j, d = [np.concatenate(x) for x in zip(*pairs)]
+        index = np.concatenate(index)
+        r = np.sqrt((d**2).sum(1))
+        mask = r <= self.cutoff
+        i = i[mask]
+        j = j[mask]
+        d = d[mask]
+        r = r[mask]
+
+        # Pair potential, electron densities and their derivatives:
+        ti = index[i]
+        tj = index[j]
+        phi = np.zeros(len(r))
+        d_phi = np.zeros(len(r))
+        d_density_i = np.zeros(len(r))  # density of atom i's element
+        d_density_j = np.zeros(len(r))  # density of atom j's element
+        density = np.zeros(natoms)
+        for a in range(self.Nelements):
+            ia = ti == a
+            ja = tj == a
+            if ja.any():
+                density += np.bincount(i[ja],
+                                       self.electron_density[a](r[ja]),
+                                       natoms)
+                d_density_j[ja] = self.d_electron_density[a](r[ja])
+            if ia.any():
+                d_density_i[ia] = self.d_electron_density[a](r[ia])
+            for b in range(self.Nelements):
+                ab = ia & (tj == b)
+                if ab.any():
+                    phi[ab] = self.phi[a, b](r[ab])
+                    d_phi[ab] = self.d_phi[a, b](r[ab])
+
+        # Embedding energies:
+        energies = 0.5 * np.bincount(i, phi, natoms)
+        d_embedded_energy = np.zeros(natoms)
+        for a in range(self.Nelements):
+            ia = index == a
+            if ia.any():
+                energies[ia] += self.embedded_energy[a](density[ia])
+                d_embedded_energy[ia] = self.d_embedded_energy[a](
+                    density[ia])
+
+        scale = (d_phi + d_embedded_energy[i] * d_density_j +
+                 d_embedded_energy[j] * d_density_i)
+        f = (scale / r)[:, np.newaxis] * d
+        forces = np.zeros((natoms, 3))
+        for k in range(3):
+            forces[:, k] = np.bincount(i, f[:, k], natoms)
+        store_batch(todo, energies, forces)
+
     def calculate_energy(self, atoms):
         """Calculate the energy
         the energy is made up of the ionic or pair interaction and
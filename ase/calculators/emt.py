@@ -1,13 +1,15 @@
 """Effective medium theory potential."""
 
-from math import sqrt, exp, log
+from math import sqrt, exp
 
 import numpy as np
 
+from ase.atoms import Atoms
 from ase.data import chemical_symbols, atomic_numbers
 from ase.units import Bohr
 from ase.neighborlist import NeighborList
-from ase.calculators.calculator import Calculator, all_changes
+from ase.calculators.calculator import (Calculator, all_changes,
+                                         prepare_batch, store_batch)
 
 
 parameters = {
@@ -47,7 +49,7 @@ class EMT(Calculator):
     table.  False gives the behaviour of the Asap code and
     older EMT implementations.
     """
-    implemented_properties = ['energy', 'forces']
+    implemented_properties = ['energy', 'energies', 'forces']
 
     nolabel = True
 
@@ -101,13 +103,23 @@ class EMT(Calculator):
             self.ksi[s1] = {}
             for s2, p2 in self.par.items():
                 self.ksi[s1][s2] = p2['n0'] / p1['n0']
-                
-        self.forces = np.empty((len(atoms), 3))
-        self.sigma1 = np.empty(len(atoms))
-        self.deds = np.empty(len(atoms))
-                    
+
+        # Per-element and per-element-pair parameter tables.  Element
+        # number t of the tables is self.elements[t]:
+        self.elements = sorted(self.par)
+        self.types = np.searchsorted(self.elements, self.numbers)
+        pars = [self.par[Z] for Z in self.elements]
+        for name in ['E0', 's0', 'V0', 'eta2', 'kappa', 'lambda',
+                     'gamma1', 'gamma2']:
+            setattr(self, name.replace('lambda', 'lam'),
+                    np.array([p[name] for p in pars]))
+        ksi = np.array([[self.ksi[Z1][Z2] for Z2 in self.elements]
+                        for Z1 in self.elements])
+        self.chi1 = ksi / self.gamma1[:, np.newaxis]
+        self.chi2 = 0.5 * (self.V0 / self.gamma2)[:, np.newaxis] * ksi
+
         self.nl = NeighborList([0.5 * self.rc + 0.25] * len(atoms),
-                               self_interaction=False)
+                               self_interaction=False, incremental=True)
 
     def calculate(self, atoms=None, properties=['energy'],
                   system_changes=all_changes):
@@ -116,90 +128,119 @@ class EMT(Calculator):
         if 'numbers' in system_changes:
             self.initialize(self.atoms)
 
-        positions = self.atoms.positions
-        numbers = self.atoms.numbers
-        cell = self.atoms.cell
-        
-        self.nl.update(self.atoms)
-        
-        self.energy = 0.0
-        self.sigma1[:] = 0.0
-        self.forces[:] = 0.0
-
-        natoms = len(self.atoms)
-
-        for a1 in range(natoms):
-            Z1 = numbers[a1]
-            p1 = self.par[Z1]
-            ksi = self.ksi[Z1]
-            neighbors, offsets = self.nl.get_neighbors(a1)
-            offsets = np.dot(offsets, cell)
-            for a2, offset in zip(neighbors, offsets):
-                d = positions[a2] + offset - positions[a1]
-                r = sqrt(np.dot(d, d))
-                if r < self.rc + 0.5:
-                    Z2 = numbers[a2]
-                    p2 = self.par[Z2]
-                    self.interact1(a1, a2, d, r, p1, p2, ksi[Z2])
-                                
-        for a in range(natoms):
-            Z = numbers[a]
-            p = self.par[Z]
-            try:
-                ds = -log(self.sigma1[a] / 12) / (beta * p['eta2'])
-            except (OverflowError, ValueError):
-                self.deds[a] = 0.0
-                self.energy -= p['E0']
-                continue
-            x = p['lambda'] * ds
-            y = exp(-x)
-            z = 6 * p['V0'] * exp(-p['kappa'] * ds)
-            self.deds[a] = ((x * y * p['E0'] * p['lambda'] + p['kappa'] * z) /
-                            (self.sigma1[a] * beta * p['eta2']))
-            self.energy += p['E0'] * ((1 + x) * y - 1) + z
-
-        for a1 in range(natoms):
-            Z1 = numbers[a1]
-            p1 = self.par[Z1]
-            ksi = self.ksi[Z1]
-            neighbors, offsets = self.nl.get_neighbors(a1)
-            offsets = np.dot(offsets, cell)
-            for a2, offset in zip(neighbors, offsets):
-                d = positions[a2] + offset - positions[a1]
-                r = sqrt(np.dot(d, d))
-                if r < self.rc + 0.5:
-                    Z2 = numbers[a2]
-                    p2 = self.par[Z2]
-                    self.interact2(a1, a2, d, r, p1, p2, ksi[Z2])
+        a1, a2, d = self.get_pairs()
+        energies, forces = self.evaluate(self.types, a1, a2, d)
 
+        self.energy = energies.sum()
         self.results['energy'] = self.energy
-        self.results['forces'] = self.forces
-
-    def interact1(self, a1, a2, d, r, p1, p2, ksi):
-        x = exp(self.acut * (r - self.rc))
-        theta = 1.0 / (1.0 + x)
-        y1 = (0.5 * p1['V0'] * exp(-p2['kappa'] * (r / beta - p2['s0'])) *
-              ksi / p1['gamma2'] * theta)
-        y2 = (0.5 * p2['V0'] * exp(-p1['kappa'] * (r / beta - p1['s0'])) /
-              ksi / p2['gamma2'] * theta)
-        self.energy -= y1 + y2
-        f = ((y1 * p2['kappa'] + y2 * p1['kappa']) / beta +
-             (y1 + y2) * self.acut * theta * x) * d / r
-        self.forces[a1] += f
-        self.forces[a2] -= f
-        self.sigma1[a1] += (exp(-p2['eta2'] * (r - beta * p2['s0'])) *
-                            ksi * theta / p1['gamma1'])
-        self.sigma1[a2] += (exp(-p1['eta2'] * (r - beta * p1['s0'])) /
-                            ksi * theta / p2['gamma1'])
-
-    def interact2(self, a1, a2, d, r, p1, p2, ksi):
-        x = exp(self.acut * (r - self.rc))
+        self.results['energies'] = energies
+        self.results['forces'] = forces
+
+    def calculate_batch(self, images):
+        """Calculate energies and forces of many systems in one go.
+
+        All the Atoms objects must have their own EMT calculator.  The
+        pairs of all the systems are evaluated together using parameter
+        tables for all the elements in the batch.  Systems with
+        fixed_cutoff=False are calculated one at a time, because their
+        cutoff depends on the elements present."""
+        todo = prepare_batch(images)
+        batch = []
+        for atoms, system_changes in todo:
+            if atoms.calc.fixed_cutoff:
+                batch.append((atoms, system_changes))
+            else:
+                atoms.calc.calculate(atoms, ['energy', 'forces'],
+                                     system_changes)
+        if not batch:
+            return
+
+        numbers = np.unique(np.concatenate([atoms.numbers
+                                            for atoms, changes in batch]))
+        table = EMT()
+        table.initialize(Atoms(numbers=numbers))
+
+        pairs = []
+        types = []
+        natoms = 0
+        for atoms, system_changes in batch:
+            calc = atoms.calc
+            if 'numbers' in system_changes:
+                calc.initialize(calc.atoms)
+            a1, a2, d = calc.get_pairs()
+            pairs.append((a1 + natoms, a2 + natoms, d))
+            types.append(np.searchsorted(table.elements, atoms.numbers))
+            natoms += len(atoms)
+        a1, a2, d = [np.concatenate(x) for x in zip(*pairs)]
+        energies, forces = table.evaluate(np.concatenate(types), a1, a2, d)
+        store_batch(batch, energies, forces)
+
+    def get_pairs(self):
+        """Update neighbor list and return pairs inside the cutoff."""
+        self.nl.update(self.atoms)
+        a1, a2, offsets, d = self.nl.get_pairs(self.atoms)
+        r = np.sqrt((d**2).sum(1))
+        mask = r < self.rc + 0.5
+        return a1[mask], a2[mask], d[mask]
+
+    def evaluate(self, types, a1, a2, d):
+        """Calculate energies of and forces on atoms.
+
+        types: ndarray
+            Element number in the parameter tables for each atom.
+        a1, a2, d: ndarrays
+            Pairs of atoms and their distance vectors."""
+        natoms = len(types)
+        r = np.sqrt((d**2).sum(1))
+        t1 = types[a1]
+        t2 = types[a2]
+
+        x = np.exp(self.acut * (r - self.rc))
         theta = 1.0 / (1.0 + x)
-        y1 = (exp(-p2['eta2'] * (r - beta * p2['s0'])) *
-              ksi / p1['gamma1'] * theta * self.deds[a1])
-        y2 = (exp(-p1['eta2'] * (r - beta * p1['s0'])) /
-              ksi / p2['gamma1'] * theta * self.deds[a2])
-        f = ((y1 * p2['eta2'] + y2 * p1['eta2']) +
-             (y1 + y2) * self.acut * theta * x) * d / r
-        self.forces[a1] -= f
-        self.forces[a2] += f
+
+        # Contributions to sigma1 of atom 1 from atom 2 and vice versa:
+        s12 = (np.exp(-self.eta2[t2] * (r - beta * self.s0[t2])) *
+               self.chi1[t1, t2] * theta)
+        s21 = (np.exp(-self.eta2[t1] * (r - beta * self.s0[t1])) *
+               self.chi1[t2, t1] * theta)
+        sigma1 = np.zeros(natoms)
+        sigma1 += np.bincount(a1, s12, natoms)
+        sigma1 += np.bincount(a2, s21, natoms)
+
+        # Pair-potential correction:
+        y1 = (self.chi2[t1, t2] * theta *
+              np.exp(-self.kappa[t2] * (r / beta - self.s0[t2])))
+        y2 = (self.chi2[t2, t1] * theta *
+              np.exp(-self.kappa[t1] * (r / beta - self.s0[t1])))
+        energies = np.zeros(natoms)
+        energies -= np.bincount(a1, y1, natoms)
+        energies -= np.bincount(a2, y2, natoms)
+        f = ((y1 * self.kappa[t2] + y2 * self.kappa[t1]) / beta +
+             (y1 + y2) * self.acut * theta * x)
+
+        # Cohesive function:
+        t = types
+        E0 = self.E0[t]
+        deds = np.zeros(natoms)
+        ok = sigma1 > 0.0
+        energies[~ok] -= E0[~ok]
+        t = t[ok]
+        ds = -np.log(sigma1[ok] / 12) / (beta * self.eta2[t])
+        x1 = self.lam[t] * ds
+        y = np.exp(-x1)
+        z = 6 * self.V0[t] * np.exp(-self.kappa[t] * ds)
+        deds[ok] = ((x1 * y * E0[ok] * self.lam[t] + self.kappa[t] * z) /
+                    (sigma1[ok] * beta * self.eta2[t]))
+        energies[ok] += E0[ok] * ((1 + x1) * y - 1) + z
+
+        # Forces from the pair-potential correction and from sigma1:
+        y1 = s12 * deds[a1]
+        y2 = s21 * deds[a2]
+        f -= ((y1 * self.eta2[t2] + y2 * self.eta2[t1]) +
+              (y1 + y2) * self.acut * theta * x)
+        f = (f / r)[:, np.newaxis] * d
+        forces = np.zeros((natoms, 3))
+        for k in range(3):
+            forces[:, k] = (np.bincount(a1, f[:, k], natoms) -
+                            np.bincount(a2, f[:, k], natoms))
+        return energies, forces
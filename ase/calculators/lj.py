@@ -3,11 +3,12 @@ from __future__ import division
 import numpy as np
 
 from ase.neighborlist import NeighborList
-from ase.calculators.calculator import Calculator, all_changes
+from ase.calculators.calculator import (Calculator, all_changes,
+                                         prepare_batch, store_batch)
 
 
 class LennardJones(Calculator):
-    implemented_properties = ['energy', 'forces', 'stress']
+    implemented_properties = ['energy', 'energies', 'forces', 'stress']
     default_parameters = {'epsilon': 1.0,
                           'sigma': 1.0,
                           'rc': None}
@@ -22,46 +23,78 @@ class LennardJones(Calculator):
         Calculator.calculate(self, atoms, properties, system_changes)
 
         natoms = len(self.atoms)
+        i, j, d = self.get_pairs(system_changes)
+        pairenergies, f, energies, forces = self.evaluate(natoms, i, j, d)
 
+        stress = np.dot(f.T, d)
+        stress += stress.T.copy()
+        stress *= -0.5 / self.atoms.get_volume()
+
+        self.results['energy'] = pairenergies.sum()
+        self.results['energies'] = energies
+        self.results['forces'] = forces
+        self.results['stress'] = stress.flat[[0, 4, 8, 5, 2, 1]]
+
+    def calculate_batch(self, images):
+        """Calculate energies and forces of many systems in one go.
+
+        All the Atoms objects must have their own LennardJones
+        calculator with the same parameters as this one.  The pairs of
+        all the systems are evaluated together."""
+        todo = prepare_batch(images)
+        if not todo:
+            return
+        pairs = []
+        natoms = 0
+        for atoms, system_changes in todo:
+            i, j, d = atoms.calc.get_pairs(system_changes)
+            pairs.append((i + natoms, j + natoms, d))
+            natoms += len(atoms)
+        i, j, d = [np.concatenate(x) for x in zip(*pairs)]
+        pairenergies, f, energies, forces = self.evaluate(natoms, i, j, d)
+        store_batch(todo, energies, forces)
+
+    def get_pairs(self, system_changes):
+        """Update neighbor list and return pairs inside the cutoff."""
+        natoms = len(self.atoms)
+        rc = self.parameters.rc
+        if rc is None:
+            rc = 3 * self.parameters.sigma
+
+        if 'numbers' in system_changes:
+            self.nl = NeighborList([rc / 2] * natoms, self_interaction=False,
+                                   incremental=True)
+
+        self.nl.update(self.atoms)
+
+        i, j, offsets, d = self.nl.get_pairs(self.atoms)
+        r2 = (d**2).sum(1)
+        mask = r2 <= rc**2
+        return i[mask], j[mask], d[mask]
+
+    def evaluate(self, natoms, i, j, d):
+        """Evaluate pair energies and pair forces.
+
+        Returns pair energies, pair forces, energies of the atoms and
+        forces on the atoms."""
         sigma = self.parameters.sigma
         epsilon = self.parameters.epsilon
         rc = self.parameters.rc
         if rc is None:
             rc = 3 * sigma
-        
-        if 'numbers' in system_changes:
-            self.nl = NeighborList([rc / 2] * natoms, self_interaction=False)
 
-        self.nl.update(self.atoms)
-        
-        positions = self.atoms.positions
-        cell = self.atoms.cell
-        
         e0 = 4 * epsilon * ((sigma / rc)**12 - (sigma / rc)**6)
-        
-        energy = 0.0
+
+        r2 = (d**2).sum(1)
+        c6 = (sigma**2 / r2)**3
+        c12 = c6**2
+        pairenergies = 4 * epsilon * (c12 - c6) - e0
+        f = (24 * epsilon * (2 * c12 - c6) / r2)[:, np.newaxis] * d
+
+        energies = 0.5 * (np.bincount(i, pairenergies, natoms) +
+                          np.bincount(j, pairenergies, natoms))
         forces = np.zeros((natoms, 3))
-        stress = np.zeros((3, 3))
-
-        for a1 in range(natoms):
-            neighbors, offsets = self.nl.get_neighbors(a1)
-            cells = np.dot(offsets, cell)
-            d = positions[neighbors] + cells - positions[a1]
-            r2 = (d**2).sum(1)
-            c6 = (sigma**2 / r2)**3
-            c6[r2 > rc**2] = 0.0
-            energy -= e0 * (c6 != 0.0).sum()
-            c12 = c6**2
-            energy += 4 * epsilon * (c12 - c6).sum()
-            f = (24 * epsilon * (2 * c12 - c6) / r2)[:, np.newaxis] * d
-            forces[a1] -= f.sum(axis=0)
-            for a2, f2 in zip(neighbors, f):
-                forces[a2] += f2
-            stress += np.dot(f.T, d)
-        
-        stress += stress.T.copy()
-        stress *= -0.5 / self.atoms.get_volume()
-        
-        self.results['energy'] = energy
-        self.results['forces'] = forces
-        self.results['stress'] = stress.flat[[0, 4, 8, 5, 2, 1]]
+        for k in range(3):
+            forces[:, k] = (np.bincount(j, f[:, k], natoms) -
+                            np.bincount(i, f[:, k], natoms))
+        return pairenergies, f, energies, forces
@@ -1,8 +1,7 @@
 import numpy as np
 
-from math import exp, sqrt
-
-from ase.calculators.calculator import Calculator
+from ase.calculators.calculator import (Calculator, prepare_batch,
+                                         store_batch)
 
 
 class MorsePotential(Calculator):
@@ -24,21 +23,51 @@ class MorsePotential(Calculator):
                   system_changes=['positions', 'numbers', 'cell',
                                   'pbc', 'charges', 'magmoms']):
         Calculator.calculate(self, atoms, properties, system_changes)
+        natoms = len(self.atoms)
+        i, j, d = self.get_pairs()
+        energies, forces = self.evaluate(natoms, i, j, d)
+        self.results['energy'] = energies.sum()
+        self.results['forces'] = forces
+
+    def calculate_batch(self, images):
+        """Calculate energies and forces of many systems in one go.
+
+        All the Atoms objects must have their own MorsePotential
+        calculator with the same parameters as this one.  The pairs of
+        all the systems are evaluated together."""
+        todo = prepare_batch(images)
+        if not todo:
+            return
+        pairs = []
+        natoms = 0
+        for atoms, system_changes in todo:
+            i, j, d = atoms.calc.get_pairs()
+            pairs.append((i + natoms, j + natoms, d))
+            natoms += len(atoms)
+        i, j, d = [np.concatenate(x) for x in zip(*pairs)]
+        energies, forces = self.evaluate(natoms, i, j, d)
+        store_batch(todo, energies, forces)
+
+    def get_pairs(self):
+        """All pairs of atoms (no periodic boundary conditions)."""
+        i, j = np.tril_indices(len(self.atoms), -1)
+        positions = self.atoms.positions
+        return i, j, positions[j] - positions[i]
+
+    def evaluate(self, natoms, i, j, d):
+        """Calculate energies of and forces on atoms from pairs."""
         epsilon = self.parameters.epsilon
         rho0 = self.parameters.rho0
         r0 = self.parameters.r0
-        positions = self.atoms.get_positions()
-        energy = 0.0
-        forces = np.zeros((len(self.atoms), 3))
         preF = 2 * epsilon * rho0 / r0
-        for i1, p1 in enumerate(positions):
-            for i2, p2 in enumerate(positions[:i1]):
-                diff = p2 - p1
-                r = sqrt(np.dot(diff, diff))
-                expf = exp(rho0 * (1.0 - r / r0))
-                energy += epsilon * expf * (expf - 2)
-                F = preF * expf * (expf - 1) * diff / r
-                forces[i1] -= F
-                forces[i2] += F
-        self.results['energy'] = energy
-        self.results['forces'] = forces
+        r = np.sqrt((d**2).sum(1))
+        expf = np.exp(rho0 * (1.0 - r / r0))
+        pairenergies = epsilon * expf * (expf - 2)
+        f = (preF * expf * (expf - 1) / r)[:, np.newaxis] * d
+        energies = 0.5 * (np.bincount(i, pairenergies, natoms) +
+                          np.bincount(j, pairenergies, natoms))
+        forces = np.zeros((natoms, 3))
+        for k in range(3):
+            forces[:, k] = (np.bincount(j, f[:, k], natoms) -
+                            np.bincount(i, f[:, k], natoms))
+        return energies, forces
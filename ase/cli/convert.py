@@ -0,0 +1,48 @@
+import sys
+from optparse import OptionParser
+
+from ase.io.convert import convert
+
+description = ('Convert files and directory trees to ASE trajectory files '
+               'using several processes.  Old pickle trajectory files are '
+               'kept as name.traj.old.')
+
+
+def main():
+    p = OptionParser(usage='%prog [options] file-or-dir [file-or-dir ...]',
+                     description=description)
+    add = p.add_option
+    add('-j', '--jobs', type=int, metavar='N',
+        help='Number of worker processes.  Default is number of CPUs.')
+    add('-o', '--output-directory', metavar='DIR',
+        help='Write .traj files to DIR.  Directory trees are recreated '
+        'below DIR.')
+    add('-p', '--pattern', default='*.traj',
+        help='Convert files matching PATTERN in directories.  '
+        'Default is "*.traj".')
+    add('-f', '--format',
+        help='Format of the files.  Default is to guess.')
+    add('-c', '--chunk-size', type=int, default=100, metavar='N',
+        help='Number of frames parsed by a worker at a time.')
+    add('--codecs', metavar='NAME=CODEC,...',
+        help='Compress arrays.  Example: '
+        '"--codecs=positions=delta+zlib,calculator.forces=float32+zlib".')
+    add('-q', '--quiet', action='store_true')
+
+    opts, args = p.parse_args()
+
+    if len(args) == 0:
+        p.error('Incorrect number of arguments')
+
+    codecs = None
+    if opts.codecs:
+        codecs = dict(codec.split('=', 1) for codec in opts.codecs.split(','))
+
+    if opts.quiet:
+        log = None
+    else:
+        log = sys.stdout
+
+    convert(args, outdir=opts.output_directory, pattern=opts.pattern,
+            format=opts.format, workers=opts.jobs,
+            chunksize=opts.chunk_size, codecs=codecs, log=log)
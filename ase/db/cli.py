@@ -78,6 +78,10 @@ def main(args=sys.argv[1:]):
     add('--cut', type=int, default=35, help='Cut keywords and key-value '
         'columns after CUT characters.  Use --cut=0 to disable cutting. '
         'Default is 35 characters')
+    add('--aggregate', metavar='function:key[:groupby]',
+        help='Calculate count, min, max or mean of key.  Example: '
+        '"--aggregate min:energy:formula" gives the lowest energy for '
+        'each formula.')
     add('-p', '--plot', metavar='[a,b:]x,y1,y2,...',
         help='Example: "-p x,y": plot y row against x row. Use '
         '"-p a:x,y" to make a plot for each value of a.')
@@ -91,6 +95,8 @@ def main(args=sys.argv[1:]):
     add('--analyse', action='store_true',
         help='Gathers statistics about tables and indices to help make '
         'better query planning choices.')
+    add('--covering-indices', action='store_true',
+        help='Create indices for fast selections on key-value pairs.')
     add('-j', '--json', action='store_true',
         help='Write json representation of selected row.')
     add('--unique', action='store_true',
@@ -139,6 +145,10 @@ def run(opts, args, verbosity):
     if opts.analyse:
         con.analyse()
         return
+
+    if opts.covering_indices:
+        con.create_covering_indices()
+        return
         
     if opts.add_from_file:
         filename = opts.add_from_file
@@ -157,6 +167,18 @@ def run(opts, args, verbosity):
         print('%s' % plural(n, 'row'))
         return
 
+    if opts.aggregate:
+        words = opts.aggregate.split(':')
+        function, key = words[:2]
+        groupby = words[2] if len(words) == 3 else None
+        result = con.aggregate(function, key, groupby, query)
+        if groupby is None:
+            print(result)
+        else:
+            for group in sorted(result):
+                print('{0}: {1}'.format(group, result[group]))
+        return
+
     if opts.explain:
         for dct in con.select(query, explain=True,
                               verbosity=verbosity,
@@ -186,7 +208,7 @@ def run(opts, args, verbosity):
         return
 
     if add_key_value_pairs or delete_keys:
-        ids = [dct['id'] for dct in con.select(query)]
+        ids = con.select_array('id', query).tolist()
         m, n = con.update(ids, delete_keys, **add_key_value_pairs)
         out('Added %s (%s updated)' %
             (plural(m, 'key-value pair'),
@@ -196,7 +218,7 @@ def run(opts, args, verbosity):
         return
 
     if opts.delete:
-        ids = [dct['id'] for dct in con.select(query)]
+        ids = con.select_array('id', query).tolist()
         if ids and not opts.yes:
             msg = 'Delete %s? (yes/No): ' % plural(len(ids), 'row')
             if input(msg).lower() != 'yes':
@@ -221,7 +243,7 @@ def run(opts, args, verbosity):
         plots = collections.defaultdict(list)
         X = {}
         labels = []
-        for row in con.select(query, sort=opts.sort):
+        for row in con.select(query, sort=opts.sort, columns=tags + keys):
             name = ','.join(str(row[tag]) for tag in tags)
             x = row.get(keys[0])
             if x is not None:
@@ -263,7 +285,8 @@ def run(opts, args, verbosity):
             if c and c.startswith('++'):
                 keys = set()
                 for row in con.select(query,
-                                      limit=opts.limit, offset=opts.offset):
+                                      limit=opts.limit, offset=opts.offset,
+                                      columns=['key_value_pairs']):
                     keys.update(row._keys)
                 columns.extend(keys)
                 if c[2:3] == ',':
@@ -1,3 +1,4 @@
+from __future__ import print_function
 import collections
 import functools
 import operator
@@ -5,6 +6,8 @@ import os
 import re
 from time import time
 
+import numpy as np
+
 from ase.atoms import Atoms, symbols2numbers
 from ase.calculators.calculator import all_properties, all_changes
 from ase.data import atomic_numbers
@@ -56,6 +59,34 @@ reserved_keys = set(all_properties + all_changes +
 
 numeric_keys = set(['id', 'energy', 'magmom', 'charge', 'natoms'])
 
+# Stored columns needed for calculating the derived properties of a row:
+derived_columns = {'natoms': ['numbers'],
+                   'formula': ['numbers'],
+                   'symbols': ['numbers'],
+                   'fmax': ['forces', 'constraints', 'positions'],
+                   'constrained_forces': ['forces', 'constraints',
+                                          'positions'],
+                   'smax': ['stress'],
+                   'volume': ['cell'],
+                   'mass': ['masses', 'numbers'],
+                   'charge': ['initial_charges']}
+
+
+def expand_columns(columns):
+    """Replace derived properties by the stored columns they need."""
+    expanded = []
+    for column in columns:
+        for c in derived_columns.get(column, [column]):
+            if c not in expanded:
+                expanded.append(c)
+    return expanded
+
+
+aggregate_functions = {'count': len,
+                       'min': min,
+                       'max': max,
+                       'mean': np.mean}
+
 
 def check(key_value_pairs):
     for key, value in key_value_pairs.items():
@@ -91,8 +122,8 @@ def connect(name, type='extract_from_name', create_indices=True,
     name: str
         Filename or address of database.
     type: str
-        One of 'json', 'db', 'postgresql',
-        (JSON, SQLite, PostgreSQL).
+        One of 'json', 'jsonl', 'db', 'postgresql',
+        (JSON, JSON-lines, SQLite, PostgreSQL).
         Default is 'extract_from_name', which will guess the type
         from the name.
     use_lock_file: bool
@@ -120,6 +151,10 @@ def connect(name, type='extract_from_name', create_indices=True,
     if type == 'json':
         from ase.db.jsondb import JSONDatabase
         return JSONDatabase(name, use_lock_file=use_lock_file, serial=serial)
+    if type == 'jsonl':
+        from ase.db.jsondb import JSONLinesDatabase
+        return JSONLinesDatabase(name, use_lock_file=use_lock_file,
+                                 serial=serial)
     if type == 'db':
         from ase.db.sqlite import SQLite3Database
         return SQLite3Database(name, create_indices, use_lock_file,
@@ -209,6 +244,53 @@ class Database:
         check(key_value_pairs)
         return 1
 
+    @parallel_function
+    @lock
+    def write_many(self, rows, log=None):
+        """Write many rows in one go.
+
+        rows: iterable
+            Atoms objects or tuples of (atoms, key_value_pairs) or
+            (atoms, key_value_pairs, data).
+        log: file object
+            Report number of rows written per second here.
+
+        Example::
+
+            ids = connection.write_many((atoms, {'x': x})
+                                        for atoms, x in ...)
+
+        Everything is written in a single transaction, which is much
+        faster than calling write() for each row.  For SQLite, the
+        indices are created after loading if the database was empty.
+        Returns list of ids of the new rows.
+        """
+
+        t0 = time()
+
+        def check_rows():
+            for n, row in enumerate(rows, 1):
+                if not isinstance(row, tuple):
+                    row = (row,)
+                atoms, kvp, data = row + ({}, {})[len(row) - 1:]
+                if atoms is None:
+                    atoms = Atoms()
+                check(kvp)
+                yield atoms, kvp, data
+                if log is not None and n % 10000 == 0:
+                    print('{0} rows, {1:.0f} rows/s'
+                          .format(n, n / (time() - t0)), file=log)
+
+        ids = self._write_many(check_rows())
+        if log is not None:
+            print('Wrote {0} rows in {1:.1f} s ({2:.0f} rows/s)'
+                  .format(len(ids), time() - t0,
+                          len(ids) / max(time() - t0, 1e-9)), file=log)
+        return ids
+
+    def _write_many(self, rows):
+        return [self._write(atoms, kvp, data) for atoms, kvp, data in rows]
+
     @parallel_function
     @lock
     def reserve(self, **key_value_pairs):
@@ -358,7 +440,8 @@ class Database:
 
     @parallel_generator
     def select(self, selection=None, filter=None, explain=False,
-               verbosity=1, limit=None, offset=0, sort=None, **kwargs):
+               verbosity=1, limit=None, offset=0, sort=None, columns=None,
+               **kwargs):
         """Select rows.
 
         Return AtomsRow iterator with results.  Selection is done
@@ -384,6 +467,16 @@ class Database:
             Possible values: 0, 1 or 2.
         limit: int or None
             Limit selection.
+        columns: list of str
+            Only read these columns.  Use names like 'energy', 'forces',
+            'natoms' or names of key-value pairs.  The returned rows
+            will only have those values (and the id).  Default is to
+            read everything.
+
+        Example::
+
+            energies = [row.energy for row in
+                        db.select('H>0', columns=['energy'])]
         """
 
         if sort:
@@ -397,7 +490,8 @@ class Database:
         keys, cmps = self.parse_selection(selection, **kwargs)
         for row in self._select(keys, cmps, explain=explain,
                                 verbosity=verbosity,
-                                limit=limit, offset=offset, sort=sort):
+                                limit=limit, offset=offset, sort=sort,
+                                columns=columns):
             if filter is None or filter(row):
                 yield row
 
@@ -415,6 +509,63 @@ class Database:
     def __len__(self):
         return self.count()
 
+    @parallel_function
+    def aggregate(self, function, key, groupby=None, selection=None,
+                  **kwargs):
+        """Calculate count, min, max or mean of the values of a key.
+
+        function: str
+            One of 'count', 'min', 'max' or 'mean'.
+        key: str
+            Column or key-value pair to aggregate.  Rows without key are
+            skipped.
+        groupby: str
+            Group rows after the values of this column or key-value pair.
+
+        See the select() method for the selection syntax.  Returns a
+        single value or a dict mapping the values of groupby to the
+        results.  Example::
+
+            emin = db.aggregate('min', 'energy', groupby='formula')
+        """
+        if function not in aggregate_functions:
+            raise ValueError('Unknown function: ' + function)
+        keys, cmps = self.parse_selection(selection, **kwargs)
+        return self._aggregate(function, key, groupby, keys, cmps)
+
+    def _aggregate(self, function, key, groupby, keys, cmps):
+        columns = [key]
+        if groupby is not None:
+            columns.append(groupby)
+        groups = {}
+        for row in self._select(keys, cmps, columns=columns):
+            value = row.get(key)
+            group = None if groupby is None else row.get(groupby)
+            if value is None or (groupby is not None and group is None):
+                continue
+            groups.setdefault(group, []).append(value)
+        results = dict((group, aggregate_functions[function](values))
+                       for group, values in groups.items())
+        if groupby is None:
+            return results.get(None, 0 if function == 'count' else None)
+        return results
+
+    @parallel_function
+    def select_array(self, key, selection=None, **kwargs):
+        """Get the values of a key for the selected rows as an ndarray.
+
+        Only the column for key is read.  Rows without key are skipped
+        and the values are in the order of the ids.  Use this for
+        scalar values like energies and key-value pairs.  See the
+        select() method for the selection syntax."""
+        keys, cmps = self.parse_selection(selection, **kwargs)
+        return np.array(self._select_array(key, keys, cmps))
+
+    def _select_array(self, key, keys, cmps):
+        values = (row.get(key)
+                  for row in self._select(keys, cmps, columns=[key]))
+        return [value for value in values if value is not None]
+
     @parallel_function
     @lock
     def update(self, ids, delete_keys=[], block_size=1000,
@@ -1,12 +1,14 @@
 from __future__ import absolute_import, print_function
+import json
 import os
 
 import numpy as np
 
-from ase.db.core import Database, ops, lock, now
+from ase.db.core import Database, ops, lock, now, expand_columns
 from ase.db.row import AtomsRow
-from ase.io.jsonio import encode, read_json
+from ase.io.jsonio import encode, decode, read_json
 from ase.parallel import world, parallel_function
+from ase.utils import rename
 
 
 class JSONDatabase(Database):
@@ -18,7 +20,9 @@ class JSONDatabase(Database):
         
     def _write(self, atoms, key_value_pairs, data):
         Database._write(self, atoms, key_value_pairs, data)
-        
+        return self._write_many([(atoms, key_value_pairs, data)])[0]
+
+    def _write_many(self, rows):
         bigdct = {}
         ids = []
         nextid = 1
@@ -29,21 +33,36 @@ class JSONDatabase(Database):
             except (SyntaxError, ValueError):
                 pass
 
-        if isinstance(atoms, AtomsRow):
-            row = atoms
-            unique_id = row.unique_id
-            for id in ids:
-                if bigdct[id]['unique_id'] == unique_id:
-                    break
+        newids = []
+        for atoms, key_value_pairs, data in rows:
+            if isinstance(atoms, AtomsRow):
+                row = atoms
+                unique_id = row.unique_id
+                for id in ids:
+                    if bigdct[id]['unique_id'] == unique_id:
+                        break
+                else:
+                    id = None
+                mtime = now()
             else:
+                row = AtomsRow(atoms)
+                row.ctime = mtime = now()
+                row.user = os.getenv('USER')
                 id = None
-            mtime = now()
-        else:
-            row = AtomsRow(atoms)
-            row.ctime = mtime = now()
-            row.user = os.getenv('USER')
-            id = None
 
+            if id is None:
+                id = nextid
+                ids.append(id)
+                nextid += 1
+
+            bigdct[id] = self._dict(row, key_value_pairs, data, mtime)
+            newids.append(id)
+
+        self._write_json(bigdct, ids, nextid)
+        return newids
+
+    def _dict(self, row, key_value_pairs, data, mtime):
+        """Convert row to dictionary for storage."""
         dct = {}
         for key in row.__dict__:
             if key[0] == '_' or key in row._keys or key == 'id':
@@ -51,27 +70,20 @@ class JSONDatabase(Database):
             dct[key] = row[key]
 
         dct['mtime'] = mtime
-        
+
         kvp = key_value_pairs or row.key_value_pairs
         if kvp:
             dct['key_value_pairs'] = kvp
-        
+
         data = data or row.get('data')
         if data:
             dct['data'] = data
-            
+
         constraints = row.get('constraints')
         if constraints:
             dct['constraints'] = constraints
-        
-        if id is None:
-            id = nextid
-            ids.append(id)
-            nextid += 1
-            
-        bigdct[id] = dct
-        self._write_json(bigdct, ids, nextid)
-        return id
+
+        return dct
         
     def _read_json(self):
         bigdct = read_json(self.filename)
@@ -119,7 +131,7 @@ class JSONDatabase(Database):
         return AtomsRow(dct)
 
     def _select(self, keys, cmps, explain=False, verbosity=0,
-                limit=None, offset=0, sort=None):
+                limit=None, offset=0, sort=None, columns=None):
         if explain:
             yield {'explain': (0, 0, 0, 'scan table')}
             return
@@ -139,23 +151,20 @@ class JSONDatabase(Database):
             if limit:
                 rows = rows[offset:offset + limit]
             for row in rows:
+                if columns is not None:
+                    row = project(row, columns)
                 yield row
             return
             
-        try:
-            bigdct, ids, nextid = self._read_json()
-        except IOError:
-            return
-            
         if not limit:
             limit = -offset - 1
             
         cmps = [(key, ops[op], val) for key, op, val in cmps]
         n = 0
-        for id in ids:
+        for id, dct in self._rows():
             if n - offset == limit:
                 return
-            row = AtomsRow(bigdct[id])
+            row = AtomsRow(dct)
             row.id = id
             for key in keys:
                 if key not in row:
@@ -173,9 +182,20 @@ class JSONDatabase(Database):
                         break
                 else:
                     if n >= offset:
+                        if columns is not None:
+                            row = project(row, columns)
                         yield row
                     n += 1
 
+    def _rows(self):
+        """Iterate over (id, dictionary) pairs."""
+        try:
+            bigdct, ids, nextid = self._read_json()
+        except IOError:
+            return
+        for id in ids:
+            yield id, bigdct[id]
+
     def _update(self, ids, delete_keys, add_key_value_pairs):
         bigdct, myids, nextid = self._read_json()
         
@@ -199,3 +219,187 @@ class JSONDatabase(Database):
             
         self._write_json(bigdct, myids, nextid)
         return m, n
+
+
+class JSONLinesDatabase(JSONDatabase):
+    """JSON database with one row per line.
+
+    New rows are appended to the end of the file, so writing n rows
+    takes O(n) time (the JSONDatabase rewrites the whole file for each
+    row).  Counting all rows only requires counting lines, and
+    selections parse one row at a time.  Updates, deletions and writing
+    an AtomsRow whose unique_id is already in the file rewrite the whole
+    file.
+
+    File layout::
+
+        {"nextid": 8}  (optional, written when the file is rewritten)
+        {"id": 1, "numbers": [1, 1], ...}
+        {"id": 2, ...}
+        ...
+    """
+
+    def _write_many(self, rows):
+        rows = list(rows)
+        if any(isinstance(atoms, AtomsRow) for atoms, kvp, data in rows):
+            unique_ids = self._unique_ids()
+            new = set()
+            for atoms, kvp, data in rows:
+                if isinstance(atoms, AtomsRow):
+                    if (atoms.unique_id in unique_ids or
+                        atoms.unique_id in new):
+                        # Rows with the same unique_id must be replaced:
+                        return JSONDatabase._write_many(self, rows)
+                    new.add(atoms.unique_id)
+        elif (self._unique_id_cache is not None and
+              self._unique_id_cache[0] == self._size()):
+            unique_ids = self._unique_id_cache[1]
+        else:
+            unique_ids = None
+
+        id = self._nextid()
+        ids = []
+        if world.rank == 0:
+            fd = open(self.filename, 'a')
+        for atoms, key_value_pairs, data in rows:
+            if isinstance(atoms, AtomsRow):
+                row = atoms
+                mtime = now()
+            else:
+                row = AtomsRow(atoms)
+                row.ctime = mtime = now()
+                row.user = os.getenv('USER')
+            dct = self._dict(row, key_value_pairs, data, mtime)
+            if world.rank == 0:
+                print(dumps(id, dct), file=fd)
+            if unique_ids is not None:
+                unique_ids.add(row.unique_id)
+            ids.append(id)
+            id += 1
+        if world.rank == 0:
+            fd.close()
+        if unique_ids is not None:
+            self._unique_id_cache = (self._size(), unique_ids)
+        return ids
+
+    _unique_id_cache = None  # (file size, set of unique ids)
+
+    def _unique_ids(self):
+        """Set of unique ids of all rows.
+
+        The set is built from one scan of the file and kept up to date
+        when appending.  It is rebuilt if the file has changed size
+        behind our back."""
+        size = self._size()
+        if self._unique_id_cache is None or self._unique_id_cache[0] != size:
+            unique_ids = set()
+            for id, dct in self._rows():
+                unique_ids.add(dct['unique_id'])
+            self._unique_id_cache = (size, unique_ids)
+        return self._unique_id_cache[1]
+
+    def _size(self):
+        if not os.path.isfile(self.filename):
+            return 0
+        return os.path.getsize(self.filename)
+
+    def _nextid(self):
+        """Get next id from the first and last lines."""
+        if not os.path.isfile(self.filename):
+            return 1
+        with open(self.filename, 'rb') as fd:
+            first = fd.readline()
+            nextid = 1
+            if first.startswith(b'{"nextid"'):
+                nextid = json.loads(first.decode())['nextid']
+            # Read backwards until we have the whole last line:
+            fd.seek(0, 2)
+            pos = fd.tell()
+            block = b''
+            while pos > 0 and b'\n' not in block.rstrip(b'\n'):
+                n = min(pos, 4096)
+                pos -= n
+                fd.seek(pos)
+                block = fd.read(n) + block
+        last = block.rstrip(b'\n').rsplit(b'\n', 1)[-1]
+        if last.startswith(b'{"id": '):
+            nextid = max(nextid, int(last[7:last.index(b',')]) + 1)
+        return nextid
+
+    def _rows(self):
+        try:
+            fd = open(self.filename, 'rb')
+        except IOError:
+            return
+        with fd:
+            for line in fd:
+                if line.startswith(b'{"id"'):
+                    dct = decode(line.decode())
+                    yield dct.pop('id'), dct
+
+    def _read_json(self):
+        bigdct = {}
+        ids = []
+        for id, dct in self._rows():
+            bigdct[id] = dct
+            ids.append(id)
+        nextid = self._nextid()
+        if ids:
+            nextid = max(nextid, max(ids) + 1)
+        return bigdct, ids, nextid
+
+    def _write_json(self, bigdct, ids, nextid):
+        self._unique_id_cache = None
+        if world.rank > 0:
+            return
+
+        with open(self.filename + '.tmp', 'w') as fd:
+            print(json.dumps({'nextid': nextid}), file=fd)
+            for id in ids:
+                print(dumps(id, bigdct[id]), file=fd)
+        rename(self.filename + '.tmp', self.filename)
+
+    def _get_row(self, id):
+        rows = self._rows()
+        if id is None:
+            rows = list(rows)
+            assert len(rows) == 1
+        for myid, dct in rows:
+            if id is None or myid == id:
+                dct['id'] = myid
+                return AtomsRow(dct)
+        raise KeyError(id)
+
+    def count(self, selection=None, **kwargs):
+        if selection or kwargs:
+            return JSONDatabase.count(self, selection, **kwargs)
+        n = 0
+        if os.path.isfile(self.filename):
+            with open(self.filename, 'rb') as fd:
+                for line in fd:
+                    if line.startswith(b'{"id"'):
+                        n += 1
+        return n
+
+
+def dumps(id, dct):
+    """Encode row as a single line with the id first."""
+    return '{{"id": {0}, {1}'.format(id, encode(dct)[1:])
+
+
+def project(row, columns):
+    """Copy of row with only some of the columns."""
+    dct = {'id': row.id}
+    for column in expand_columns(columns):
+        if column in row._keys:
+            kvp = dct.setdefault('key_value_pairs', {})
+            kvp[column] = row.get(column)
+        elif column == 'constraints':
+            if row._constraints:
+                dct[column] = row._constraints
+        elif column == 'data':
+            if row._data:
+                dct[column] = row._data
+        elif row.get(column) is not None:
+            dct[column] = row.get(column)
+    return AtomsRow(dct)
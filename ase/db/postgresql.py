@@ -2,6 +2,7 @@ import sys
 import psycopg2
 
 from ase.db.sqlite import init_statements, index_statements, VERSION
+from ase.db.sqlite import covering_index_statements
 from ase.db.sqlite import all_tables, SQLite3Database
 
 
@@ -61,6 +62,7 @@ def parse_name(name):
     
 class PostgreSQLDatabase(SQLite3Database):
     default = 'DEFAULT'
+    defer_indices = False  # the indices are owned by the postgres user
     
     def _connect(self):
         user, password, host, port = parse_name(self.filename)
@@ -79,6 +81,16 @@ class PostgreSQLDatabase(SQLite3Database):
         id = cur.fetchone()[0]
         return int(id)
 
+    def _new_ids(self, cur, n):
+        cur.execute("SELECT nextval('systems_id_seq') "
+                    'FROM generate_series(1, ?)', (n,))
+        return [int(id) for id, in cur.fetchall()]
+
+    def _index_names(self, cur):
+        cur.execute("SELECT indexname FROM pg_indexes "
+                    "WHERE schemaname='public'")
+        return set(name for name, in cur.fetchall())
+
 
 def reset():
     con = psycopg2.connect(database='postgres', user='postgres')
@@ -103,7 +115,7 @@ def reset():
         sql = sql.replace(a, b)
         
     cur.execute(sql)
-    cur.execute(';\n'.join(index_statements))
+    cur.execute(';\n'.join(index_statements + covering_index_statements))
     cur.execute('GRANT ALL PRIVILEGES ON %s TO ase' %
                 ', '.join(all_tables + ['systems_id_seq']))
     con.commit()
@@ -147,6 +147,8 @@ class AtomsRow:
     @property
     def fmax(self):
         """Maximum atomic force."""
+        if '_fmax' in self.__dict__:
+            return self._fmax  # stored value from a column projection
         forces = self.constrained_forces
         return (forces**2).sum(1).max()**0.5
         
@@ -165,6 +167,8 @@ class AtomsRow:
     @property
     def smax(self):
         """Maximum stress tensor component."""
+        if '_smax' in self.__dict__:
+            return self._smax
         return (self.stress**2).max()**0.5
 
     @property
@@ -15,12 +15,14 @@ from __future__ import absolute_import, print_function
 import os
 import sqlite3
 import sys
+import time
 
 import numpy as np
 
 from ase.data import atomic_numbers
 from ase.db.row import AtomsRow
-from ase.db.core import Database, ops, now, lock, invop
+from ase.db.core import (Database, ops, now, lock, invop, expand_columns,
+                         derived_columns, reserved_keys)
 from ase.io.jsonio import encode, decode
 from ase.parallel import parallel_function
 from ase.utils import basestring
@@ -105,10 +107,64 @@ index_statements = [
     'CREATE INDEX text_index ON text_key_values(key)',
     'CREATE INDEX number_index ON number_key_values(key)']
 
+# Optional indices for selections on key-value pairs.  The indices
+# contain all the columns needed, so the tables are never read.  The
+# (key, value, id) indices are used for comparisons and the (key, id,
+# value) indices for joining more key-value pairs to a selection:
+covering_index_statements = [
+    'CREATE INDEX text_value_index ON text_key_values(key, value, id)',
+    'CREATE INDEX text_id_index ON text_key_values(key, id, value)',
+    'CREATE INDEX number_value_index ON number_key_values(key, value, id)',
+    'CREATE INDEX number_id_index ON number_key_values(key, id, value)',
+    'CREATE INDEX keys_id_index ON keys(key, id)',
+    'CREATE INDEX species_id_index ON species(Z, id, n)']
+
+# Names of the columns of the systems table:
+system_columns = ['id'] + [line.split()[0].lstrip()
+                           for line in init_statements[0].splitlines()[2:]]
+
+# dtype and shape of columns stored as blobs:
+blob_columns = {'numbers': (np.int32, None),
+                'positions': (float, (-1, 3)),
+                'cell': (float, (3, 3)),
+                'initial_magmoms': (float, None),
+                'initial_charges': (float, None),
+                'masses': (float, None),
+                'tags': (np.int32, None),
+                'momenta': (float, (-1, 3)),
+                'forces': (float, (-1, 3)),
+                'stress': (float, None),
+                'dipole': (float, None),
+                'magmoms': (float, None),
+                'charges': (float, None)}
+
+# Columns of the systems table with a single number or string:
+scalar_columns = ['id', 'unique_id', 'ctime', 'mtime', 'username',
+                  'calculator', 'energy', 'free_energy', 'magmom',
+                  'natoms', 'fmax', 'smax', 'volume', 'mass', 'charge']
+
+sql_functions = {'count': 'COUNT', 'min': 'MIN', 'max': 'MAX', 'mean': 'AVG'}
+
 all_tables = ['systems', 'species', 'keys',
               'text_key_values', 'number_key_values']
 
 
+def add_key_value_pairs(key_value_pairs, id,
+                        text_key_values, number_key_values, keys):
+    """Append rows for the key-value tables to three lists."""
+    for key, value in key_value_pairs.items():
+        if isinstance(value, (float, int)):
+            number_key_values.append([key, float(value), id])
+        else:
+            assert isinstance(value, basestring)
+            text_key_values.append([key, value, id])
+        keys.append((key, id))
+
+
+def index_name(statement):
+    return statement.split()[2]
+
+
 def float_if_not_none(x):
     """Convert numpy.float64 to float - old db-interfaces need that."""
     if x is not None:
@@ -119,6 +175,7 @@ class SQLite3Database(Database):
     initialized = False
     _allow_reading_old_format = False
     default = 'NULL'  # used for autoincrement id
+    defer_indices = True  # drop indices while filling an empty database
     connection = None
     version = None
 
@@ -203,6 +260,130 @@ class SQLite3Database(Database):
                                          'number_key_values'])
             mtime = now()
 
+        values, key_value_pairs = self._values(row, key_value_pairs, data,
+                                               mtime)
+
+        if id is None:
+            q = self.default + ', ' + ', '.join('?' * len(values))
+            cur.execute('INSERT INTO systems VALUES ({0})'.format(q),
+                        values)
+        else:
+            q = ', '.join(line.split()[0].lstrip() + '=?'
+                          for line in init_statements[0].splitlines()[2:])
+            cur.execute('UPDATE systems SET {0} WHERE id=?'.format(q),
+                        values + (id,))
+
+        if id is None:
+            id = self.get_last_id(cur)
+
+            count = row.count_atoms()
+            if count:
+                species = [(atomic_numbers[symbol], n, id)
+                           for symbol, n in count.items()]
+                cur.executemany('INSERT INTO species VALUES (?, ?, ?)',
+                                species)
+
+        text_key_values, number_key_values, keys = ([], [], [])
+        add_key_value_pairs(key_value_pairs, id,
+                            text_key_values, number_key_values, keys)
+        self._insert_key_value_pairs(cur, text_key_values,
+                                     number_key_values, keys)
+
+        if self.connection is None:
+            con.commit()
+            con.close()
+
+        return id
+
+    def _insert_key_value_pairs(self, cur, text_key_values,
+                                number_key_values, keys):
+        cur.executemany('INSERT INTO text_key_values VALUES (?, ?, ?)',
+                        text_key_values)
+        cur.executemany('INSERT INTO number_key_values VALUES (?, ?, ?)',
+                        number_key_values)
+        cur.executemany('INSERT INTO keys VALUES (?, ?)', keys)
+
+    def _write_many(self, rows, batchsize=1000):
+        con = self.connection or self._connect()
+        self._initialize(con)
+        cur = con.cursor()
+
+        defer_indices = False
+        if self.create_indices and self.defer_indices:
+            cur.execute('SELECT COUNT(*) FROM systems')
+            defer_indices = cur.fetchone()[0] == 0
+        if defer_indices:
+            # Much faster to create the indices after loading everything:
+            existing = self._index_names(cur)
+            statements = [statement
+                          for statement in (index_statements +
+                                            covering_index_statements)
+                          if index_name(statement) in existing]
+            for statement in statements:
+                cur.execute('DROP INDEX ' + index_name(statement))
+
+        ids = []
+        batch = []
+        for atoms, key_value_pairs, data in rows:
+            batch.append((atoms, key_value_pairs, data))
+            if len(batch) == batchsize:
+                ids.extend(self._insert_many(cur, batch))
+                batch = []
+        if batch:
+            ids.extend(self._insert_many(cur, batch))
+
+        if defer_indices:
+            for statement in statements:
+                cur.execute(statement)
+
+        if self.connection is None:
+            con.commit()
+            con.close()
+
+        return ids
+
+    def _insert_many(self, cur, batch):
+        """Insert new rows using executemany().  Returns the ids."""
+        ids = self._new_ids(cur, len(batch))
+        systems = []
+        species = []
+        text_key_values, number_key_values, keys = ([], [], [])
+        mtime = now()
+        for id, (atoms, key_value_pairs, data) in zip(ids, batch):
+            if isinstance(atoms, AtomsRow):
+                row = atoms
+            else:
+                row = AtomsRow(atoms)
+                row.ctime = mtime
+                row.user = os.getenv('USER')
+            values, key_value_pairs = self._values(row, key_value_pairs,
+                                                   data, mtime)
+            systems.append((id,) + values)
+            species.extend((atomic_numbers[symbol], n, id)
+                           for symbol, n in row.count_atoms().items())
+            add_key_value_pairs(key_value_pairs, id,
+                                text_key_values, number_key_values, keys)
+
+        q = ', '.join('?' * len(systems[0]))
+        cur.executemany('INSERT INTO systems VALUES ({0})'.format(q),
+                        systems)
+        cur.executemany('INSERT INTO species VALUES (?, ?, ?)', species)
+        self._insert_key_value_pairs(cur, text_key_values,
+                                     number_key_values, keys)
+        return ids
+
+    def _new_ids(self, cur, n):
+        """Allocate n new ids."""
+        cur.execute('SELECT seq FROM sqlite_sequence WHERE name="systems"')
+        result = cur.fetchone()
+        last = 0 if result is None else result[0]
+        # The sqlite_sequence table is updated when the rows are inserted:
+        return list(range(last + 1, last + n + 1))
+
+    def _values(self, row, key_value_pairs, data, mtime):
+        """Values for a row of the systems table (except id).
+
+        Returns the values and the key-value pairs."""
         constraints = row._constraints
         if constraints:
             if isinstance(constraints, list):
@@ -257,48 +438,7 @@ class SQLite3Database(Database):
                    float(row.volume),
                    float(row.mass),
                    float(row.charge))
-
-        if id is None:
-            q = self.default + ', ' + ', '.join('?' * len(values))
-            cur.execute('INSERT INTO systems VALUES ({0})'.format(q),
-                        values)
-        else:
-            q = ', '.join(line.split()[0].lstrip() + '=?'
-                          for line in init_statements[0].splitlines()[2:])
-            cur.execute('UPDATE systems SET {0} WHERE id=?'.format(q),
-                        values + (id,))
-
-        if id is None:
-            id = self.get_last_id(cur)
-
-            count = row.count_atoms()
-            if count:
-                species = [(atomic_numbers[symbol], n, id)
-                           for symbol, n in count.items()]
-                cur.executemany('INSERT INTO species VALUES (?, ?, ?)',
-                                species)
-
-        text_key_values = []
-        number_key_values = []
-        for key, value in key_value_pairs.items():
-            if isinstance(value, (float, int)):
-                number_key_values.append([key, float(value), id])
-            else:
-                assert isinstance(value, basestring)
-                text_key_values.append([key, value, id])
-
-        cur.executemany('INSERT INTO text_key_values VALUES (?, ?, ?)',
-                        text_key_values)
-        cur.executemany('INSERT INTO number_key_values VALUES (?, ?, ?)',
-                        number_key_values)
-        cur.executemany('INSERT INTO keys VALUES (?, ?)',
-                        [(key, id) for key in key_value_pairs])
-
-        if self.connection is None:
-            con.commit()
-            con.close()
-
-        return id
+        return values, key_value_pairs
 
     def get_last_id(self, cur):
         cur.execute('SELECT seq FROM sqlite_sequence WHERE name="systems"')
@@ -369,6 +509,61 @@ class SQLite3Database(Database):
 
         return AtomsRow(dct)
 
+    def _columns(self, columns):
+        """Columns of the systems table needed for columns."""
+        names = ['id']
+        expanded = []
+        for column in columns:
+            if column in ['fmax', 'smax'] and self.version >= 5:
+                expanded.append(column)  # stored in the systems table
+            else:
+                expanded += expand_columns([column])
+        for column in expanded:
+            if column == 'user':
+                column = 'username'
+            elif column not in system_columns:
+                column = 'key_value_pairs'  # a key-value pair
+            if column not in names:
+                names.append(column)
+            if column == 'calculator':
+                names.append('calculator_parameters')
+        return names
+
+    def _convert_columns_to_row(self, names, values, columns):
+        """Convert some of the columns of a row to AtomsRow object.
+
+        Only the blobs that were asked for are decoded.  Only the
+        key-value pairs in columns are kept, unless columns contains
+        'key_value_pairs'."""
+        dct = {}
+        for name, value in zip(names, values):
+            if value is None:
+                continue
+            if name in blob_columns:
+                dtype, shape = blob_columns[name]
+                value = deblob(value, dtype, shape)
+            elif name == 'pbc':
+                value = (value & np.array([1, 2, 4])).astype(bool)
+            elif name == 'username':
+                name = 'user'
+            elif name == 'magmom':
+                if not isinstance(value, float):
+                    value = float(deblob(value, shape=()))  # version < 6
+            elif name == 'key_value_pairs':
+                value = decode(value)
+                if 'key_value_pairs' not in columns:
+                    value = dict((key, x) for key, x in value.items()
+                                 if key in columns)
+                if not value:
+                    continue
+            elif name == 'data':
+                if value == 'null':
+                    continue
+            elif name in ['fmax', 'smax']:
+                name = '_' + name  # see AtomsRow.fmax and AtomsRow.smax
+            dct[name] = value
+        return AtomsRow(dct)
+
     def _old2new(self, values):
         assert self.version >= 4, 'Your db-file is too old!'
         if self.version < 5:
@@ -382,11 +577,22 @@ class SQLite3Database(Database):
 
     def create_select_statement(self, keys, cmps,
                                 sort=None, order=None, sort_table=None,
-                                what='systems.*'):
+                                what='systems.*', joins=[]):
+        """Create SQL for a selection.
+
+        joins: list of (expression, tables, conditions, args) tuples
+            Extra tables to join with the selection (see
+            _value_statement()).
+        """
         tables = ['systems']
         where = []
         args = []
 
+        for expression, jtables, conditions, jargs in joins:
+            tables += jtables
+            where += conditions
+            args += jargs
+
         for n, key in enumerate(keys):
             if key == 'forces':
                 where.append('systems.fmax IS NOT NULL')
@@ -481,7 +687,7 @@ class SQLite3Database(Database):
         return sql, args
 
     def _select(self, keys, cmps, explain=False, verbosity=0,
-                limit=None, offset=0, sort=None):
+                limit=None, offset=0, sort=None, columns=None):
         con = self._connect()
         self._initialize(con)
 
@@ -508,11 +714,15 @@ class SQLite3Database(Database):
             order = None
             sort_table = None
 
-        sql, args = self.create_select_statement(keys, cmps,
-                                                 sort, order, sort_table)
+        if columns is None:
+            what = 'systems.*'
+        else:
+            names = self._columns(columns)
+            what = ', '.join('systems.' + name for name in names)
 
-        if explain:
-            sql = 'EXPLAIN QUERY PLAN ' + sql
+        sql, args = self.create_select_statement(keys, cmps,
+                                                 sort, order, sort_table,
+                                                 what)
 
         if limit:
             sql += '\nLIMIT {0}'.format(limit)
@@ -524,13 +734,97 @@ class SQLite3Database(Database):
             print(sql, args)
 
         cur = con.cursor()
-        cur.execute(sql, args)
         if explain:
+            cur.execute('EXPLAIN QUERY PLAN ' + sql, args)
             for row in cur.fetchall():
                 yield {'explain': row}
-        else:
+            # Also time the query:
+            t0 = time.time()
+            cur.execute(sql, args)
+            n = len(cur.fetchall())
+            yield {'explain': (0, 0, 0, '{0} rows in {1:.3f} s'
+                               .format(n, time.time() - t0))}
+            return
+
+        cur.execute(sql, args)
+        if columns is None:
             for values in cur.fetchall():
                 yield self._convert_tuple_to_row(values)
+        else:
+            for values in cur.fetchall():
+                yield self._convert_columns_to_row(names, values,
+                                                   columns)
+
+    def _value_statement(self, name, alias, cur):
+        """SQL for the values of a scalar column or a key-value pair.
+
+        Returns expression, tables, conditions and arguments or None if
+        the values must be calculated in Python."""
+        if name == 'user':
+            name = 'username'
+        if name in scalar_columns:
+            if self.version < 6 and name in ['magmom', 'natoms', 'fmax',
+                                             'smax', 'volume', 'mass',
+                                             'charge']:
+                return None  # not there or not a number in old files
+            column = 'systems.' + name
+            return column, [], [column + ' IS NOT NULL'], []
+        if (name in system_columns or name in reserved_keys or
+            name in derived_columns):
+            return None
+        tables = []
+        for table in ['text_key_values', 'number_key_values']:
+            cur.execute('SELECT id FROM {0} WHERE key=? LIMIT 1'
+                        .format(table), [name])
+            if cur.fetchone() is not None:
+                tables.append(table)
+        if len(tables) == 2:
+            return None  # mixed text and number values
+        table = (tables or ['number_key_values'])[0]
+        return ('{0}.value'.format(alias),
+                ['{0} AS {1}'.format(table, alias)],
+                ['systems.id={0}.id AND {0}.key=?'.format(alias)],
+                [name])
+
+    def _aggregate(self, function, key, groupby, keys, cmps):
+        con = self._connect()
+        self._initialize(con)
+        cur = con.cursor()
+        parts = [self._value_statement(key, 'aggregate_values', cur)]
+        if groupby is not None:
+            parts.append(self._value_statement(groupby, 'aggregate_groups',
+                                               cur))
+        if None in parts or (len(parts) == 2 and parts[0][1] and
+                             parts[1][1] and
+                             'number_id_index' not in self._index_names(cur)):
+            # Joining two key-value tables on id is slow without the
+            # covering indices, so that is done in Python:
+            return Database._aggregate(self, function, key, groupby,
+                                       keys, cmps)
+        what = '{0}({1})'.format(sql_functions[function], parts[0][0])
+        if groupby is None:
+            sql, args = self.create_select_statement(keys, cmps, what=what,
+                                                     joins=parts)
+            cur.execute(sql, args)
+            return cur.fetchone()[0]
+        group = parts[1][0]
+        sql, args = self.create_select_statement(keys, cmps,
+                                                 what=group + ', ' + what,
+                                                 joins=parts)
+        cur.execute(sql + '\nGROUP BY ' + group, args)
+        return dict(cur.fetchall())
+
+    def _select_array(self, key, keys, cmps):
+        con = self._connect()
+        self._initialize(con)
+        cur = con.cursor()
+        part = self._value_statement(key, 'array_values', cur)
+        if part is None:
+            return Database._select_array(self, key, keys, cmps)
+        sql, args = self.create_select_statement(keys, cmps, what=part[0],
+                                                 joins=[part])
+        cur.execute(sql + '\nORDER BY systems.id', args)
+        return [value for value, in cur.fetchall()]
 
     @parallel_function
     def count(self, selection=None, **kwargs):
@@ -547,6 +841,25 @@ class SQLite3Database(Database):
         self._initialize(con)
         con.execute('ANALYZE')
 
+    def create_covering_indices(self):
+        """Create indices for fast selections on key-value pairs.
+
+        Selections, sorting and aggregation involving several key-value
+        pairs can be done using only these indices.  They make the file
+        bigger and writing slower.  Use explain=True in the select()
+        method to see which indices are used."""
+        con = self._connect()
+        self._initialize(con)
+        existing = self._index_names(con.cursor())
+        for statement in covering_index_statements:
+            if index_name(statement) not in existing:
+                con.execute(statement)
+        con.commit()
+
+    def _index_names(self, cur):
+        cur.execute('SELECT name FROM sqlite_master WHERE type="index"')
+        return set(name for name, in cur.fetchall())
+
     def _update(self, ids, delete_keys, add_key_value_pairs):
         """Update row(s).
 
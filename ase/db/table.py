@@ -43,10 +43,14 @@ class Table:
         self.limit = limit
         self.offset = offset
         
+        # Only read what is needed for the table:
+        needed = ['ctime' if c == 'age' else c for c in columns]
+        needed += ['numbers', 'key_value_pairs']
         self.rows = [Row(d, columns)
                      for d in self.connection.select(
                          query, verbosity=self.verbosity,
-                         limit=limit, offset=offset, sort=sort)]
+                         limit=limit, offset=offset, sort=sort,
+                         columns=needed)]
 
         delete = set(range(len(columns)))
         for row in self.rows:
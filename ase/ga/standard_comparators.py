@@ -6,16 +6,11 @@ def get_sorted_dist_list(atoms, mic=False):
     """ Utility method used to calculate the sorted distance list
         describing the cluster in atoms. """
     numbers = atoms.numbers
-    unique_types = set(numbers)
     pair_cor = dict()
-    for n in unique_types:
-        i_un = [i for i in range(len(atoms)) if atoms[i].number == n]
-        d = []
-        for i, n1 in enumerate(i_un):
-            for n2 in i_un[i + 1:]:
-                d.append(atoms.get_distance(n1, n2, mic))
-        d.sort()
-        pair_cor[n] = np.array(d)
+    for n in set(numbers):
+        i_un = np.where(numbers == n)[0]
+        d = atoms[i_un].get_all_distances(mic=mic)
+        pair_cor[n] = np.sort(d[np.triu_indices(len(i_un), 1)])
     return pair_cor
 
 
@@ -146,20 +146,22 @@ def get_distance_matrix(atoms, self_distance=1000):
 def get_rdf(atoms, rmax, nbins, distance_matrix=None):
     """
     Returns two numpy arrays; the radial distribution function
-    and the corresponding distances of the supplied atoms object
+    and the corresponding distances of the supplied atoms object.
+    The distance matrix can be dense or a scipy.sparse matrix
+    containing (at least) all distances shorter than rmax.
     """
+    from scipy.sparse import issparse, triu
     dm = distance_matrix
     if dm is None:
-        # dm = get_distance_matrix(atoms)
-        dm = atoms.get_all_distances()
-    rdf = np.zeros(nbins + 1)
+        dm = atoms.get_all_distances(cutoff=rmax)
+    if issparse(dm):
+        dists = triu(dm, 1).data
+    else:
+        dists = np.asarray(dm)[np.triu_indices(len(atoms), 1)]
     dr = float(rmax / nbins)
-    for i in range(len(atoms)):
-        for j in range(i + 1, len(atoms)):
-            rij = dm[i][j]
-            index = int(math.ceil(rij / dr))
-            if index <= nbins:
-                rdf[index] += 1
+    index = np.ceil(dists / dr).astype(int)
+    rdf = np.bincount(index[index <= nbins], minlength=nbins + 1)
+    rdf = rdf.astype(float)
 
     # Normalize
     phi = len(atoms) / atoms.get_volume()
@@ -208,22 +210,19 @@ def get_nnmat(atoms, mic=False):
     if 'data' in atoms.info and 'nnmat' in atoms.info['data']:
         return atoms.info['data']['nnmat']
     elements = sorted(set(atoms.get_chemical_symbols()))
-    nnmat = np.zeros((len(elements), len(elements)))
-    # dm = get_distance_matrix(atoms)
-    dm = atoms.get_all_distances(mic=mic)
+    types = np.array([elements.index(symbol)
+                      for symbol in atoms.get_chemical_symbols()], int)
+    # Only distances up to rmax of get_nndist() are needed:
+    dm = atoms.get_all_distances(mic=mic, cutoff=10.)
     nndist = get_nndist(atoms, dm) + 0.2
-    for i in range(len(atoms)):
-        row = [j for j in range(len(elements))
-               if atoms[i].symbol == elements[j]][0]
-        neighbors = [j for j in range(len(dm[i])) if dm[i][j] < nndist]
-        for n in neighbors:
-            column = [j for j in range(len(elements))
-                      if atoms[n].symbol == elements[j]][0]
-            nnmat[row][column] += 1
+    dm = dm.tocoo()
+    close = dm.data < nndist
+    nnmat = np.zeros((len(elements), len(elements)))
+    np.add.at(nnmat, (types[dm.row[close]], types[dm.col[close]]), 1)
+    # Each atom is counted as its own neighbor:
+    np.add.at(nnmat, (types, types), 1)
     # divide by the number of that type of atoms in the structure
-    for i, el in enumerate(elements):
-        nnmat[i] /= len([j for j in range(len(atoms))
-                         if atoms[int(j)].symbol == el])
+    nnmat /= np.bincount(types)[:, np.newaxis]
     # makes a single list out of a list of lists
     nnlist = np.reshape(nnmat, (len(nnmat)**2))
     return nnlist
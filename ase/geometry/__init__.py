@@ -1,9 +1,11 @@
 from ase.geometry.geometry import (wrap_positions, get_layers, find_mic,
-                                   get_duplicate_atoms)
+                                   get_duplicate_atoms, get_distances_within,
+                                   minkowski_reduce)
 from ase.geometry.cell import (cell_to_cellpar, cellpar_to_cell,
                                crystal_structure_from_cell)
 from ase.geometry.distance import distance
 
 __all__ = ['wrap_positions', 'get_layers', 'find_mic', 'get_duplicate_atoms',
+           'get_distances_within', 'minkowski_reduce',
            'cell_to_cellpar', 'cellpar_to_cell',
            'crystal_structure_from_cell', 'distance']
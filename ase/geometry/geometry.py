@@ -8,6 +8,8 @@ different orientations.
    - detection of duplicate atoms / atoms within cutoff radius
 """
 
+from itertools import product
+
 import numpy as np
 
 
@@ -119,8 +121,80 @@ def get_layers(atoms, miller, tolerance=0.001):
     return tags, levels
 
 
+def minkowski_reduce(cell, pbc=True):
+    """Minkowski-reduce the periodic lattice vectors of a unit cell.
+
+    Returns the reduced cell and an integer matrix, op, such that
+    ``reduced = np.dot(op, cell)``.  Only the periodic lattice vectors
+    are changed.  In three dimensions (and less), a greedy reduction
+    gives a Minkowski-reduced basis.  All Voronoi-relevant vectors of
+    such a basis are combinations of the basis vectors with
+    coefficients -1, 0 or 1.
+
+    Reference:
+
+    Nguyen, P. Q. and Stehle, D., "Low-dimensional lattice basis
+    reduction revisited", ACM Trans. Algorithms 2009, 5, 46.
+    """
+
+    if not hasattr(pbc, '__len__'):
+        pbc = (pbc,) * 3
+
+    cell = np.array(cell, float)
+    periodic = [i for i in range(3) if pbc[i]]
+    B = cell[periodic]
+    H = np.eye(len(periodic), dtype=int)
+    _greedy_reduce(B, H, len(periodic))
+
+    op = np.eye(3, dtype=int)
+    for i, c in enumerate(periodic):
+        op[c] = 0
+        op[c, periodic] = H[i]
+    return np.dot(op, cell), op
+
+
+def _greedy_reduce(B, H, n):
+    """Greedy reduction of the first n rows of B (in place).
+
+    The same operations are done on the rows of the integer matrix H."""
+    if n < 2:
+        return
+    for iteration in range(1000):
+        order = np.argsort((B[:n]**2).sum(1), kind='mergesort')
+        B[:n] = B[order]
+        H[:n] = H[order]
+        _greedy_reduce(B, H, n - 1)
+        c = _closest_vector(B[:n - 1], B[n - 1])
+        B[n - 1] -= np.dot(c, B[:n - 1])
+        H[n - 1] -= np.dot(c, H[:n - 1])
+        if np.dot(B[n - 1], B[n - 1]) >= np.dot(B[n - 2], B[n - 2]):
+            return
+    raise RuntimeError('Lattice reduction did not converge')
+
+
+def _closest_vector(B, v):
+    """Find integer coefficients of lattice vector in B closest to v."""
+    f = np.linalg.lstsq(B.T, v, rcond=-1)[0]
+    candidates = np.floor(f).astype(int) + np.array(
+        list(product(*[[-1, 0, 1, 2]] * len(B))), dtype=int)
+    lengths = ((v - np.dot(candidates, B))**2).sum(1)
+    return candidates[lengths.argmin()]
+
+
 def find_mic(D, cell, pbc=True):
-    """Finds the minimum-image representation of vector(s) D"""
+    """Finds the minimum-image representation of vector(s) D.
+
+    Returns the vectors and their lengths.  For non-orthorhombic cells,
+    the periodic lattice vectors are Minkowski-reduced, so only the 27
+    nearest images in the reduced basis need to be checked.  The vectors
+    are processed in chunks so that memory use stays bounded."""
+
+    D = np.array(D, float)
+    cell = np.asarray(cell, float)
+    if not hasattr(pbc, '__len__'):
+        pbc = (pbc,) * 3
+    pbc = np.array(pbc, bool)
+
     # Calculate the 4 unique unit cell diagonal lengths
     diags = np.sqrt((np.dot([[1, 1, 1],
                              [-1, 1, 1],
@@ -128,60 +202,115 @@ def find_mic(D, cell, pbc=True):
                              [-1, -1, 1],
                              ], cell)**2).sum(1))
 
-    # calculate 'mic' vectors (D) and lengths (D_len) using simple method
-    Dr = np.dot(D, np.linalg.inv(cell))
-    D = np.dot(Dr - np.round(Dr) * pbc, cell)
-    D_len = np.sqrt((D**2).sum(1))
     # return mic vectors and lengths for only orthorhombic cells,
-    # as the results may be wrong for non-orthorhombic cells
+    # as the simple method may be wrong for non-orthorhombic cells
     if (max(diags) - min(diags)) / max(diags) < 1e-9:
-        return D, D_len
-
-    # The cutoff radius is the longest direct distance between atoms
-    # or half the longest lattice diagonal, whichever is smaller
-    cutoff = min(max(D_len), max(diags) / 2.)
-
-    # The number of neighboring images to search in each direction is
-    # equal to the ceiling of the cutoff distance (defined above) divided
-    # by the length of the projection of the lattice vector onto its
-    # corresponding surface normal. a's surface normal vector is e.g.
-    # b x c / (|b| |c|), so this projection is (a . (b x c)) / (|b| |c|).
-    # The numerator is just the lattice volume, so this can be simplified
-    # to V / (|b| |c|). This is rewritten as V |a| / (|a| |b| |c|)
-    # for vectorization purposes.
-    latt_len = np.sqrt((cell**2).sum(1))
-    V = abs(np.linalg.det(cell))
-    n = pbc * np.array(np.ceil(cutoff * np.prod(latt_len) /
-                               (V * latt_len)), dtype=int)
-
-    # Construct a list of translation vectors. For example, if we are
-    # searching only the nearest images (27 total), tvecs will be a
-    # 27x3 array of translation vectors. This is the only nested loop
-    # in the routine, and it takes a very small fraction of the total
-    # execution time, so it is not worth optimizing further.
-    tvecs = []
-    for i in range(-n[0], n[0] + 1):
-        latt_a = i * cell[0]
-        for j in range(-n[1], n[1] + 1):
-            latt_ab = latt_a + j * cell[1]
-            for k in range(-n[2], n[2] + 1):
-                tvecs.append(latt_ab + k * cell[2])
-    tvecs = np.array(tvecs)
-
-    # Translate the direct displacement vectors by each translation
-    # vector, and calculate the corresponding lengths.
-    D_trans = tvecs[np.newaxis] + D[:, np.newaxis]
-    D_trans_len = np.sqrt((D_trans**2).sum(2))
-
-    # Find mic distances and corresponding vector(s) for each given pair
-    # of atoms. For symmetrical systems, there may be more than one
-    # translation vector corresponding to the MIC distance; this finds the
-    # first one in D_trans_len.
-    D_min_len = np.min(D_trans_len, axis=1)
-    D_min_ind = D_trans_len.argmin(axis=1)
-    D_min = D_trans[list(range(len(D_min_ind))), D_min_ind]
-
-    return D_min, D_min_len
+        Dr = np.dot(D, np.linalg.inv(cell))
+        D = np.dot(Dr - np.round(Dr) * pbc, cell)
+        return D, np.sqrt((D**2).sum(1))
+
+    if not pbc.any() or len(D) == 0:
+        return D, np.sqrt((D**2).sum(1))
+
+    rcell, op = minkowski_reduce(cell, pbc)
+    P = rcell[pbc]
+    # Projects vectors onto fractional coordinates along the periodic
+    # directions:
+    M = np.dot(P.T, np.linalg.inv(np.dot(P, P.T)))
+    M0 = np.dot(cell[pbc].T, np.linalg.inv(np.dot(cell[pbc], cell[pbc].T)))
+
+    # Translations to the 27 (or 9 or 3) nearest images:
+    hkl = np.array(list(product(*[[-1, 0, 1]] * len(P))))
+    tvecs = np.dot(hkl, P)
+    center = len(tvecs) // 2
+
+    chunksize = 10000
+    D_min = np.empty_like(D)
+    for start in range(0, len(D), chunksize):
+        d = D[start:start + chunksize]
+        # Wrap into the reduced cell:
+        x = d - np.dot(np.floor(np.dot(d, M)), P)
+
+        # Move to the shortest of the nearest images until no image is
+        # shorter.  Since all Voronoi-relevant vectors are included in
+        # tvecs, the result is exact:
+        todo = np.arange(len(x))
+        while len(todo) > 0:
+            images = x[todo, np.newaxis] + tvecs
+            lengths = (images**2).sum(2)
+            best = lengths.argmin(1)
+            better = (lengths[np.arange(len(todo)), best] <
+                      lengths[:, center])
+            todo = todo[better]
+            x[todo] = images[better, best[better]]
+
+        # Make the result independent of the reduction.  If there are
+        # several equally short images, use the one reached with the
+        # translation that comes first in the order (i, j, k) of the
+        # original lattice vectors:
+        images = x[:, np.newaxis] + tvecs
+        lengths = (images**2).sum(2)
+        shortest = lengths.min(1)[:, np.newaxis]
+        ties = lengths <= shortest + 1e-10 * (1 + shortest)
+        if (ties.sum(1) > 1).any():
+            n = np.round(np.dot(images - d[:, np.newaxis], M0)).astype(int)
+            n -= n.min()
+            m = n.max() + 1
+            key = np.zeros(lengths.shape)
+            for i in range(n.shape[2]):
+                key = key * m + n[:, :, i]
+            key[~ties] = np.inf
+            x = images[np.arange(len(x)), key.argmin(1)]
+        D_min[start:start + chunksize] = x
+
+    return D_min, np.sqrt((D_min**2).sum(1))
+
+
+def get_distances_within(positions, cutoff, cell=None, pbc=False,
+                         vector=False):
+    """Find all pairs of positions closer than cutoff.
+
+    Returns arrays i, j and d with i < j, where d[k] is the distance
+    between positions i[k] and j[k].  For periodic systems, the minimum
+    image distance is used.  With vector=True, the distance vectors
+    from i[k] to j[k] are also returned.
+
+    Unlike a full distance matrix, this scales linearly with the number
+    of positions, since a cell-list neighbor search is used.
+    """
+    from ase.atoms import Atoms
+    from ase.neighborlist import NeighborList
+
+    positions = np.asarray(positions, float)
+    if not hasattr(pbc, '__len__'):
+        pbc = (pbc,) * 3
+    if cell is None or not any(pbc):
+        # Any non-singular cell will do for a non-periodic system:
+        cell = np.eye(3)
+        pbc = False
+
+    atoms = Atoms(positions=positions, cell=cell, pbc=pbc)
+    nl = NeighborList([0.5 * cutoff] * len(atoms), skin=0.0,
+                      self_interaction=False)
+    nl.update(atoms)
+    i, j, offsets, D = nl.get_pairs()
+    d = np.sqrt((D**2).sum(1))
+    mask = (d < cutoff) & (i != j)
+    i, j, D, d = i[mask], j[mask], D[mask], d[mask]
+
+    # Use i < j and keep only the shortest image of each pair:
+    swap = i > j
+    i, j = np.where(swap, j, i), np.where(swap, i, j)
+    D[swap] *= -1
+    order = np.lexsort((d, j, i))
+    i, j, D, d = i[order], j[order], D[order], d[order]
+    first = np.ones(len(i), bool)
+    first[1:] = (i[1:] != i[:-1]) | (j[1:] != j[:-1])
+    i, j, D, d = i[first], j[first], D[first], d[first]
+
+    if vector:
+        return i, j, d, D
+    return i, j, d
 
 
 def get_duplicate_atoms(atoms, cutoff=0.1, delete=False):
@@ -190,26 +319,10 @@ def get_duplicate_atoms(atoms, cutoff=0.1, delete=False):
     Identify all atoms which lie within the cutoff radius of each other.
     Delete one set of them if delete == True.
     """
-    from scipy.spatial.distance import pdist
-    dists = pdist(atoms.get_positions(), 'sqeuclidean')
-    dup = np.nonzero(dists < cutoff**2)
-    rem = np.array(_row_col_from_pdist(len(atoms), dup[0]))
+    i, j, d = get_distances_within(atoms.get_positions(), cutoff)
+    rem = np.array([i, j]).T
     if delete:
         if rem.size != 0:
             del atoms[rem[:, 0]]
     else:
         return rem
-
-
-def _row_col_from_pdist(dim, i):
-    """Calculate the i,j index in the square matrix for an index in a
-    condensed (triangular) matrix.
-    """
-    i = np.array(i)
-    b = 1 - 2 * dim
-    x = (np.floor((-b - np.sqrt(b**2 - 8 * i)) / 2)).astype(int)
-    y = (i + x * (b + x + 2) / 2 + 1).astype(int)
-    if i.shape:
-        return list(zip(x, y))
-    else:
-        return [(x, y)]
@@ -0,0 +1,138 @@
+"""Radial distribution functions and structure factors.
+
+The pair distances are histogrammed frame by frame using a
+:class:`~ase.neighborlist.NeighborList`, so long trajectories of large
+systems can be analysed without storing more than one configuration::
+
+    from ase.io import Trajectory
+    from ase.geometry.rdf import RDF
+
+    rdf = RDF(rmax=6.0, nbins=300)
+    for atoms in Trajectory('md.traj'):
+        rdf.add(atoms)
+    r, g = rdf.get_rdf()
+    r, g_CuAu = rdf.get_rdf(('Cu', 'Au'))
+    S = rdf.get_structure_factor(q=np.linspace(0.5, 10, 200))
+"""
+
+from __future__ import division
+
+from math import pi
+
+import numpy as np
+
+from ase.data import atomic_numbers
+from ase.neighborlist import NeighborList
+
+
+class RDF:
+    def __init__(self, rmax, nbins, skin=0.3):
+        """Accumulate (partial) radial distribution functions.
+
+        rmax: float
+            Largest distance in Angstrom.
+        nbins: int
+            Number of bins.
+        skin: float
+            Skin of the neighbor list.  The neighbor list is updated
+            incrementally between consecutive frames of the same system.
+        """
+        self.rmax = rmax
+        self.nbins = nbins
+        self.skin = skin
+        self.dr = rmax / nbins
+        self.r = (np.arange(nbins) + 0.5) * self.dr
+        # Volumes of the spherical shells:
+        edges = np.arange(nbins + 1) * self.dr
+        self.shells = 4 * pi / 3 * (edges[1:]**3 - edges[:-1]**3)
+        self.nl = None
+        self.reset()
+
+    def reset(self):
+        """Forget all frames."""
+        self.nframes = 0
+        self.histograms = {}  # (Z1, Z2) -> number of pairs in each bin
+        self.counts = {}  # Z -> number of atoms summed over frames
+        self.density = 0.0  # number density summed over frames
+
+    def add(self, atoms):
+        """Add the pair distances of one configuration."""
+        numbers = atoms.numbers
+        if self.nl is None or len(self.nl.cutoffs) != len(atoms):
+            self.nl = NeighborList([0.5 * self.rmax] * len(atoms),
+                                   skin=self.skin, self_interaction=False,
+                                   incremental=True)
+        self.nl.update(atoms)
+        i, j, offsets, D = self.nl.get_pairs(atoms)
+        d = np.sqrt((D**2).sum(1))
+        bins = (d / self.dr).astype(int)
+        mask = bins < self.nbins
+        Z1 = numbers[i[mask]]
+        Z2 = numbers[j[mask]]
+        bins = bins[mask]
+
+        elements = np.unique(numbers)
+        t1 = np.searchsorted(elements, np.minimum(Z1, Z2))
+        t2 = np.searchsorted(elements, np.maximum(Z1, Z2))
+        nelements = len(elements)
+        hist = np.bincount((t1 * nelements + t2) * self.nbins + bins,
+                           minlength=nelements**2 * self.nbins)
+        hist.shape = (nelements, nelements, self.nbins)
+
+        for t1, Z1 in enumerate(elements):
+            self.counts[Z1] = (self.counts.get(Z1, 0) +
+                               (numbers == Z1).sum())
+            for t2, Z2 in enumerate(elements[t1:], t1):
+                h = self.histograms.get((Z1, Z2), 0)
+                self.histograms[(Z1, Z2)] = h + hist[t1, t2]
+
+        self.density += len(atoms) / atoms.get_volume()
+        self.nframes += 1
+
+    def get_rdf(self, elements=None):
+        """Get the radial distribution function.
+
+        Returns the centers of the bins and g(r).  Use elements=(A, B)
+        to get the partial radial distribution function, g_AB(r),
+        where A and B are chemical symbols or atomic numbers."""
+        if self.nframes == 0:
+            raise RuntimeError('No frames added')
+        natoms = sum(self.counts.values())
+        if elements is None:
+            pairs = sum(self.histograms.values())
+            nA = natoms
+            xB = 1.0
+        else:
+            A, B = sorted(atomic_numbers.get(Z, Z) for Z in elements)
+            pairs = self.histograms.get((A, B), np.zeros(self.nbins))
+            if A != B:
+                # Each pair was counted once, but both A-B and B-A:
+                pairs = 0.5 * pairs
+            nA = self.counts.get(A, 0)
+            xB = self.counts.get(B, 0) / natoms
+        # The half neighbor list counts each pair once:
+        g = 2 * pairs / (nA * xB * self.density / self.nframes *
+                         self.shells)
+        return self.r, g
+
+    def get_structure_factor(self, q, elements=None):
+        """Get the static structure factor.
+
+        The (Faber-Ziman partial) structure factor is calculated from
+        the radial distribution function::
+
+                                  rmax
+                                   /  2                sin(qr)
+          S(q) = 1 + 4 pi rho  |  r  (g(r) - 1)  -------  dr
+                                   /                     qr
+                                  0
+
+        where rho is the average number density.  Truncation at rmax
+        gives ripples, so rmax should be large."""
+        r, g = self.get_rdf(elements)
+        q = np.asarray(q, float)
+        rho = self.density / self.nframes
+        qr = np.outer(q, r)
+        sinc = np.sinc(qr / pi)
+        integral = np.dot(sinc, r**2 * (g - 1)) * self.dr
+        return 1 + 4 * pi * rho * integral
@@ -49,29 +49,65 @@ Versions:
 
 2) Added support for big endian machines.  Json data may now have
   _little_endian=False item.
+
+3) Added encoded ndarrays (compressed, downcast to float32 or stored as
+  differences from the previous item).  Only files containing encoded
+  ndarrays have version 3.
+
+Encoded ndarrays:
+
+An ndarray can be written with a codec:
+
+>>> w = affopen('x.aff', 'w', codecs={'a': 'delta+float32+zlib'})
+
+The codec is a '+'-separated combination of:
+
+zlib, lzma:
+    Compression with the zlib or lzma module (lzma needs Python 3).
+float32:
+    Store floating point numbers in single precision.
+delta, delta=n:
+    Store the difference from the value of the same ndarray in the
+    previous item.  A full value (keyframe) is stored every n items
+    (default: 10).  The differences are calculated for the integer
+    representation of the stored numbers, so they are exact.
+
+Each encoded ndarray is stored as a list of segments from the keyframe
+up to the item itself, so any item can be read directly::
+
+    "a.": {"encoded": [shape, dtype, codec, [[offset, nbytes], ...]]}
 """
 
 import optparse
 import os
+import time
+import zlib
 
 import numpy as np
 
-from ase.io.jsonio import encode, decode
+from ase.io.jsonio import encode, decode, mydecode
 from ase.utils import plural, basestring
 
 
-VERSION = 2
+VERSION = 3
 N1 = 42  # block size - max number of items: 1, N1, N1*N1, N1*N1*N1, ...
 
 
-def affopen(filename, mode='r', index=None, tag=''):
-    """Open aff-file."""
+def affopen(filename, mode='r', index=None, tag='', mmap=False,
+            buffersize=1, buffertime=None, codecs=None):
+    """Open aff-file.
+
+    Use mmap=True to read ndarrays from a memory map of the file.  They
+    are then returned as read-only views of the map (for native endian
+    files).  See :class:`Writer` for the buffersize, buffertime and
+    codecs arguments."""
     if mode == 'r':
-        return Reader(filename, index or 0)
+        return Reader(filename, index or 0, mmap=mmap)
     if mode not in 'wa':
         2 / 0
     assert index is None
-    return Writer(filename, mode, tag)
+    return Writer(filename, mode, tag, buffersize=buffersize,
+                  buffertime=buffertime, codecs=codecs)
 
 
 def align(fd):
@@ -99,10 +135,64 @@ def readints(fd, n):
     if not np.little_endian:
         a.byteswap(True)
     return a
+
+
+def parse_codec(codec):
+    """Parse codec string.
+
+    Returns compression ('zlib', 'lzma' or None), dtype of the stored
+    numbers (None for no conversion) and number of items between
+    keyframes (0 for no delta encoding).
+
+    >>> parse_codec('delta=5+float32+zlib')
+    ('zlib', 'float32', 5)
+    """
+    compression = None
+    dtype = None
+    interval = 0
+    for part in codec.split('+'):
+        if part == 'zlib':
+            compression = part
+        elif part == 'lzma':
+            try:
+                import lzma  # noqa
+            except ImportError:
+                raise ValueError('The lzma codec needs the lzma module '
+                                 '(Python 3)')
+            compression = part
+        elif part == 'float32':
+            dtype = part
+        elif part == 'delta':
+            interval = 10
+        elif part.startswith('delta='):
+            interval = int(part[6:])
+            assert interval > 0
+        else:
+            raise ValueError('Unknown codec: ' + part)
+    return compression, dtype, interval
+
+
+def compress(data, compression):
+    if compression == 'zlib':
+        return zlib.compress(data)
+    if compression == 'lzma':
+        import lzma
+        return lzma.compress(data)
+    return data
+
+
+def decompress(data, compression):
+    if compression == 'zlib':
+        return zlib.decompress(data)
+    if compression == 'lzma':
+        import lzma
+        return lzma.decompress(data)
+    return data
     
     
 class Writer:
-    def __init__(self, fd, mode='w', tag='', data=None):
+    def __init__(self, fd, mode='w', tag='', data=None, buffersize=1,
+                 buffertime=None, codecs=None):
         """Create writer object.
         
         fd: str
@@ -112,12 +202,34 @@ class Writer:
             existing one) and 'a' for appending to an existing file.
         tag: str
             Magic ID string.
+        buffersize: int
+            Number of items to collect before they are committed to the
+            file.
+        buffertime: float
+            Commit items if this many seconds have passed since the last
+            commit.
+        codecs: dict
+            Codecs for ndarrays written with write().  Use names like
+            'calculator.forces' for ndarrays of children.  Example:
+            {'positions': 'delta+zlib', 'calculator.forces': 'lzma'}.
+
+        The data of an item is written when sync() is called, but the
+        item is not visible to readers before it has been committed by
+        updating the offsets table and the number of items in the
+        header.  With buffering, that is done once for several items.
+        If the program crashes, the items that have not been committed
+        are lost, but the file is still valid.  Use flush() to commit
+        the items explicitly.
         """
 
         assert mode in 'aw'
+
+        for codec in (codecs or {}).values():
+            parse_codec(codec)  # fail now and not in the middle of a write
         
         # Header to be written later:
         self.header = b''
+        self.version = 2
         
         if data is None:
             if np.little_endian:
@@ -131,8 +243,10 @@ class Writer:
 
                 fd = open(fd, 'wb')
 
-                # File format identifier and other stuff:
-                a = np.array([VERSION, self.nitems, self.pos0], np.int64)
+                # File format identifier and other stuff.  Version 3 is
+                # only used for files with encoded ndarrays:
+                a = np.array([self.version, self.nitems, self.pos0],
+                             np.int64)
                 if not np.little_endian:
                     a.byteswap(True)
                 self.header = ('AFFormat{0:16}'.format(tag).encode('ascii') +
@@ -142,7 +256,8 @@ class Writer:
                 fd = open(fd, 'r+b')
             
                 version, self.nitems, self.pos0, offsets = read_header(fd)[1:]
-                assert version == VERSION
+                assert 2 <= version <= VERSION
+                self.version = version
                 n = 1
                 while self.nitems > n:
                     n *= N1
@@ -152,14 +267,30 @@ class Writer:
             
         self.fd = fd
         self.data = data
+
+        self.codecs = codecs or {}
+        self.root = self  # writer of the item
+        self.prefix = ''  # path of children
+        self.references = {}  # last values of delta encoded ndarrays
+
+        self.buffersize = buffersize
+        self.buffertime = buffertime
+        self.pending = []  # offsets of items not committed yet
+        self.lastcommit = time.time()
         
         # date for array being filled:
         self.nmissing = 0  # number of missing numbers
         self.shape = None
         self.dtype = None
+        self.name = None
+        self.codec = None
+        self.chunks = []  # filled data of encoded array
         
-    def add_array(self, name, shape, dtype=float):
-        """Add ndarray object."""
+    def add_array(self, name, shape, dtype=float, codec=None):
+        """Add ndarray object.
+
+        With a codec, the data is kept in memory and encoded when the
+        array has been filled.  See the module docstring for codecs."""
         
         self._write_header()
 
@@ -168,16 +299,22 @@ class Writer:
             
         shape = tuple(int(s) for s in shape)  # Convert np.int64 to int
         
-        i = align(self.fd)
-        
-        self.data[name + '.'] = {
-            'ndarray': (shape, np.dtype(dtype).name, i)}
-            
         assert self.nmissing == 0, 'last array not done'
         
+        if codec is None:
+            i = align(self.fd)
+            self.data[name + '.'] = {
+                'ndarray': (shape, np.dtype(dtype).name, i)}
+        else:
+            parse_codec(codec)  # check that codec is valid
+            
         self.dtype = dtype
         self.shape = shape
+        self.name = name
+        self.codec = codec
         self.nmissing = np.prod(shape)
+        if codec is not None and self.nmissing == 0:
+            self._write_encoded_array()
         
     def _write_header(self):
         # We want to delay writing until there is any real data written.
@@ -192,7 +329,58 @@ class Writer:
         self.nmissing -= a.size
         assert self.nmissing >= 0
             
-        a.tofile(self.fd)
+        if self.codec is None:
+            a.tofile(self.fd)
+            return
+
+        self.chunks.append(a.copy())
+        if self.nmissing == 0:
+            self._write_encoded_array()
+
+    def _write_encoded_array(self):
+        compression, dtype, interval = parse_codec(self.codec)
+        chunks = [chunk.ravel() for chunk in self.chunks]
+        a = np.concatenate(chunks or [np.empty(0, self.dtype)])
+        a.shape = self.shape
+        self.chunks = []
+        if dtype is not None:
+            if a.dtype.kind != 'f':
+                raise ValueError('Can not store {0} array as {1}'
+                                 .format(a.dtype, dtype))
+            a = a.astype(dtype)
+
+        root = self.root
+        path = self.prefix + self.name
+        segments = []
+        b = a
+        if interval:
+            ref = root.references.get(path)
+            if (ref is not None and
+                ref[0] == root.nitems - 1 and
+                ref[1].shape == a.shape and
+                ref[1].dtype == a.dtype and
+                len(ref[2]) < interval):
+                # Integer differences can be added exactly when reading:
+                inttype = np.dtype('i{0}'.format(a.dtype.itemsize))
+                b = a.view(inttype) - ref[1].view(inttype)
+                segments = list(ref[2])
+
+        data = compress(b.tobytes(), compression)
+        i = align(self.fd)
+        self.fd.write(data)
+        segments.append([i, len(data)])
+        if interval:
+            root.references[path] = (root.nitems, a, segments)
+
+        self.data[self.name + '.'] = {
+            'encoded': (self.shape, np.dtype(self.dtype).name, self.codec,
+                        segments)}
+
+        if root.version < 3:
+            # Old readers can not read encoded arrays:
+            root.version = 3
+            writeint(self.fd, 3, 24)
+            self.fd.seek(0, 2)
 
     def sync(self):
         """Write data dictionary.
@@ -207,11 +395,38 @@ class Writer:
         s = encode(self.data).encode()
         writeint(self.fd, len(s))
         self.fd.write(s)
-        
+        self.pending.append(i)
+        self.nitems += 1
+        if np.little_endian:
+            self.data = {}
+        else:
+            self.data = {'_little_endian': False}
+
+        if (len(self.pending) >= self.buffersize or
+            (self.buffertime is not None and
+             time.time() - self.lastcommit >= self.buffertime)):
+            self.flush()
+
+    def flush(self):
+        """Commit all items written so far.
+
+        The offsets of the new items are written to the offsets table
+        and then the number of items is updated.  Readers see the old
+        number of items until the very last write."""
+
+        self.lastcommit = time.time()
+        if not self.pending:
+            return
+        nold = self.nitems - len(self.pending)
         n = len(self.offsets)
-        if self.nitems >= n:
-            offsets = np.zeros(n * N1, np.int64)
-            offsets[:n] = self.offsets
+        if self.nitems > n:
+            # Write a new and larger offsets table at the end of the file:
+            while n < self.nitems:
+                n *= N1
+            offsets = np.zeros(n, np.int64)
+            offsets[:nold] = self.offsets[:nold]
+            offsets[nold:self.nitems] = self.pending
+            self.fd.seek(0, 2)
             self.pos0 = align(self.fd)
             if np.little_endian:
                 offsets.tofile(self.fd)
@@ -219,17 +434,18 @@ class Writer:
                 offsets.byteswap().tofile(self.fd)
             writeint(self.fd, self.pos0, 40)
             self.offsets = offsets
-            
-        self.offsets[self.nitems] = i
-        writeint(self.fd, i, self.pos0 + self.nitems * 8)
-        self.nitems += 1
+        else:
+            self.offsets[nold:self.nitems] = self.pending
+            self.fd.seek(self.pos0 + nold * 8)
+            new = self.offsets[nold:self.nitems]
+            if np.little_endian:
+                new.tofile(self.fd)
+            else:
+                new.byteswap().tofile(self.fd)
         writeint(self.fd, self.nitems, 32)
         self.fd.flush()
         self.fd.seek(0, 2)  # end of file
-        if np.little_endian:
-            self.data = {}
-        else:
-            self.data = {'_little_endian': False}
+        self.pending = []
         
     def write(self, *args, **kwargs):
         """Write data.
@@ -253,7 +469,8 @@ class Writer:
                                   type(None))):
                 self.data[name] = value
             elif isinstance(value, np.ndarray):
-                self.add_array(name, value.shape, value.dtype)
+                codec = self.root.codecs.get(self.prefix + name)
+                self.add_array(name, value.shape, value.dtype, codec)
                 self.fill(value)
             else:
                 value.write(self.child(name))
@@ -261,7 +478,10 @@ class Writer:
     def child(self, name):
         self._write_header()
         dct = self.data[name + '.'] = {}
-        return Writer(self.fd, data=dct)
+        writer = Writer(self.fd, data=dct)
+        writer.root = self.root
+        writer.prefix = self.prefix + name + '.'
+        return writer
         
     def close(self):
         n = int('_little_endian' in self.data)
@@ -272,6 +492,7 @@ class Writer:
         else:
             # Make sure header has been written (empty aff-file):
             self._write_header()
+        self.flush()
         self.fd.close()
         
     def __len__(self):
@@ -279,7 +500,7 @@ class Writer:
         
         
 class DummyWriter:
-    def add_array(self, name, shape, dtype=float):
+    def add_array(self, name, shape, dtype=float, codec=None):
         pass
         
     def fill(self, a):
@@ -287,6 +508,9 @@ class DummyWriter:
         
     def sync(self):
         pass
+
+    def flush(self):
+        pass
         
     def write(self, *args, **kwargs):
         pass
@@ -315,10 +539,34 @@ def read_header(fd):
 class InvalidAFFError(Exception):
     pass
 
+
+class MemoryMap:
+    """Read-only memory map of a file.
+
+    The file is mapped again if data beyond the end of the current map
+    is requested, so it can be appended to while it is being read."""
+    def __init__(self, fd):
+        self.fd = fd
+        self.map = np.memmap(fd, np.uint8, mode='r')
+
+    def view(self, offset, dtype, shape):
+        """Return ndarray view of data starting at offset."""
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if offset + nbytes > len(self.map):
+            self.map = np.memmap(self.fd, np.uint8, mode='r')
+        if nbytes == 0:
+            return np.empty(shape, dtype)
+        return self.map[offset:offset + nbytes].view(dtype).reshape(shape)
+
     
 class Reader:
-    def __init__(self, fd, index=0, data=None, little_endian=None):
-        """Create reader."""
+    def __init__(self, fd, index=0, data=None, little_endian=None,
+                 mmap=False):
+        """Create reader.
+
+        mmap: bool or MemoryMap
+            Read ndarrays from a memory map of the file.  Only used for
+            files with the same byte order as the machine."""
         
         if isinstance(fd, basestring):
             fd = open(fd, 'rb')
@@ -329,6 +577,10 @@ class Reader:
         if data is None:
             (self._tag, self._version, self._nitems, self._pos0,
              self._offsets) = read_header(fd)
+            if self._version > VERSION:
+                raise InvalidAFFError(
+                    'Can not read new AFF format (version {0}).  '
+                    'Please update to latest ASE.'.format(self._version))
             if self._nitems > 0:
                 data = self._read_data(index)
             else:
@@ -336,6 +588,13 @@ class Reader:
             self._little_endian = data.pop('_little_endian', True)
         else:
             self._little_endian = little_endian
+
+        if mmap is True:
+            if self._little_endian == np.little_endian:
+                mmap = MemoryMap(fd)
+            else:
+                mmap = None
+        self._mmap = mmap or None
             
         self._parse_data(data)
         
@@ -343,17 +602,13 @@ class Reader:
         self._data = {}
         for name, value in data.items():
             if name.endswith('.'):
-                if 'ndarray' in value:
-                    shape, dtype, offset = value['ndarray']
-                    dtype = dtype.encode()  # compatibility with Numpy 1.4
-                    value = NDArrayReader(self._fd,
-                                          shape,
-                                          np.dtype(dtype),
-                                          offset,
-                                          self._little_endian)
+                if 'ndarray' in value or 'encoded' in value:
+                    value = array_reader(self._fd, value,
+                                         self._little_endian, self._mmap)
                 else:
                     value = Reader(self._fd, data=value,
-                                   little_endian=self._little_endian)
+                                   little_endian=self._little_endian,
+                                   mmap=self._mmap)
                 name = name[:-1]
         
             self._data[name] = value
@@ -410,7 +665,51 @@ class Reader:
 
     def __len__(self):
         return int(self._nitems)
-        
+
+    def stack(self, name, indices=None):
+        """Read the same quantity from many items and stack the values.
+
+        name: str
+            Name of the quantity.  Use names like 'calculator.energy' for
+            quantities of children.
+        indices: slice or list of int
+            Items to read.  Default is all items.
+
+        The values are read directly using the offsets table without
+        creating Reader objects.  Returns an ndarray with one row per
+        item."""
+
+        if indices is None:
+            indices = range(self._nitems)
+        elif isinstance(indices, slice):
+            indices = range(*indices.indices(self._nitems))
+        path = name.split('.')
+        result = None
+        for k, index in enumerate(indices):
+            self._fd.seek(self._offsets[index])
+            size = readints(self._fd, 1)[0]
+            data = mydecode(self._fd.read(size).decode())
+            little_endian = data.get('_little_endian', True)
+            try:
+                for key in path[:-1]:
+                    data = data[key + '.']
+                if path[-1] in data:
+                    value = np.asarray(data[path[-1]])
+                else:
+                    mmap = self._mmap
+                    if little_endian != np.little_endian:
+                        mmap = None
+                    value = array_reader(self._fd, data[path[-1] + '.'],
+                                         little_endian, mmap).read()
+            except KeyError:
+                raise KeyError('No {0!r} in item #{1}'.format(name, index))
+            if result is None:
+                result = np.empty((len(indices),) + value.shape, value.dtype)
+            result[k] = value
+        if result is None:
+            result = np.empty(0)
+        return result
+
     def _read_data(self, index):
         self._fd.seek(self._offsets[index])
         size = readints(self._fd, 1)[0]
@@ -419,7 +718,7 @@ class Reader:
     
     def __getitem__(self, index):
         data = self._read_data(index)
-        return Reader(self._fd, index, data, self._little_endian)
+        return Reader(self._fd, index, data, self._little_endian, self._mmap)
         
     def tostr(self, verbose=False, indent='    '):
         keys = sorted(self._data)
@@ -445,9 +744,22 @@ class Reader:
         self._fd.close()
         
         
+def array_reader(fd, value, little_endian, mmap=None):
+    """Create reader for ndarray from its json data."""
+    if 'encoded' in value:
+        shape, dtype, codec, segments = value['encoded']
+        return EncodedArrayReader(fd, shape, np.dtype(dtype), codec,
+                                  segments, little_endian)
+    shape, dtype, offset = value['ndarray']
+    dtype = dtype.encode()  # compatibility with Numpy 1.4
+    return NDArrayReader(fd, shape, np.dtype(dtype), offset, little_endian,
+                         mmap)
+
+
 class NDArrayReader:
-    def __init__(self, fd, shape, dtype, offset, little_endian):
+    def __init__(self, fd, shape, dtype, offset, little_endian, mmap=None):
         self.fd = fd
+        self.mmap = mmap
         self.shape = tuple(shape)
         self.dtype = dtype
         self.offset = offset
@@ -475,6 +787,16 @@ class NDArrayReader:
         start, stop, step = i.indices(len(self))
         stride = np.prod(self.shape[1:], dtype=int)
         offset = self.offset + start * self.itemsize * stride
+        if self.mmap is not None:
+            # Zero-copy view into the memory map:
+            a = self.mmap.view(offset, self.dtype,
+                               (max(0, stop - start),) + self.shape[1:])
+            a = a[::step]
+            if self.length_of_last_dimension is not None:
+                a = a[..., :self.length_of_last_dimension]
+            if self.scale != 1.0:
+                a = a * self.scale
+            return a
         self.fd.seek(offset)
         count = (stop - start) * stride
         try:
@@ -501,7 +823,55 @@ class NDArrayReader:
             stride //= self.shape[i + 1]
         offset = self.offset + start * self.itemsize
         p = NDArrayReader(self.fd, self.shape[i + 1:], self.dtype,
-                          offset, self.little_endian)
+                          offset, self.little_endian, self.mmap)
+        p.scale = self.scale
+        return p
+
+
+class EncodedArrayReader(NDArrayReader):
+    """Reader for ndarray written with a codec.
+
+    The whole ndarray is decoded when any part of it is read."""
+    def __init__(self, fd, shape, dtype, codec, segments, little_endian,
+                 indices=()):
+        NDArrayReader.__init__(self, fd, shape[len(indices):], dtype, None,
+                               little_endian)
+        self.fullshape = tuple(shape)
+        self.codec = codec
+        self.segments = segments
+        self.indices = tuple(indices)
+
+    def decode(self):
+        """Read and decode the whole ndarray."""
+        compression, dtype, interval = parse_codec(self.codec)
+        dtype = np.dtype(dtype or self.dtype)
+        inttype = np.dtype('i{0}'.format(dtype.itemsize))
+        a = None
+        for offset, nbytes in self.segments:
+            self.fd.seek(offset)
+            data = decompress(self.fd.read(nbytes), compression)
+            b = np.frombuffer(data, dtype)
+            if self.little_endian != np.little_endian:
+                b = b.byteswap()
+            if a is None:
+                a = b
+            else:
+                a = (a.view(inttype) + b.view(inttype)).view(dtype)
+        a = a.astype(self.dtype).reshape(self.fullshape)
+        return a[self.indices]
+
+    def __getitem__(self, i):
+        a = self.decode()[i]
+        if self.length_of_last_dimension is not None:
+            a = a[..., :self.length_of_last_dimension]
+        if self.scale != 1.0:
+            a *= self.scale
+        return a
+
+    def proxy(self, *indices):
+        p = EncodedArrayReader(self.fd, self.fullshape, self.dtype,
+                               self.codec, self.segments, self.little_endian,
+                               self.indices + indices)
         p.scale = self.scale
         return p
         
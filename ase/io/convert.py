@@ -0,0 +1,264 @@
+"""Convert many files to ASE trajectory files using several processes.
+
+Files that support random access (trajectory files and extended XYZ
+files with a frame index) are split into chunks of frames.  The chunks
+are parsed by a pool of worker processes, and the frames are sent back
+as bundles of ndarrays and written in the right order by the main
+process.  Other files are converted sequentially, but several files
+are converted at the same time.
+
+Example::
+
+    from ase.io.convert import convert
+    convert(['run1.xyz', 'archive/'], pattern='*.xyz', workers=8)
+
+or from the command line::
+
+    $ ase-convert -j 8 --pattern '*.xyz' run1.xyz archive/
+"""
+
+from __future__ import print_function
+import fnmatch
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+from ase.db.row import AtomsRow, atoms2dict
+from ase.io.formats import filetype, iread
+from ase.io.pickletrajectory import PickleTrajectory
+from ase.io.trajectory import TrajectoryReader, TrajectoryWriter
+from ase.utils import rename
+
+
+def atoms2bundle(atoms):
+    """Pack Atoms object into a dict of ndarrays.
+
+    Bundles are cheaper to pickle and send between processes than
+    Atoms objects with calculators attached."""
+    bundle = atoms2dict(atoms)
+    del bundle['unique_id']
+    bundle.pop('calculator_parameters', None)
+    if atoms.info:
+        bundle['info'] = atoms.info
+    return bundle
+
+
+def bundle2atoms(bundle):
+    """Unpack Atoms object from bundle."""
+    bundle = bundle.copy()
+    info = bundle.pop('info', {})
+    atoms = AtomsRow(bundle).toatoms()
+    atoms.info = info
+    return atoms
+
+
+def find_files(paths, pattern='*.traj'):
+    """Find files in paths.
+
+    Directories are searched recursively for files matching pattern.
+    Other paths are used as they are."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for name in sorted(fnmatch.filter(filenames, pattern)):
+                yield os.path.join(dirpath, name)
+
+
+def count_frames(filename, format):
+    """Number of frames or None if the file has no random access."""
+    if format == 'traj':
+        return len(TrajectoryReader(filename))
+    if format == 'extxyz':
+        from ase.io.extxyz import get_frame_index
+        return len(get_frame_index(filename))
+    return None
+
+
+def read_frames(filename, format, start=0, stop=None):
+    """Iterate over Atoms objects in file."""
+    if format == 'trj':
+        # Old pickle trajectories can only be read like this:
+        return islice(PickleTrajectory(filename, _warn=False), start, stop)
+    return iread(filename, slice(start, stop), format)
+
+
+def _read_chunk(task):
+    """Worker: read frames and return them as bundles."""
+    filename, format, start, stop, target, codecs = task
+    return [atoms2bundle(atoms)
+            for atoms in read_frames(filename, format, start, stop)]
+
+
+def _convert_file(task):
+    """Worker: convert a whole file and return the number of frames."""
+    filename, format, start, stop, target, codecs = task
+    traj = TrajectoryWriter(target + '.tmp', codecs=codecs)
+    nframes = 0
+    for atoms in read_frames(filename, format):
+        traj.write(atoms)
+        nframes += 1
+    traj.close()
+    return nframes
+
+
+def _work(task):
+    if task[4] is None:
+        return _read_chunk(task)
+    return _convert_file(task)
+
+
+def imap_bounded(pool, func, tasks, maxtasks):
+    """Like pool.imap(), but with at most maxtasks tasks in flight.
+
+    pool.imap() hands out all tasks at once, so results that are not
+    consumed yet pile up in memory.  Here, a new task is only submitted
+    when the oldest result has been taken."""
+    tasks = iter(tasks)
+    pending = deque()
+    for task in islice(tasks, maxtasks):
+        pending.append(pool.apply_async(func, (task,)))
+    while pending:
+        result = pending.popleft().get()
+        for task in islice(tasks, 1):
+            pending.append(pool.apply_async(func, (task,)))
+        yield result
+
+
+def target_name(filename, outdir=None, root=None):
+    """Name of .traj file for filename.
+
+    With outdir, the directory tree below root is recreated below
+    outdir."""
+    name = os.path.splitext(filename)[0] + '.traj'
+    if outdir is not None:
+        if root is None or not os.path.isdir(root):
+            name = os.path.basename(name)
+        else:
+            name = os.path.relpath(name, root)
+        name = os.path.join(outdir, name)
+    return name
+
+
+def convert(paths, outdir=None, pattern='*.traj', format=None, workers=None,
+            chunksize=100, maxtasks=None, codecs=None, log=sys.stdout):
+    """Convert files and directory trees to .traj files.
+
+    paths: list of str
+        Files and directories.  Directories are searched recursively
+        for files matching pattern.
+    outdir: str
+        Write .traj files here instead of next to the original files.
+    pattern: str
+        Shell-style pattern for files in directories.  The default
+        converts old pickle trajectory files.
+    format: str
+        Format of the files.  Default is to guess from each file.
+    workers: int
+        Number of worker processes.  Default is number of CPUs.  Use
+        workers=1 for doing everything in the main process.
+    chunksize: int
+        Number of frames parsed by a worker at a time.
+    maxtasks: int
+        Maximum number of chunks and files being worked on or waiting
+        to be written.  This limits the memory used for frames that
+        have been parsed but not written yet.  Default is two times
+        the number of workers.
+    codecs: dict
+        Codecs for compressing arrays.  See
+        :class:`~ase.io.trajectory.TrajectoryWriter`.
+    log: file object
+        Progress report goes here.  Use log=None for no output.
+
+    Old pickle trajectory files converted in place are kept as
+    ``name.traj.old``.  Files are written as ``name.traj.tmp`` and only
+    renamed when complete.  Returns dict mapping converted files to
+    numbers of frames."""
+
+    tasks = []
+    targets = {}
+    for path in paths:
+        for filename in find_files([path], pattern):
+            target = target_name(filename, outdir, path)
+            fmt = format or filetype(filename)
+            if fmt == 'traj' and same_path(target, filename):
+                continue  # already converted
+            targets[filename] = target
+            directory = os.path.dirname(target)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            nframes = count_frames(filename, fmt)
+            if nframes is None:
+                tasks.append((filename, fmt, 0, None, target, codecs))
+                continue
+            for start in range(0, nframes, chunksize) or [0]:
+                stop = start + chunksize
+                if stop >= nframes:
+                    stop = None  # last chunk
+                tasks.append((filename, fmt, start, stop, None, None))
+
+    if workers is None:
+        import multiprocessing
+        workers = multiprocessing.cpu_count()
+
+    pool = None
+    if workers > 1 and len(tasks) > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(workers)
+        results = imap_bounded(pool, _work, tasks, maxtasks or 2 * workers)
+    else:
+        results = (_work(task) for task in tasks)
+
+    t0 = time.time()
+    frames = dict((filename, 0) for filename in targets)
+    writers = {}  # writers for chunked files
+    ndone = 0
+    try:
+        for task, result in zip(tasks, results):
+            filename, stop = task[0], task[3]
+            target = targets[filename]
+            if isinstance(result, list):
+                if filename not in writers:
+                    writers[filename] = TrajectoryWriter(target + '.tmp',
+                                                         codecs=codecs)
+                for bundle in result:
+                    writers[filename].write(bundle2atoms(bundle))
+                frames[filename] += len(result)
+                if stop is not None:
+                    continue  # more chunks to come
+                writers.pop(filename).close()
+            else:
+                frames[filename] = result
+            _finish(filename, target)
+            ndone += 1
+            if log is not None:
+                print('{0}/{1} {2} -> {3}: {4} frames ({5:.1f} s)'
+                      .format(ndone, len(targets), filename, target,
+                              frames[filename], time.time() - t0),
+                      file=log)
+    finally:
+        for writer in writers.values():
+            writer.close()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    return frames
+
+
+def same_path(path1, path2):
+    """Check if two paths point to the same file.
+
+    (os.path.samefile() is not available on Windows with Python 2.)"""
+    return (os.path.normcase(os.path.abspath(path1)) ==
+            os.path.normcase(os.path.abspath(path2)))
+
+
+def _finish(filename, target):
+    if same_path(filename, target):
+        rename(filename, filename + '.old')
+    rename(target + '.tmp', target)
@@ -22,5 +22,7 @@ def write_db(filename, images, **kwargs):
         
 read_json = read_db
 write_json = write_db
+read_jsonl = read_db
+write_jsonl = write_db
 read_postgresql = read_db
 write_postgresql = write_db
@@ -8,19 +8,26 @@ comment line, and additional per-atom properties as extra columns.
 See http://jrkermode.co.uk/quippy/io.html#extendedxyz for a full
 description of the Extended XYZ file format.
 
+The byte offsets of the frames of a file are stored in a sidecar index
+file (the name of the file with ``.idx`` appended), so that any frame
+can be read without scanning the whole file.  The index is validated
+against the size and modification time of the file and is extended
+when frames have been appended to the file.
+
 Contributed by James Kermode <james.kermode@gmail.com>
 """
 
 from __future__ import print_function
 
+import os
 import re
 import numpy as np
 
 from ase.atoms import Atoms
 from ase.calculators.calculator import all_properties, Calculator
 from ase.calculators.singlepoint import SinglePointCalculator
-from ase.parallel import paropen
-from ase.utils import basestring
+from ase.parallel import paropen, world
+from ase.utils import basestring, rename
 
 __all__ = ['read_xyz', 'write_xyz']
 
@@ -195,11 +202,134 @@ def parse_properties(prop_str):
     return properties, properties_list, dtype, converters
 
 
-def read_xyz(fileobj, index=-1):
+INDEX_HEADER_SIZE = 128
+
+
+def get_frame_index(filename, write=True):
+    """Get the byte offsets and numbers of atoms of all frames in a file.
+
+    Returns an array of shape (nframes, 2).  The sidecar index file is
+    used if it is up to date.  If frames have been appended to the file
+    since the index was written, only the new frames are scanned.  With
+    write=True, a new or extended index is written to the sidecar file
+    (if possible)."""
+
+    indexname = filename + '.idx'
+    stat = os.stat(filename)
+    frames = np.zeros((0, 2), int)
+    end = 0
+    index = _read_frame_index(indexname)
+    if index is not None:
+        size, mtime, end0, frames0 = index
+        if size == stat.st_size and mtime == stat.st_mtime:
+            return frames0
+        if (size < stat.st_size and end0 <= size and
+            (len(frames0) == 0 or
+             _check_frame(filename, frames0[-1][0], frames0[-1][1],
+                          end0))):
+            # Frames have (most likely) been appended:
+            frames = frames0
+            end = end0
+
+    with open(filename, 'rb') as fd:
+        new, end = _scan_frames(fd, end)
+
+    nold = len(frames)
+    frames = np.concatenate((frames, new))
+    if write and world.rank == 0:
+        try:
+            _write_frame_index(indexname, frames, nold,
+                               stat.st_size, stat.st_mtime, end)
+        except (IOError, OSError):
+            pass  # read-only directory or similar
+    return frames
+
+
+def _scan_frames(fd, pos):
+    """Find the complete frames starting at byte position pos.
+
+    Returns the frames and the position after the last of them."""
+    fd.seek(pos)
+    frames = []
+    while True:
+        line = fd.readline()
+        if line.strip() == b'':
+            break
+        natoms = int(line)
+        lines = [fd.readline() for i in range(natoms + 1)]
+        if not lines[-1].endswith(b'\n'):
+            break  # incomplete frame (possibly an unfinished last line)
+        frames.append((pos, natoms))
+        pos += len(line) + sum(len(line) for line in lines)
+    return np.array(frames, int).reshape((-1, 2)), pos
+
+
+def _check_frame(filename, pos, natoms, end):
+    """Check that a frame with natoms atoms starts at pos.
+
+    Also check that the end position is at the start of a line."""
+    with open(filename, 'rb') as fd:
+        if end > 0:
+            fd.seek(end - 1)
+            if fd.read(1) != b'\n':
+                return False
+        fd.seek(pos)
+        try:
+            return int(fd.readline()) == natoms
+        except ValueError:
+            return False
+
+
+def _read_frame_index(indexname):
+    """Read sidecar index file.  Returns None if it can't be used."""
+    try:
+        with open(indexname, 'rb') as fd:
+            header = fd.read(INDEX_HEADER_SIZE).decode('ascii').split()
+            if header[:2] != ['ASE-XYZ-INDEX', '1']:
+                return None
+            size, end, nframes = (int(x) for x in header[2:5])
+            mtime = float(header[5])
+            frames = np.fromfile(fd, '<i8', 2 * nframes).reshape((-1, 2))
+    except (IOError, OSError, ValueError, IndexError, UnicodeDecodeError):
+        return None
+    if len(frames) != nframes:
+        return None
+    return size, mtime, end, frames.astype(int)
+
+
+def _write_frame_index(indexname, frames, nold, size, mtime, end):
+    """Write sidecar index file.
+
+    The first nold frames are assumed to be in the file already.  The
+    header is written last, so readers never see a header describing
+    frames that have not been written yet."""
+    header = 'ASE-XYZ-INDEX 1 {0} {1} {2} {3!r}'.format(size, end,
+                                                       len(frames), mtime)
+    header = header.ljust(INDEX_HEADER_SIZE - 1).encode('ascii') + b'\n'
+    data = frames[nold:].astype('<i8').tobytes()
+    if nold > 0:
+        with open(indexname, 'r+b') as fd:
+            fd.seek(INDEX_HEADER_SIZE + 16 * nold)
+            fd.write(data)
+            fd.truncate()
+            fd.flush()
+            fd.seek(0)
+            fd.write(header)
+    else:
+        tmpname = indexname + '.tmp{0}'.format(os.getpid())
+        with open(tmpname, 'wb') as fd:
+            fd.write(header)
+            fd.write(data)
+        rename(tmpname, indexname)
+
+
+def read_xyz(fileobj, index=-1, use_index=True):
     """
     Read from a file in Extended XYZ format
 
     index is the frame to read, default is last frame (index=-1).
+    For plain files on disk, the frames are found using a sidecar
+    index file unless use_index=False.
     """
     if isinstance(fileobj, str):
         fileobj = open(fileobj)
@@ -207,6 +337,13 @@ def read_xyz(fileobj, index=-1):
     if not isinstance(index, int) and not isinstance(index, slice):
         raise TypeError('Index argument is neither slice nor integer!')
 
+    frames = None
+    name = getattr(fileobj, 'name', None)
+    if (use_index and isinstance(name, basestring) and
+        os.path.isfile(name) and not name.endswith(('.gz', '.bz2'))):
+        # Plain file on disk: use the sidecar index
+        frames = [tuple(frame) for frame in get_frame_index(name)]
+
     # If possible, build a partial index up to the last frame required
     last_frame = None
     if isinstance(index, int) and index >= 0:
@@ -215,21 +352,22 @@ def read_xyz(fileobj, index=-1):
         if index.stop is not None and index.stop >= 0:
             last_frame = index.stop
 
-    # scan through file to find where the frames start
-    fileobj.seek(0)
-    frames = []
-    while fileobj:
-        frame_pos = fileobj.tell()
-        line = fileobj.readline()
-        if line.strip() == '':
-            break
-        natoms = int(line)
-        frames.append((frame_pos, natoms))
-        if last_frame is not None and len(frames) > last_frame:
-            break
-        fileobj.readline()  # read comment line
-        for i in range(natoms):
-            fileobj.readline()
+    if frames is None:
+        # scan through file to find where the frames start
+        fileobj.seek(0)
+        frames = []
+        while fileobj:
+            frame_pos = fileobj.tell()
+            line = fileobj.readline()
+            if line.strip() == '':
+                break
+            natoms = int(line)
+            frames.append((frame_pos, natoms))
+            if last_frame is not None and len(frames) > last_frame:
+                break
+            fileobj.readline()  # read comment line
+            for i in range(natoms):
+                fileobj.readline()
 
     if isinstance(index, int):
         if index < 0:
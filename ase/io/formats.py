@@ -75,6 +75,7 @@ all_formats = {
     'html': ('X3DOM HTML', '1S'),
     'iwm': ('?', '1F'),
     'json': ('ASE JSON database file', '+S'),
+    'jsonl': ('ASE JSON-lines database file', '+S'),
     'jsv': ('JSV file format', '1F'),
     'lammps-dump': ('LAMMPS dump file', '1F'),
     'magres': ('MAGRES ab initio NMR data file', '1S'),
@@ -120,6 +121,7 @@ format2modulename = {
     'gaussian-out': 'gaussian',
     'html': 'x3d',
     'json': 'db',
+    'jsonl': 'db',
     'lammps-dump': 'lammpsrun',
     'postgresql': 'db',
     'struct': 'wien2k',
@@ -378,6 +380,7 @@ def parse_filename(filename, index=None):
         return filename, index
     newindex = None
     if ('.json@' in filename or
+        '.jsonl@' in filename or
         '.db@' in filename or
         filename.startswith('pg://')):
         newfilename, newindex = filename.rsplit('@', 1)
@@ -433,7 +436,7 @@ def filetype(filename, read=True):
 
         if '.' in basename:
             ext = filename.rsplit('.', 1)[-1].lower()
-            if ext in ['xyz', 'cube', 'json', 'cif']:
+            if ext in ['xyz', 'cube', 'json', 'jsonl', 'cif']:
                 return ext
 
         if 'POSCAR' in basename or 'CONTCAR' in basename:
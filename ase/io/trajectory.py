@@ -12,7 +12,8 @@ from ase.parallel import world
 __all__ = ['Trajectory', 'PickleTrajectory']
 
 
-def Trajectory(filename, mode='r', atoms=None, properties=None, master=None):
+def Trajectory(filename, mode='r', atoms=None, properties=None, master=None,
+               mmap=False, buffersize=1, buffertime=None, codecs=None):
     """A Trajectory can be created in read, write or append mode.
 
     Parameters:
@@ -38,18 +39,33 @@ def Trajectory(filename, mode='r', atoms=None, properties=None, master=None):
         Controls which process does the actual writing. The
         default is that process number 0 does this.  If this
         argument is given, processes where it is True will write.
-
-    The atoms, properties and master arguments are ignores in read mode.
+    mmap: bool
+        Read arrays from a memory map of the file.  See
+        :class:`TrajectoryReader`.
+    buffersize: int
+        Number of frames to collect before they are committed to the
+        file.  See :class:`TrajectoryWriter`.
+    buffertime: float
+        Commit frames if this many seconds have passed since the last
+        commit.
+    codecs: dict
+        Compression of arrays.  See :class:`TrajectoryWriter`.
+
+    The atoms, properties, master, buffer and codecs arguments are
+    ignores in read mode.
     """
     if mode == 'r':
-        return TrajectoryReader(filename)
-    return TrajectoryWriter(filename, mode, atoms, properties, master=master)
+        return TrajectoryReader(filename, mmap=mmap)
+    return TrajectoryWriter(filename, mode, atoms, properties, master=master,
+                            buffersize=buffersize, buffertime=buffertime,
+                            codecs=codecs)
     
     
 class TrajectoryWriter:
     """Writes Atoms objects to a .traj file."""
     def __init__(self, filename, mode='w', atoms=None, properties=None,
-                 extra=[], master=None):
+                 extra=[], master=None, buffersize=1, buffertime=None,
+                 codecs=None):
         """A Trajectory writer, in write or append mode.
 
         Parameters:
@@ -75,6 +91,33 @@ class TrajectoryWriter:
             Controls which process does the actual writing. The
             default is that process number 0 does this.  If this
             argument is given, processes where it is True will write.
+        buffersize: int
+            Number of frames to collect before they are committed to the
+            file.
+        buffertime: float
+            Commit frames if this many seconds have passed since the
+            last commit.
+        codecs: dict
+            Codecs for compressing arrays.  The keys are names like
+            'positions', 'momenta' and 'calculator.forces'.  The codecs
+            are combinations of 'zlib' or 'lzma' compression, 'float32'
+            for single precision and 'delta' for storing differences from
+            the previous frame.  Example::
+
+                codecs={'positions': 'delta+zlib',
+                        'calculator.forces': 'float32+zlib'}
+
+            See :mod:`ase.io.aff` for details.  Such files can not be
+            read by older versions of ASE.
+
+        Each frame is written to the file right away, but a frame only
+        becomes visible to readers when it is committed.  Committing
+        requires updating the header and flushing the file, which is
+        slow when short MD steps are written one at a time.  With
+        buffersize=100, the header is updated once per 100 frames.  If
+        the program crashes, at most the uncommitted frames are lost -
+        the file is never corrupted.  Call flush() to commit the frames
+        written so far and remember to close() the trajectory.
         """
         if master is None:
             master = (world.rank == 0)
@@ -86,13 +129,19 @@ class TrajectoryWriter:
         self.pbc = None
         self.masses = None
 
+        self.buffersize = buffersize
+        self.buffertime = buffertime
+        self.codecs = codecs
         self._open(filename, mode)
 
     def _open(self, filename, mode):
         if mode not in 'aw':
             raise ValueError('mode must be "w" or "a".')
         if self.master:
-            self.backend = affopen(filename, mode, tag='ASE-Trajectory')
+            self.backend = affopen(filename, mode, tag='ASE-Trajectory',
+                                   buffersize=self.buffersize,
+                                   buffertime=self.buffertime,
+                                   codecs=self.codecs)
             if len(self.backend) > 0:
                 r = affopen(filename)
                 self.numbers = r.numbers
@@ -188,6 +237,10 @@ class TrajectoryWriter:
 
         b.sync()
         
+    def flush(self):
+        """Commit all frames written so far."""
+        self.backend.flush()
+
     def close(self):
         """Close the trajectory file."""
         self.backend.close()
@@ -198,21 +251,28 @@ class TrajectoryWriter:
 
 class TrajectoryReader:
     """Reads Atoms objects from a .traj file."""
-    def __init__(self, filename):
+    def __init__(self, filename, mmap=False):
         """A Trajectory in read mode.
 
         The filename traditionally ends in .traj.
+
+        With mmap=True, the positions, momenta, forces and other arrays
+        are read from a memory map of the file (for files written on a
+        machine with the same byte order).  Random access to frames of
+        large files is then much cheaper.  The atomic numbers and
+        boundary conditions are read once from the header.
         """
         
         self.numbers = None
         self.pbc = None
         self.masses = None
+        self.mmap = mmap
 
         self._open(filename)
 
     def _open(self, filename):
         try:
-            self.backend = affopen(filename, 'r')
+            self.backend = affopen(filename, 'r', mmap=self.mmap)
         except InvalidAFFError:
             raise RuntimeError('This is not a valid ASE trajectory file. '
                                'If this is an old-format (version <3.9) '
@@ -259,6 +319,31 @@ class TrajectoryReader:
         for i in range(len(self)):
             yield self[i]
 
+    def get_array(self, name, index=slice(None)):
+        """Read a quantity for many frames at once.
+
+        name: str
+            One of positions, cell, momenta, tags, magmoms and charges
+            or one of the calculator properties energy, forces, stress,
+            ...  Use 'calculator.magmoms' and 'calculator.charges' for
+            calculated magnetic moments and charges.
+        index: slice or list of int
+            Frames to read.  Default is all frames.
+
+        Returns the values stacked in one ndarray.  For example, the
+        positions of all frames have shape (nframes, natoms, 3), and
+        the energies have shape (nframes,).  No Atoms objects are
+        created, so this is much faster than iterating over the
+        trajectory::
+
+            traj = Trajectory('md.traj')
+            energies = traj.get_array('energy')
+            positions = traj.get_array('positions', slice(0, None, 10))
+        """
+        if name in all_properties and name not in ['magmoms', 'charges']:
+            name = 'calculator.' + name
+        return self.backend.stack(name, index)
+
             
 def read_atoms(backend, header=None):
     b = backend
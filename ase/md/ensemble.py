@@ -0,0 +1,303 @@
+"""Molecular dynamics for many replicas at the same time.
+
+Example::
+
+    from ase.md.ensemble import LangevinEnsemble
+    images = [atoms.copy() for i in range(128)]
+    for a in images:
+        a.calc = EMT()
+    dyn = LangevinEnsemble(images, 5 * units.fs, 300 * units.kB, 0.002)
+    dyn.run(1000)
+
+The positions and momenta of all the replicas are stored in arrays of
+shape (nrep, natoms, 3) and all replicas are advanced with the same
+NumPy operations.  The Atoms objects share these arrays, so they are
+always up to date and can be used by observers and trajectories.
+Forces are calculated with the ``calculate_batch()`` method of the
+calculators when they have one (see
+:func:`ase.calculators.calculator.group_batches`).
+"""
+
+import time
+import warnings
+
+import numpy as np
+
+from ase.calculators.calculator import group_batches
+from ase.optimize.optimize import Dynamics
+from ase.parallel import world
+from ase.units import fs, kB
+
+
+class EnsembleDynamics(Dynamics):
+    """Base-class for dynamics of many replicas."""
+    def __init__(self, images, timestep, logfile=None, loginterval=1):
+        """Ensemble dynamics object.
+
+        images: list of Atoms objects
+            The replicas.  They must have the same number of atoms and
+            each must have its own calculator.  Their positions and
+            momenta are replaced by views into the stacked arrays
+            self.positions and self.momenta, so atoms can not be added
+            or removed while the dynamics is in use.
+        timestep: float
+            The time step.
+        logfile: file object or str
+            Averages over the replicas of the total, potential and
+            kinetic energy and of the temperature.  Use '-' for stdout.
+        loginterval: int
+            Write to the logfile every loginterval steps.
+        """
+        Dynamics.__init__(self, None, logfile, None)
+        natoms = len(images[0])
+        if any(len(atoms) != natoms for atoms in images):
+            raise ValueError('All images must have the same number of atoms')
+        calcs = [atoms.calc for atoms in images]
+        if None in calcs:
+            raise ValueError('All images must have a calculator')
+        if len(set(id(calc) for calc in calcs)) != len(calcs):
+            raise ValueError('Images must have their own calculators')
+
+        self.images = images
+        self.dt = timestep
+        self.batches = None  # see group_batches()
+        self.rest = None
+        self.positions = np.array([atoms.positions for atoms in images])
+        self.momenta = np.array([atoms.get_momenta() for atoms in images])
+        for atoms, r, p in zip(images, self.positions, self.momenta):
+            atoms.arrays['positions'] = r
+            atoms.arrays['momenta'] = p
+
+        self.masses = np.array([atoms.get_masses() for atoms in images])
+        if 0 in self.masses:
+            warnings.warn('Zero mass encountered in atoms; this will '
+                          'likely lead to errors if the massless atoms '
+                          'are unconstrained.')
+        self.masses.shape = (len(images), natoms, 1)
+
+        if self.logfile is not None:
+            self.logfile.write('%-8s %-9s %12s %12s %12s  %6s\n' %
+                               ('', 'Time[ps]', '<Etot>[eV]', '<Epot>[eV]',
+                                '<Ekin>[eV]', '<T>[K]'))
+            self.attach(self.log, interval=loginterval)
+
+    def run(self, steps=50):
+        """Integrate equations of motion for all replicas."""
+        self.batches = None  # calculators may have changed
+        f = self.get_forces()
+        for step in range(steps):
+            f = self.step(f)
+            self.nsteps += 1
+            self.call_observers()
+
+    def get_time(self):
+        return self.nsteps * self.dt
+
+    def get_forces(self):
+        """Forces on all replicas as an (nrep, natoms, 3) array."""
+        if self.batches is None:
+            index = dict((id(atoms), k) for k, atoms in enumerate(self.images))
+            batches, rest = group_batches(self.images)
+            self.batches = [(batch, [index[id(atoms)] for atoms in batch])
+                            for batch in batches]
+            self.rest = [index[id(atoms)] for atoms in rest]
+
+        forces = np.empty_like(self.positions)
+        for batch, indices in self.batches:
+            batch[0].calc.calculate_batch(batch)
+            forces[indices] = [atoms.calc.results['forces'] for atoms in batch]
+        for k in self.rest:
+            forces[k] = self.images[k].get_forces(md=True)
+        for k in self.constrained():
+            if k in self.rest:
+                continue
+            # Same as Atoms.get_forces(md=True):
+            atoms = self.images[k]
+            for constraint in atoms.constraints:
+                if hasattr(constraint, 'adjust_potential_energy'):
+                    constraint.adjust_forces(atoms, forces[k])
+        return forces
+
+    def get_potential_energies(self):
+        """Potential energies of the replicas."""
+        return np.array([atoms.get_potential_energy()
+                         for atoms in self.images])
+
+    def get_kinetic_energies(self):
+        """Kinetic energies of the replicas."""
+        return 0.5 * (self.momenta**2 / self.masses).sum(axis=(1, 2))
+
+    def get_temperatures(self):
+        """Temperatures of the replicas in Kelvin."""
+        natoms = self.positions.shape[1]
+        return self.get_kinetic_energies() / (1.5 * natoms * kB)
+
+    def set_positions(self, positions):
+        """Set positions of all replicas, honoring any constraints."""
+        positions = np.array(positions, float)
+        for k in self.constrained():
+            atoms = self.images[k]
+            for constraint in atoms.constraints:
+                constraint.adjust_positions(atoms, positions[k])
+        self.positions[:] = positions
+
+    def set_momenta(self, momenta):
+        """Set momenta of all replicas, honoring any constraints."""
+        momenta = np.array(momenta, float)
+        for k in self.constrained():
+            atoms = self.images[k]
+            for constraint in atoms.constraints:
+                if hasattr(constraint, 'adjust_momenta'):
+                    constraint.adjust_momenta(atoms, momenta[k])
+        self.momenta[:] = momenta
+
+    def constrained(self):
+        """Indices of the replicas that have constraints."""
+        return [k for k, atoms in enumerate(self.images) if atoms.constraints]
+
+    def log(self):
+        epot = self.get_potential_energies().mean()
+        ekin = self.get_kinetic_energies().mean()
+        T = self.get_temperatures().mean()
+        self.logfile.write('%-8s %-9.3f %12.4f %12.4f %12.4f  %6.1f\n' %
+                           (time.strftime('%H:%M:%S'),
+                            self.get_time() / (1000 * fs),
+                            epot + ekin, epot, ekin, T))
+        self.logfile.flush()
+
+
+class VelocityVerletEnsemble(EnsembleDynamics):
+    def __init__(self, images, timestep, logfile=None, loginterval=1):
+        """Velocity Verlet dynamics for many replicas.
+
+        Each replica follows the same trajectory as with
+        :class:`~ase.md.verlet.VelocityVerlet`.  See
+        :class:`EnsembleDynamics` for the parameters."""
+        EnsembleDynamics.__init__(self, images, timestep, logfile,
+                                  loginterval)
+
+    def step(self, f):
+        p = self.momenta + 0.5 * self.dt * f
+        r = self.positions.copy()
+
+        # First part of RATTLE:
+        self.set_positions(r + self.dt * p / self.masses)
+        constrained = self.constrained()
+        if constrained:
+            p[constrained] = ((self.positions[constrained] - r[constrained]) *
+                              self.masses[constrained] / self.dt)
+        self.momenta[:] = p
+
+        f = self.get_forces()
+
+        # Second part of RATTLE:
+        self.set_momenta(self.momenta + 0.5 * self.dt * f)
+        return f
+
+
+class LangevinEnsemble(EnsembleDynamics):
+    def __init__(self, images, timestep, temperature, friction, fixcm=True,
+                 logfile=None, loginterval=1, rng=np.random,
+                 communicator=world):
+        """Langevin dynamics for many replicas.
+
+        Uses the same propagator as :class:`~ase.md.langevin.Langevin`.
+
+        temperature: float or array
+            The temperature of the heat bath in energy units.  Either
+            one value for all replicas or one value per replica.
+        friction: float or array
+            Friction coefficient.  One value or one value per replica.
+        fixcm: bool
+            Keep the center of mass of each replica fixed.
+        rng: RandomState
+            Random number generator.  Default is the global generator
+            of numpy, which is what Langevin uses.  With one replica,
+            the two give the same trajectory.
+        communicator: Communicator
+            The random numbers are broadcast from rank 0.  Use None to
+            skip that.
+
+        See :class:`EnsembleDynamics` for the other parameters."""
+        EnsembleDynamics.__init__(self, images, timestep, logfile,
+                                  loginterval)
+        self.temp = temperature
+        self.fr = friction
+        self.fixcm = fixcm
+        self.rng = rng
+        self.communicator = communicator
+        self.updatevars()
+
+    def set_temperature(self, temperature):
+        self.temp = temperature
+        self.updatevars()
+
+    def set_friction(self, friction):
+        self.fr = friction
+        self.updatevars()
+
+    def set_timestep(self, timestep):
+        self.dt = timestep
+        self.updatevars()
+
+    def per_replica(self, x):
+        """Reshape scalar or one value per replica for broadcasting."""
+        x = np.asarray(x, float)
+        if x.ndim == 1:
+            x = x.reshape((-1, 1, 1))
+        return x
+
+    def updatevars(self):
+        dt = self.dt
+        T = self.per_replica(self.temp)
+        fr = self.per_replica(self.fr)
+        sigma = np.sqrt(2 * T * fr / self.masses)
+
+        self.c1 = dt / 2. - dt * dt * fr / 8.
+        self.c2 = dt * fr / 2 - dt * dt * fr * fr / 8.
+        self.c3 = np.sqrt(dt) * sigma / 2. - dt**1.5 * fr * sigma / 8.
+        self.c5 = dt**1.5 * sigma / (2 * np.sqrt(3))
+        self.c4 = fr / 2. * self.c5
+
+    def step(self, f):
+        masses = self.masses
+        v = self.momenta / masses
+
+        xi = self.rng.standard_normal(size=v.shape)
+        eta = self.rng.standard_normal(size=v.shape)
+        if self.communicator is not None:
+            self.communicator.broadcast(xi, 0)
+            self.communicator.broadcast(eta, 0)
+
+        # First halfstep in the velocity.
+        v += (self.c1 * f / masses - self.c2 * v +
+              self.c3 * xi - self.c4 * eta)
+
+        # Full step in positions (this applies constraints if any):
+        x = self.positions.copy()
+        if self.fixcm:
+            old_cm = self.get_centers_of_mass()
+        self.set_positions(x + self.dt * v + self.c5 * eta)
+        if self.fixcm:
+            d = old_cm - self.get_centers_of_mass()
+            self.set_positions(self.positions + d[:, np.newaxis])
+
+        # Recalculate velocities after RATTLE constraints are applied:
+        v = (self.positions - x - self.c5 * eta) / self.dt
+        f = self.get_forces()
+
+        # Update the velocities:
+        v += (self.c1 * f / masses - self.c2 * v +
+              self.c3 * xi - self.c4 * eta)
+
+        if self.fixcm:  # subtract center of mass velocities
+            v -= ((masses * v).sum(1) / masses.sum(1))[:, np.newaxis]
+
+        # Second part of RATTLE:
+        self.set_momenta(v * masses)
+        return f
+
+    def get_centers_of_mass(self):
+        """Centers of mass of the replicas as an (nrep, 3) array."""
+        masses = self.masses
+        return (masses * self.positions).sum(1) / masses.sum(1)
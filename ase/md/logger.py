@@ -20,9 +20,14 @@ class MDLogger:
     peratom=False: Write energies per atom.
 
     mode="a":      How the file is opened if logfile is a filename.
+
+    neighborlist=None: A NeighborList object.  Include its statistics
+                   (number of builds and checks, neighbors per atom,
+                   largest displacement relative to the skin and time
+                   spent in builds and checks) in the log.
     """
     def __init__(self, dyn, atoms, logfile, header=True, stress=False,
-                 peratom=False, mode="a"):
+                 peratom=False, mode="a", neighborlist=None):
         import ase.parallel
         if ase.parallel.rank > 0:
             logfile="/dev/null"  # Only log on master
@@ -43,6 +48,7 @@ class MDLogger:
             self.ownlogfile = True
         self.stress = stress
         self.peratom = peratom
+        self.neighborlist = neighborlist
         if self.dyn is not None:
             self.hdr = "%-9s " % ("Time[ps]",)
             self.fmt = "%-9.3f "
@@ -69,6 +75,11 @@ class MDLogger:
         if self.stress:
             self.hdr += "      ---------------------- stress [GPa] -----------------------"
             self.fmt += 6*" %10.3f"
+        if self.neighborlist is not None:
+            self.hdr += "  %7s %7s %7s %7s %9s %9s %9s" % (
+                "Builds", "Partial", "Checks", "Nb/atom", "dmax/skin",
+                "tBuild[s]", "tCheck[s]")
+            self.fmt += "  %7d %7d %7d %7.1f %9.3f %9.3f %9.3f"
         self.fmt += "\n"
         if header:
             self.logfile.write(self.hdr+"\n")
@@ -95,6 +106,11 @@ class MDLogger:
         dat += (epot+ekin, epot, ekin, temp)
         if self.stress:
             dat += tuple(self.atoms.get_stress() / units.GPa)
+        if self.neighborlist is not None:
+            stats = self.neighborlist.stats
+            dat += (stats.nbuilds, stats.npartialbuilds, stats.nchecks,
+                    stats.neighbors_per_atom, stats.max_displacement,
+                    stats.build_time, stats.check_time)
         self.logfile.write(self.fmt % dat)
         self.logfile.flush()
         
@@ -1,8 +1,56 @@
+from __future__ import division
+import time
 from math import sqrt
 
 import numpy as np
 
 
+class NeighborListStatistics:
+    """Statistics for the updates of a neighbor list.
+
+    nbuilds: int
+        Number of full builds of the list.
+    npartialbuilds: int
+        Number of partial rebuilds (only with incremental=True).
+    nchecks: int
+        Number of times update() has checked if the list is up to date.
+    build_time: float
+        Time in seconds spent building the list.
+    check_time: float
+        Time in seconds spent checking if the list is up to date.
+    neighbors_per_atom: float
+        Average number of neighbors per atom after the last build.
+    max_displacement: float
+        Largest displacement of an atom from its reference position
+        seen in any check, in units of the skin distance.
+    """
+
+    names = ['nbuilds', 'npartialbuilds', 'nchecks', 'build_time',
+             'check_time', 'neighbors_per_atom', 'max_displacement']
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.nbuilds = 0
+        self.npartialbuilds = 0
+        self.nchecks = 0
+        self.build_time = 0.0
+        self.check_time = 0.0
+        self.neighbors_per_atom = 0.0
+        self.max_displacement = 0.0
+
+    def todict(self):
+        return dict((name, getattr(self, name)) for name in self.names)
+
+    def __str__(self):
+        return ('{0} builds, {1} partial builds, {2} checks, '
+                'build time: {3:.3f} s, check time: {4:.3f} s, '
+                '{5:.1f} neighbors per atom, '
+                'max. displacement: {6:.3f} * skin'
+                .format(*[getattr(self, name) for name in self.names]))
+
+
 class NeighborList:
     """Neighbor list object.
 
@@ -21,6 +69,20 @@ class NeighborList:
     bothways: bool
         Return all neighbors.  Default is to return only "half" of
         the neighbors.
+    method: str
+        Either 'cells' (default) or 'images'.  With 'cells' the atoms
+        are sorted into bins and the cost of building the list scales
+        linearly with the number of atoms.  With 'images' all pairs of
+        atoms are tested for every periodic image which scales as
+        O(N^2).  Both give the same neighbors.
+    incremental: bool
+        Only update the neighbors of the atoms that have moved more
+        than the skin-distance instead of rebuilding the whole list.
+        Small changes of the unit cell are handled without a rebuild.
+        Requires method='cells'.
+
+    The ``stats`` attribute is a :class:`NeighborListStatistics` object
+    that counts builds and checks and records the time spent in them.
 
     Example::
 
@@ -31,13 +93,20 @@ class NeighborList:
     """
 
     def __init__(self, cutoffs, skin=0.3, sorted=False, self_interaction=True,
-                 bothways=False):
+                 bothways=False, method='cells', incremental=False):
+        if method not in ['cells', 'images']:
+            raise ValueError('Unknown method: ' + method)
+        if incremental and method != 'cells':
+            raise ValueError("Incremental updates require method='cells'")
         self.cutoffs = np.asarray(cutoffs) + skin
         self.skin = skin
         self.sorted = sorted
         self.self_interaction = self_interaction
         self.bothways = bothways
+        self.method = method
+        self.incremental = incremental
         self.nupdates = 0
+        self.stats = NeighborListStatistics()
 
     def update(self, atoms):
         """Make sure the list is up to date."""
@@ -45,17 +114,82 @@ class NeighborList:
             self.build(atoms)
             return True
 
-        if ((self.pbc != atoms.get_pbc()).any() or
-            (self.cell != atoms.get_cell()).any() or
-            ((self.positions - atoms.get_positions())**2).sum(1).max() >
-            self.skin**2):
+        t0 = time.time()
+        build_time = self.stats.build_time
+        self.stats.nchecks += 1
+        if self.incremental:
+            updated = self._update_incremental(atoms)
+        elif ((self.pbc != atoms.get_pbc()).any() or
+              (self.cell != atoms.get_cell()).any() or
+              self._max_displacement(self.positions -
+                                     atoms.get_positions()) > self.skin):
+            self.build(atoms)
+            updated = True
+        else:
+            updated = False
+        self.stats.check_time += (time.time() - t0 -
+                                  (self.stats.build_time - build_time))
+        return updated
+
+    def _max_displacement(self, displacements):
+        """Find largest displacement and record it in the statistics."""
+        if len(displacements) == 0:
+            return 0.0
+        dmax = sqrt((displacements**2).sum(1).max())
+        if dmax > 0.0:
+            ratio = dmax / self.skin if self.skin > 0.0 else np.inf
+            self.stats.max_displacement = max(self.stats.max_displacement,
+                                              ratio)
+        return dmax
+
+    def _update_incremental(self, atoms):
+        """Update only the neighbors of the atoms that moved too much.
+
+        A change of the cell is handled by scaling the reference
+        positions with the cell.  This can shrink the distance between
+        two reference positions by at most a factor equal to the smallest
+        singular value of the deformation, so the allowed displacement
+        of each atom is reduced accordingly.  A full build is done if
+        the deformation is too large or too many atoms have moved."""
+
+        if len(atoms) != len(self.positions) or (self.pbc !=
+                                                 atoms.get_pbc()).any():
+            self.build(atoms)
+            return True
+
+        if len(atoms) == 0:
+            return False
+
+        positions = atoms.get_positions()
+        cell = atoms.get_cell()
+        if (cell == self.cell).all():
+            allowed = self.skin
+            reference = self.positions
+        else:
+            deformation = np.linalg.solve(self.cell, cell)
+            smin = np.linalg.svd(deformation, compute_uv=False).min()
+            allowed = (self.skin -
+                       max(0.0, 1.0 - smin) * self.cutoffs.max())
+            if allowed <= 0.0:
+                self.build(atoms)
+                return True
+            reference = np.dot(self.positions, deformation)
+
+        displacements = positions - reference
+        if self._max_displacement(displacements) <= allowed:
+            return False
+
+        moved = (displacements**2).sum(1) > allowed**2
+        if moved.sum() > 0.25 * len(atoms):
             self.build(atoms)
             return True
 
-        return False
+        self._build_partial(atoms, moved)
+        return True
 
     def build(self, atoms):
         """Build the list."""
+        t0 = time.time()
         self.positions = atoms.get_positions()
         self.pbc = atoms.get_pbc()
         self.cell = atoms.get_cell()
@@ -63,7 +197,7 @@ class NeighborList:
         if len(self.cutoffs) != len(atoms):
             raise ValueError('Wrong number of cutoff radii: {0} != {1}'
                              .format(len(self.cutoffs), len(atoms)))
-        
+
         if len(self.cutoffs) > 0:
             rcmax = self.cutoffs.max()
         else:
@@ -71,12 +205,122 @@ class NeighborList:
 
         icell = np.linalg.inv(self.cell)
         scaled = np.dot(self.positions, icell)
+        natoms = len(atoms)
+        self._scaled0 = np.empty((natoms, 3))
+        self._offsets = np.empty((natoms, 3), int)
+        self._positions0 = np.empty((natoms, 3))
+        self._set_reference(np.arange(natoms), scaled)
+
+        if self.method == 'cells':
+            self._make_bins(icell, rcmax)
+            i, j, s = self._search_cells(np.arange(natoms))
+        else:
+            i, j, s = self._search_images(icell, rcmax)
+
+        self._store(i, j, s)
+        self.stats.nbuilds += 1
+        self.stats.build_time += time.time() - t0
+
+    def _build_partial(self, atoms, moved):
+        """Rebuild the neighbors of the atoms that have moved.
+
+        moved: ndarray of bool
+            Mask of atoms that have moved too much.
+
+        The reference positions of the moved atoms are updated (in the
+        cell used for the last full build) and they are moved to their
+        new bins.  Pairs involving moved atoms are then replaced by new
+        ones while all other pairs are kept."""
+
+        t0 = time.time()
+        indices = moved.nonzero()[0]
+        scaled = np.linalg.solve(atoms.get_cell().T,
+                                 atoms.positions[indices].T).T
+        self.positions[indices] = np.dot(scaled, self.cell)
+        self._set_reference(indices, scaled)
+
+        bins = self._get_bins(self._scaled0[indices])
+        if (bins != self._bins[indices]).any():
+            self._bins[indices] = bins
+            self._sort_bins()
+
+        keep = ~(moved[self._pair_i] | moved[self._pair_j])
+        i, j, s = self._search_cells(indices, moved)
+        self._store(np.concatenate((self._pair_i[keep], i)),
+                    np.concatenate((self._pair_j[keep], j)),
+                    np.concatenate((self._pair_s[keep], s)))
+        self.stats.npartialbuilds += 1
+        self.stats.build_time += time.time() - t0
+
+    def _set_reference(self, indices, scaled):
+        """Set reference scaled positions for some atoms.
+
+        Periodic directions are wrapped to [0, 1[ and the integer
+        offsets of the wrapping are stored."""
+
         scaled0 = scaled.copy()
+        for i in range(3):
+            if self.pbc[i]:
+                scaled0[:, i] %= 1.0
+        self._scaled0[indices] = scaled0
+        self._offsets[indices] = (scaled0 - scaled).round().astype(int)
+        self._positions0[indices] = np.dot(scaled0, self.cell)
+
+    def _store(self, i, j, s):
+        """Store half list of pairs and image shifts.
+
+        The pairs are sorted by first atom, image shift and second atom
+        and the list is expanded to a full list or sorted if requested."""
+
+        order = np.lexsort((j, s[:, 2], s[:, 1], s[:, 0], i))
+        i = i[order]
+        j = j[order]
+        s = s[order]
+        self._pair_i = i
+        self._pair_j = j
+        self._pair_s = s
+
+        natoms = len(self.positions)
+        disp = s + self._offsets[j] - self._offsets[i]
+
+        self.nneighbors = len(i)
+        self.npbcneighbors = disp.any(1).sum()
 
+        if self.bothways:
+            # Append the reversed pairs to the end of each atom's list:
+            reversed = np.arange(2 * len(i)) >= len(i)
+            i, j = np.concatenate((i, j)), np.concatenate((j, i))
+            disp = np.concatenate((disp, -disp))
+            i, j, disp = self._reorder(i, j, disp, reversed)
+
+        if self.sorted:
+            # Move neighbors with a lower index to the end of their list:
+            reversed = j < i
+            i, j = np.where(reversed, j, i), np.where(reversed, i, j)
+            disp = np.where(reversed[:, np.newaxis], -disp, disp)
+            i, j, disp = self._reorder(i, j, disp, reversed)
+
+        self.first_neigh = np.zeros(natoms + 1, int)
+        self.first_neigh[1:] = np.cumsum(np.bincount(i, minlength=natoms))
+        self.pair_first = i
+        self.pair_second = j
+        self.offset_vec = disp
+
+        self.stats.neighbors_per_atom = len(j) / max(natoms, 1)
+        self.nupdates += 1
+
+    def _reorder(self, i, j, disp, reversed):
+        """Sort pairs by first atom with reversed pairs last in each list.
+
+        The order is otherwise kept (stable sort)."""
+        order = np.lexsort((reversed, i))
+        return i[order], j[order], disp[order]
+
+    def _search_images(self, icell, rcmax):
+        """Loop over all periodic images and all atoms: O(N^2)."""
         N = []
         for i in range(3):
             if self.pbc[i]:
-                scaled0[:, i] %= 1.0
                 v = icell[:, i]
                 h = 1 / sqrt(np.dot(v, v))
                 n = int(2 * rcmax / h) + 1
@@ -84,15 +328,13 @@ class NeighborList:
                 n = 0
             N.append(n)
 
-        offsets = (scaled0 - scaled).round().astype(int)
-        positions0 = np.dot(scaled0, self.cell)
-        natoms = len(atoms)
+        positions0 = self._positions0
+        natoms = len(positions0)
         indices = np.arange(natoms)
 
-        self.nneighbors = 0
-        self.npbcneighbors = 0
-        self.neighbors = [np.empty(0, int) for a in range(natoms)]
-        self.displacements = [np.empty((0, 3), int) for a in range(natoms)]
+        ilist = [np.empty(0, int)]
+        jlist = [np.empty(0, int)]
+        slist = [np.empty((0, 3), int)]
         for n1 in range(0, N[0] + 1):
             for n2 in range(-N[1], N[1] + 1):
                 for n3 in range(-N[2], N[2] + 1):
@@ -108,46 +350,151 @@ class NeighborList:
                                 i = i[i >= a]
                             else:
                                 i = i[i > a]
-                        self.nneighbors += len(i)
-                        self.neighbors[a] = np.concatenate(
-                            (self.neighbors[a], i))
-                        disp = np.empty((len(i), 3), int)
-                        disp[:] = (n1, n2, n3)
-                        disp += offsets[i] - offsets[a]
-                        self.npbcneighbors += disp.any(1).sum()
-                        self.displacements[a] = np.concatenate(
-                            (self.displacements[a], disp))
+                        ilist.append(np.zeros(len(i), int) + a)
+                        jlist.append(i)
+                        s = np.empty((len(i), 3), int)
+                        s[:] = (n1, n2, n3)
+                        slist.append(s)
 
-        if self.bothways:
-            neighbors2 = [[] for a in range(natoms)]
-            displacements2 = [[] for a in range(natoms)]
-            for a in range(natoms):
-                for b, disp in zip(self.neighbors[a], self.displacements[a]):
-                    neighbors2[b].append(a)
-                    displacements2[b].append(-disp)
-            for a in range(natoms):
-                # Force neighbors to be integer array
-                self.neighbors[a] = np.array(np.concatenate((self.neighbors[a],
-                                                    neighbors2[a])), int)
-                self.displacements[a] = np.array(list(self.displacements[a]) +
-                                                 displacements2[a])
+        return (np.concatenate(ilist), np.concatenate(jlist),
+                np.concatenate(slist))
 
-        if self.sorted:
-            for a, i in enumerate(self.neighbors):
-                mask = (i < a)
-                if mask.any():
-                    j = i[mask]
-                    offsets = self.displacements[a][mask]
-                    for b, offset in zip(j, offsets):
-                        self.neighbors[b] = np.concatenate(
-                            (self.neighbors[b], [a]))
-                        self.displacements[b] = np.concatenate(
-                                (self.displacements[b], [-offset]))
-                    mask = np.logical_not(mask)
-                    self.neighbors[a] = self.neighbors[a][mask]
-                    self.displacements[a] = self.displacements[a][mask]
+    def _make_bins(self, icell, rcmax):
+        """Sort atoms into bins.
 
-        self.nupdates += 1
+        The bins are slabs in scaled coordinates whose thickness
+        perpendicular to the lattice planes is at least twice the
+        largest cutoff, so all neighbors of an atom are found in the
+        bins next to its own bin - also for skewed cells."""
+
+        scaled0 = self._scaled0
+        natoms = len(scaled0)
+        rc = 2 * rcmax
+
+        # Number of bins, range of scaled coordinates and number of
+        # neighboring bins to search in each direction:
+        nbins = np.ones(3, int)
+        smin = np.zeros(3)
+        length = np.ones(3)
+        heights = 1 / np.sqrt((icell**2).sum(0))
+        for i in range(3):
+            if not self.pbc[i] and natoms > 0:
+                smin[i] = scaled0[:, i].min()
+                length[i] = scaled0[:, i].max() - smin[i]
+            if rc > 0.0:
+                nbins[i] = max(1, int(length[i] * heights[i] / rc))
+
+        # Avoid huge numbers of empty bins for dilute systems:
+        maxbins = max(8 * natoms, 27)
+        if nbins.prod() > maxbins:
+            f = (nbins.prod() / maxbins)**(1 / 3)
+            nbins = np.maximum(1, (nbins / f).astype(int))
+
+        nsearch = np.ones(3, int)
+        for i in range(3):
+            if self.pbc[i] and rc > 0.0:
+                nsearch[i] = int(np.ceil(rc * nbins[i] / heights[i]))
+
+        self._nbins = nbins
+        self._smin = smin
+        self._length = length
+        self._nsearch = nsearch
+        self._bins = self._get_bins(scaled0)
+        self._sort_bins()
+
+    def _get_bins(self, scaled0):
+        """Find bins of atoms.
+
+        Atoms outside the range of the bins in non-periodic directions
+        are put in the outermost bins.  That is slow, but correct."""
+        bins = np.zeros((len(scaled0), 3), int)
+        for i in range(3):
+            if self._length[i] > 0.0:
+                b = np.floor((scaled0[:, i] - self._smin[i]) /
+                             self._length[i] * self._nbins[i]).astype(int)
+                bins[:, i] = np.clip(b, 0, self._nbins[i] - 1)
+        return bins
+
+    def _flat_bins(self, bins):
+        nbins = self._nbins
+        return bins[:, 0] + nbins[0] * (bins[:, 1] + nbins[1] * bins[:, 2])
+
+    def _sort_bins(self):
+        binindices = self._flat_bins(self._bins)
+        self._order = np.argsort(binindices, kind='mergesort')
+        self._counts = np.bincount(binindices,
+                                   minlength=self._nbins.prod())
+        self._starts = np.cumsum(self._counts) - self._counts
+
+    def _search_cells(self, indices, mask=None):
+        """Find neighbors of some atoms by looking in neighboring bins.
+
+        indices: ndarray of int
+            Atoms to find neighbors of.
+        mask: ndarray of bool
+            Mask of the same atoms (only needed if not all atoms are
+            included).
+
+        Returns pairs for a half list with image shifts - the same half
+        as _search_images() gives.  Pairs between atoms in indices and
+        other atoms are flipped if needed."""
+
+        natoms = len(self._scaled0)
+        positions0 = self._positions0
+        cell = self.cell
+        nbins = self._nbins
+        nsearch = self._nsearch
+
+        ilist = [np.empty(0, int)]
+        jlist = [np.empty(0, int)]
+        slist = [np.empty((0, 3), int)]
+
+        if natoms == 0 or 2 * self.cutoffs.max() <= 0.0:
+            indices = indices[:0]
+
+        for n1 in range(-nsearch[0], nsearch[0] + 1):
+            for n2 in range(-nsearch[1], nsearch[1] + 1):
+                for n3 in range(-nsearch[2], nsearch[2] + 1):
+                    b = self._bins[indices] + (n1, n2, n3)
+                    shifts = b // nbins
+                    b -= shifts * nbins
+                    ok = (self.pbc | (shifts == 0)).all(1)
+                    a = indices[ok]
+                    b = self._flat_bins(b[ok])
+                    c = self._counts[b]
+                    i = np.repeat(a, c)
+                    first = np.repeat(self._starts[b] - np.cumsum(c) + c, c)
+                    j = self._order[first + np.arange(len(i))]
+                    s = np.repeat(shifts[ok], c, axis=0)
+                    d = positions0[j] + np.dot(s, cell) - positions0[i]
+                    within = ((d**2).sum(1) <
+                              (self.cutoffs[i] + self.cutoffs[j])**2)
+                    i = i[within]
+                    j = j[within]
+                    s = s[within]
+
+                    # Keep only half of the pairs:
+                    s1, s2, s3 = s.T
+                    zero = ~s.any(1)
+                    half = ((s1 > 0) |
+                            (s1 == 0) & ((s2 > 0) |
+                                         (s2 == 0) & (s3 > 0)) |
+                            zero & (j > i))
+                    if self.self_interaction:
+                        half |= zero & (j == i)
+                    if mask is not None:
+                        # Pairs with atoms that are not searched
+                        # must be flipped:
+                        flip = ~half & ~mask[j]
+                        i[flip], j[flip] = j[flip], i[flip]
+                        s[flip] *= -1
+                        half |= flip
+                    ilist.append(i[half])
+                    jlist.append(j[half])
+                    slist.append(s[half])
+
+        return (np.concatenate(ilist), np.concatenate(jlist),
+                np.concatenate(slist))
 
     def get_neighbors(self, a):
         """Return neighbors of atom number a.
@@ -164,4 +511,50 @@ class NeighborList:
         then get_neighbors(b) will not return a as a neighbor - unless
         bothways=True was used."""
 
-        return self.neighbors[a], self.displacements[a]
+        n1 = self.first_neigh[a]
+        n2 = self.first_neigh[a + 1]
+        return self.pair_second[n1:n2], self.offset_vec[n1:n2]
+
+    def get_pairs(self, atoms=None):
+        """Return all pairs of neighbors at once.
+
+        Returns four arrays: first atom indices, second atom indices,
+        offsets and distance vectors.  Row number k describes the
+        pair i[k], j[k] where::
+
+          d[k] = (atoms.positions[j[k]] + dot(offsets[k], atoms.cell) -
+                  atoms.positions[i[k]])
+
+        The pairs are grouped by first atom in the same order as
+        returned by get_neighbors().  If atoms is not given, the
+        positions and cell from the last build of the list are used.
+        This is convenient for vectorizing calculators::
+
+          i, j, offsets, d = nl.get_pairs(atoms)
+          r = np.sqrt((d**2).sum(1))
+          ...
+          forces = np.zeros((len(atoms), 3))
+          for k in range(3):
+              forces[:, k] = (np.bincount(i, f[:, k], len(atoms)) -
+                              np.bincount(j, f[:, k], len(atoms)))
+        """
+
+        if atoms is None:
+            positions = self.positions
+            cell = self.cell
+        else:
+            positions = atoms.positions
+            cell = atoms.cell
+        i = self.pair_first
+        j = self.pair_second
+        d = positions[j] + np.dot(self.offset_vec, cell) - positions[i]
+        return i, j, self.offset_vec, d
+
+    def get_all_neighbors(self):
+        """Return all neighbors in compressed sparse row format.
+
+        Returns three arrays: first, indices and offsets.  The
+        neighbors of atom a are indices[first[a]:first[a + 1]] and
+        their offsets are offsets[first[a]:first[a + 1]]."""
+
+        return self.first_neigh, self.pair_second, self.offset_vec
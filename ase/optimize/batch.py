@@ -0,0 +1,143 @@
+"""Relax many independent structures in lockstep.
+
+Example::
+
+    from ase.optimize.batch import BatchOptimizer
+    for atoms in images:
+        atoms.calc = EMT()
+    opt = BatchOptimizer(images, BFGS)
+    converged = opt.run(fmax=0.05)
+
+In each step, the forces on all the unconverged structures are
+calculated together.  Calculators with a ``calculate_batch()`` method
+(:class:`~ase.calculators.lj.LennardJones`,
+:class:`~ase.calculators.emt.EMT`,
+:class:`~ase.calculators.morse.MorsePotential` and
+:class:`~ase.calculators.eam.EAM`) evaluate all structures in one
+vectorized call.  Other calculators can be run in a pool of worker
+processes.
+"""
+
+import sys
+import time
+from math import sqrt
+
+from ase.calculators.calculator import calculate_batches
+from ase.optimize.bfgs import BFGS
+
+
+def _calculate(atoms):
+    """Worker: calculate energy and forces."""
+    atoms.get_potential_energy()
+    atoms.get_forces()
+    return atoms.calc.results
+
+
+class BatchOptimizer:
+    def __init__(self, images, optimizer=BFGS, logfile='-', workers=None,
+                 **kwargs):
+        """Relax many structures at the same time.
+
+        images: list of Atoms objects
+            Each Atoms object must have its own calculator.
+        optimizer: Optimizer class
+            BFGS, FIRE, LBFGS, ...
+        logfile: file object or str
+            One line per step with the number of structures that are not
+            converged yet and their largest force.  Use '-' for stdout.
+        workers: int
+            Number of worker processes for calculators that can not do
+            batches.  Default is to calculate them one at a time in this
+            process.  The energy and forces are copied back to the
+            calculators, but other changes to the state of the
+            calculators made by the workers are lost.
+
+        Other keyword arguments (maxstep, dt, ...) are passed on to the
+        optimizers.  An optimizer for image number i is available as
+        self.optimizers[i].
+        """
+        calcs = [atoms.calc for atoms in images]
+        if None in calcs:
+            raise ValueError('All images must have a calculator')
+        if len(set(id(calc) for calc in calcs)) != len(calcs):
+            raise ValueError('Images must have their own calculators')
+
+        self.images = images
+        self.optimizers = [optimizer(atoms, logfile=None, **kwargs)
+                           for atoms in images]
+        self.workers = workers
+
+        if isinstance(logfile, str):
+            if logfile == '-':
+                logfile = sys.stdout
+            else:
+                logfile = open(logfile, 'a')
+        self.logfile = logfile
+        self.nsteps = 0
+
+    def calculate(self, images, pool=None):
+        """Calculate energies and forces for images."""
+        rest = calculate_batches(images)
+        if pool is not None and len(rest) > 1:
+            for atoms, results in zip(rest, pool.map(_calculate, rest)):
+                atoms.calc.atoms = atoms.copy()
+                atoms.calc.results = results
+        # Else, the optimizers will do the rest one at a time
+
+    def run(self, fmax=0.05, steps=100000000):
+        """Run optimizers until all structures have converged.
+
+        Structures are dropped from the batch when the forces on all
+        individual atoms are less than *fmax*.  Returns list of
+        booleans telling which structures have converged.  Structures
+        that were not converged after *steps* steps are marked as not
+        converged."""
+
+        pool = None
+        if self.workers is not None and self.workers > 1:
+            import multiprocessing
+            pool = multiprocessing.Pool(self.workers)
+
+        converged = [False] * len(self.images)
+        active = list(range(len(self.images)))
+        step = 0
+        try:
+            while active and step < steps:
+                self.calculate([self.images[i] for i in active], pool)
+                fmaxmax = 0.0
+                remaining = []
+                for i in active:
+                    opt = self.optimizers[i]
+                    opt.fmax = fmax
+                    f = opt.atoms.get_forces()
+                    if opt.logfile is not None:
+                        opt.log(f)
+                    opt.call_observers()
+                    if opt.converged(f):
+                        converged[i] = True
+                        continue
+                    fmaxmax = max(fmaxmax, (f**2).sum(axis=1).max())
+                    opt.step(f)
+                    opt.nsteps += 1
+                    remaining.append(i)
+                self.log(len(remaining), sqrt(fmaxmax))
+                active = remaining
+                self.nsteps += 1
+                step += 1
+        finally:
+            for opt in self.optimizers:
+                opt.write_checkpoint(wait=True)
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        return converged
+
+    def log(self, nactive, fmax):
+        if self.logfile is None:
+            return
+        T = time.localtime()
+        name = self.__class__.__name__
+        self.logfile.write('%s: %3d  %02d:%02d:%02d %6d %12.4f\n' %
+                           (name, self.nsteps, T[3], T[4], T[5],
+                            nactive, fmax))
+        self.logfile.flush()
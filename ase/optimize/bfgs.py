@@ -123,3 +123,125 @@ class oldBFGS(BFGS):
         """
         dr /= np.maximum(steplengths / self.maxstep, 1.0).reshape(-1, 1)
         return dr
+
+
+class LowRankHessian:
+    """Hessian stored as a low-rank correction to a multiple of the identity.
+
+    H = alpha * 1 + Q^T B Q, where the rows of Q are orthonormal.  Each
+    BFGS update adds at most two rows to Q, so all operations are cheap
+    when the number of updates is small compared to the number of
+    degrees of freedom."""
+    def __init__(self, n, alpha=70.0, memory=None):
+        self.alpha = alpha
+        self.memory = memory
+        self.Q = np.zeros((0, n))
+        self.B = np.zeros((0, 0))
+
+    def dot(self, v):
+        return self.alpha * v + np.dot(np.dot(self.B, np.dot(self.Q, v)),
+                                       self.Q)
+
+    def extend(self, v):
+        """Add the part of v that is orthogonal to the rows of Q."""
+        norm = np.linalg.norm(v)
+        for i in range(2):  # twice is enough for stability
+            v = v - np.dot(np.dot(self.Q, v), self.Q)
+        vnorm = np.linalg.norm(v)
+        if vnorm < 1e-10 * norm:
+            return
+        m = len(self.B)
+        self.Q = np.vstack([self.Q, v / vnorm])
+        B = np.zeros((m + 1, m + 1))
+        B[:m, :m] = self.B
+        self.B = B
+
+    def update(self, dr, df):
+        """BFGS update from change in positions and forces."""
+        dg = self.dot(dr)
+        a = np.dot(dr, df)
+        b = np.dot(dr, dg)
+        self.extend(df)
+        self.extend(dr)
+        # df and dg are now in the space spanned by Q:
+        cf = np.dot(self.Q, df)
+        cg = np.dot(self.Q, dg)
+        self.B -= np.outer(cf, cf) / a + np.outer(cg, cg) / b
+        if self.memory is not None and len(self.B) > 2 * self.memory:
+            self.truncate(self.memory)
+
+    def truncate(self, m):
+        """Keep only the m largest eigenvalues of the correction."""
+        beta, V = eigh(self.B)
+        largest = np.argsort(-abs(beta))[:m]
+        self.Q = np.dot(V[:, largest].T, self.Q)
+        self.B = np.diag(beta[largest])
+
+    def solve(self, f):
+        """Calculate |H|^-1 f.
+
+        Negative eigenvalues are replaced by their absolute values as
+        in the BFGS optimizer."""
+        c = np.dot(self.Q, f)
+        omega, V = eigh(self.B + self.alpha * np.eye(len(self.B)))
+        c = np.dot(V, np.dot(c, V) / np.fabs(omega)) - c / self.alpha
+        return f / self.alpha + np.dot(c, self.Q)
+
+
+class LowRankBFGS(BFGS):
+    def __init__(self, atoms, restart=None, logfile='-', trajectory=None,
+                 maxstep=None, master=None, memory=100):
+        """BFGS optimizer for large systems.
+
+        Same algorithm as :class:`BFGS`, but the Hessian is stored as a
+        :class:`LowRankHessian`, so there is no 3Nx3N matrix and no
+        diagonalization of it.  The cost of a step is O(Nk) + O(k^3),
+        where k <= 2 * memory is the number of directions kept.  Until
+        the memory limit is reached (memory steps), the steps are the
+        same as those of :class:`BFGS`.
+
+        memory: int
+            Keep only the most important memory directions of the
+            Hessian correction when there are more than 2 * memory.
+            Default is 100 (as for :class:`LBFGS`).  Use None to keep
+            everything; k then grows by two in every step.
+
+        See :class:`BFGS` for the other parameters.
+        """
+        self.memory = memory
+        BFGS.__init__(self, atoms, restart, logfile, trajectory, maxstep,
+                      master)
+
+    def read(self):
+        Q, B, self.r0, self.f0, self.maxstep = self.load()
+        self.H = None
+        if Q is not None:
+            self.H = LowRankHessian(3 * len(self.atoms), 70.0, self.memory)
+            self.H.Q = Q
+            self.H.B = B
+
+    def step(self, f):
+        atoms = self.atoms
+        r = atoms.get_positions()
+        f = f.reshape(-1)
+        self.update(r.flat, f, self.r0, self.f0)
+        dr = self.H.solve(f).reshape((-1, 3))
+        steplengths = (dr**2).sum(1)**0.5
+        dr = self.determine_step(dr, steplengths)
+        atoms.set_positions(r + dr)
+        self.r0 = r.flat.copy()
+        self.f0 = f.copy()
+        # Store only arrays so that the restart file can be an AFF-file:
+        self.dump((self.H.Q, self.H.B, self.r0, self.f0, self.maxstep))
+
+    def update(self, r, f, r0, f0):
+        if self.H is None:
+            self.H = LowRankHessian(3 * len(self.atoms), 70.0, self.memory)
+            return
+        dr = r - r0
+
+        if np.abs(dr).max() < 1e-7:
+            # Same configuration again (maybe a restart):
+            return
+
+        self.H.update(dr, f - f0)
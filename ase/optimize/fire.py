@@ -42,8 +42,6 @@ class FIRE(Optimizer):
             *r* that the optimizer will revert to, current energy *e* and energy
             of last step *e_last*. This is only called if e > e_last.
         """
-        Optimizer.__init__(self, atoms, restart, logfile, trajectory, master)
-
         self.dt = dt
         self.Nsteps = 0
         self.maxmove = maxmove
@@ -57,11 +55,17 @@ class FIRE(Optimizer):
         self.downhill_check = downhill_check
         self.position_reset_callback = position_reset_callback
 
+        # Parameters must be set before the restart file is read:
+        Optimizer.__init__(self, atoms, restart, logfile, trajectory, master)
+
     def initialize(self):
         self.v = None
 
     def read(self):
-        self.v, self.dt = self.load()
+        data = self.load()
+        self.v, self.dt = data[:2]
+        if len(data) == 4:
+            self.a, self.Nsteps = data[2:]
 
     def step(self,f):
         atoms = self.atoms
@@ -108,4 +112,4 @@ class FIRE(Optimizer):
             dr = self.maxmove * dr / normdr
         r = atoms.get_positions()
         atoms.set_positions(r + dr)
-        self.dump((self.v, self.dt))
+        self.dump((self.v, self.dt, self.a, self.Nsteps))
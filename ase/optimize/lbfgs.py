@@ -17,7 +17,7 @@ class LBFGS(Optimizer):
     """
     def __init__(self, atoms, restart=None, logfile='-', trajectory=None,
                  maxstep=None, memory=100, damping=1.0, alpha=70.0,
-                 use_line_search=False, master=None):
+                 use_line_search=False, master=None, precon=None):
         """Parameters:
 
         atoms: Atoms object
@@ -57,6 +57,13 @@ class LBFGS(Optimizer):
         master: boolean
             Defaults to None, which causes only rank 0 to save files.  If
             set to true,  this rank will save files.
+
+        precon: Precon object
+            Sparse preconditioner used instead of 1 / alpha as the initial
+            inverse Hessian.  See :mod:`ase.optimize.precon`.  If the
+            energy scale (mu) of the preconditioner is not given, it is
+            estimated in the first step with one extra force
+            calculation that is not counted in the number of steps.
         """
         Optimizer.__init__(self, atoms, restart, logfile, trajectory, master)
 
@@ -74,6 +81,7 @@ class LBFGS(Optimizer):
                             # 1./70. is to emulate the behaviour of BFGS
                             # Note that this is never changed!
         self.damping = damping
+        self.precon = precon
         self.use_line_search = use_line_search
         self.p = None
         self.function_calls = 0
@@ -121,7 +129,11 @@ class LBFGS(Optimizer):
         for i in range(loopmax - 1, -1, -1):
             a[i] = rho[i] * np.dot(s[i], q)
             q -= a[i] * y[i]
-        z = H0 * q
+        if self.precon is None:
+            z = H0 * q
+        else:
+            self.precon.make_precon(self.atoms)
+            z = self.precon.solve(q)
         
         for i in range(loopmax):
             b = rho[i] * np.dot(y[i], z)
@@ -1,13 +1,19 @@
 """Structure optimization. """
 
+import copy
 import sys
 import pickle
+import threading
 import time
 from math import sqrt
 from os.path import isfile
 
+import numpy as np
+
+from ase.io.aff import affopen
 from ase.parallel import rank, barrier
 from ase.io.trajectory import Trajectory
+from ase.utils import rename
 import collections
 
 
@@ -124,6 +130,14 @@ class Optimizer(Dynamics):
         Dynamics.__init__(self, atoms, logfile, trajectory, master)
         self.restart = restart
 
+        self.checkpoint_interval = None
+        self.checkpoint_seconds = None
+        self.checkpoint_background = False
+        self.checkpoint_data = None  # data not written yet
+        self.checkpoint_steps = 0  # steps since last write
+        self.checkpoint_time = time.time()  # time of last write
+        self.checkpoint_thread = None
+
         if restart is None or not isfile(restart):
             self.initialize()
         else:
@@ -133,6 +147,29 @@ class Optimizer(Dynamics):
     def initialize(self):
         pass
 
+    def set_checkpoint_policy(self, interval=None, seconds=None,
+                              background=False):
+        """Decide when and how the restart file is written.
+
+        interval: int
+            Write the restart file every *interval* steps.
+        seconds: float
+            Write the restart file when this many seconds have passed
+            since it was last written.
+        background: bool
+            Write the file from a background thread, so that the next
+            step does not have to wait for the file system.
+
+        Default is to write the file after every step.  The latest state
+        is always written when the run() method returns.  The file is
+        first written to a temporary file which is then renamed, so a
+        crash will not leave a half written restart file behind.  If the
+        name of the restart file ends with ``.aff``, the arrays are
+        stored in the compact AFF format instead of as a pickle."""
+        self.checkpoint_interval = interval
+        self.checkpoint_seconds = seconds
+        self.checkpoint_background = background
+
     def run(self, fmax=0.05, steps=100000000):
         """Run structure optimization algorithm.
 
@@ -142,15 +179,18 @@ class Optimizer(Dynamics):
 
         self.fmax = fmax
         step = 0
-        while step < steps:
-            f = self.atoms.get_forces()
-            self.log(f)
-            self.call_observers()
-            if self.converged(f):
-                return
-            self.step(f)
-            self.nsteps += 1
-            step += 1
+        try:
+            while step < steps:
+                f = self.atoms.get_forces()
+                self.log(f)
+                self.call_observers()
+                if self.converged(f):
+                    return
+                self.step(f)
+                self.nsteps += 1
+                step += 1
+        finally:
+            self.write_checkpoint(wait=True)
 
     def converged(self, forces=None):
         """Did the optimization converge?"""
@@ -172,8 +212,85 @@ class Optimizer(Dynamics):
             self.logfile.flush()
         
     def dump(self, data):
-        if rank == 0 and self.restart is not None:
-            pickle.dump(data, open(self.restart, 'wb'), protocol=2)
+        if rank != 0 or self.restart is None:
+            return
+        self.checkpoint_data = data
+        self.checkpoint_steps += 1
+        interval = self.checkpoint_interval
+        seconds = self.checkpoint_seconds
+        if ((interval is None and seconds is None) or
+            (interval is not None and self.checkpoint_steps >= interval) or
+            (seconds is not None and
+             time.time() - self.checkpoint_time >= seconds)):
+            self.write_checkpoint()
+
+    def write_checkpoint(self, wait=False):
+        """Write data from last dump() call to the restart file now.
+
+        With wait=True, the file is written in the foreground also in
+        background mode."""
+        data = self.checkpoint_data
+        if self.checkpoint_thread is not None:
+            self.checkpoint_thread.join()
+            self.checkpoint_thread = None
+        if data is None:
+            return
+        self.checkpoint_data = None
+        self.checkpoint_steps = 0
+        self.checkpoint_time = time.time()
+        if self.checkpoint_background and not wait:
+            # The optimizer may change the arrays in place:
+            data = copy.deepcopy(data)
+            self.checkpoint_thread = threading.Thread(
+                target=write_restart, args=(self.restart, data))
+            self.checkpoint_thread.start()
+        else:
+            write_restart(self.restart, data)
 
     def load(self):
-        return pickle.load(open(self.restart, 'rb'))
+        return read_restart(self.restart)
+
+
+def write_restart(filename, data):
+    """Write tuple of optimizer data to restart file.
+
+    The file is written as filename.tmp and then renamed."""
+    tmpname = filename + '.tmp'
+    if filename.endswith('.aff'):
+        write_aff_restart(tmpname, data)
+    else:
+        with open(tmpname, 'wb') as fd:
+            pickle.dump(data, fd, protocol=2)
+    rename(tmpname, filename)
+
+
+def write_aff_restart(filename, data):
+    """Write tuple of optimizer data as AFF-file.
+
+    ndarrays and lists of numbers or of ndarrays of the same shape are
+    stored as binary data."""
+    writer = affopen(filename, 'w', tag='ASE-OPTIMIZER')
+    lists = []
+    for i, value in enumerate(data):
+        if isinstance(value, list):
+            value = np.array(value, float)
+            lists.append(i)
+        elif isinstance(value, np.generic):
+            value = value.item()
+        writer.write('item{0}'.format(i), value)
+    writer.write(nitems=len(data), lists=lists)
+    writer.close()
+
+
+def read_restart(filename):
+    """Read tuple of optimizer data from pickle or AFF-file."""
+    with open(filename, 'rb') as fd:
+        if fd.read(8) != b'AFFormat':
+            fd.seek(0)
+            return pickle.load(fd)
+    reader = affopen(filename)
+    data = [reader.get('item{0}'.format(i)) for i in range(reader.nitems)]
+    for i in reader.lists:
+        data[i] = list(data[i])
+    reader.close()
+    return tuple(data)
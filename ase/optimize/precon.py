@@ -0,0 +1,208 @@
+"""Sparse preconditioners for structure optimization.
+
+A preconditioner P is a sparse positive definite approximation of the
+Hessian built from the connectivity of the atoms.  Optimizers use
+P^-1 f instead of f / alpha as their first guess for the step, which
+removes most of the ill-conditioning coming from large systems with
+both stiff and soft degrees of freedom.  See:
+
+    D. Packwood, J. R. Kermode, L. Mones, N. Bernstein, J. Woolley,
+    N. Gould, C. Ortner and G. Csanyi, J. Chem. Phys. 144, 164109 (2016)
+
+Example::
+
+    from ase.optimize import LBFGS
+    from ase.optimize.precon import Exp
+    opt = LBFGS(atoms, precon=Exp())
+
+The matrix is only rebuilt and factorized (with scipy.sparse) when the
+neighbor list is rebuilt.
+"""
+
+from __future__ import division
+
+from math import pi
+
+import numpy as np
+
+from ase.constraints import FixAtoms
+from ase.neighborlist import NeighborList
+
+
+class Precon:
+    def __init__(self, r_cut=None, r_NN=None, mu=None, c_stab=0.1, skin=1.0):
+        """Laplacian preconditioner built from a neighbor list.
+
+        P_ij = -mu * c(r_ij) for pairs of atoms closer than r_cut and
+        P_ii = -sum_j P_ij + mu * c_stab.  Each Cartesian direction is
+        treated independently.
+
+        r_cut: float
+            Cutoff for the pairs.  Default is 2 * r_NN.
+        r_NN: float
+            Nearest neighbor distance.  Default is estimated from the
+            first configuration.
+        mu: float
+            Energy scale in eV/Ang^2.  Default is to estimate it from the
+            curvature along a smooth displacement of the atoms, which
+            costs one extra force calculation.
+        c_stab: float
+            Stabilization constant added to the diagonal.
+        skin: float
+            Skin of the neighbor list in Angstrom.  The matrix is rebuilt
+            when the neighbor list is rebuilt.
+        """
+        self.r_cut = r_cut
+        self.r_NN = r_NN
+        self.mu = mu
+        self.c_stab = c_stab
+        self.skin = skin
+        self.nl = None
+        self.P = None  # sparse matrix
+        self.lu = None  # factorization of P
+        self.nfactorizations = 0
+
+    def coefficients(self, r):
+        """Coupling strengths for pairs with distances r."""
+        raise NotImplementedError
+
+    def make_precon(self, atoms):
+        """Make sure the preconditioner is up to date for atoms."""
+        if self.nl is None or len(self.nl.cutoffs) != len(atoms):
+            if self.r_NN is None:
+                self.r_NN = estimate_nearest_neighbour_distance(atoms)
+            if self.r_cut is None:
+                self.r_cut = 2.0 * self.r_NN
+            self.nl = NeighborList([0.5 * self.r_cut] * len(atoms),
+                                   skin=self.skin, self_interaction=False)
+            self.P = None
+        if self.nl.update(atoms) or self.P is None:
+            if self.mu is None:
+                self.mu = 1.0
+                self.build(atoms)
+                self.mu = self.estimate_mu(atoms)
+            self.build(atoms)
+
+    def build(self, atoms):
+        """Build and factorize the sparse matrix."""
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.linalg import splu
+
+        natoms = len(atoms)
+        i, j, offsets, d = self.nl.get_pairs(atoms)
+        r = np.sqrt((d**2).sum(1))
+        mask = (r < self.r_cut) & (i != j)
+        i = i[mask]
+        j = j[mask]
+        c = self.mu * self.coefficients(r[mask])
+
+        diagonal = (self.mu * self.c_stab +
+                    np.bincount(i, c, natoms) + np.bincount(j, c, natoms))
+
+        # Fixed atoms are decoupled from the rest:
+        fixed = np.zeros(natoms, bool)
+        for constraint in atoms.constraints:
+            if isinstance(constraint, FixAtoms):
+                fixed[constraint.get_indices()] = True
+        diagonal[fixed] = self.mu
+        free = ~(fixed[i] | fixed[j])
+        i = i[free]
+        j = j[free]
+        c = c[free]
+
+        rows = np.concatenate([i, j, np.arange(natoms)])
+        cols = np.concatenate([j, i, np.arange(natoms)])
+        values = np.concatenate([-c, -c, diagonal])
+        self.P = coo_matrix((values, (rows, cols)),
+                            shape=(natoms, natoms)).tocsc()
+        self.lu = splu(self.P)
+        self.nfactorizations += 1
+
+    def solve(self, x):
+        """Return P^-1 x for x with 3 * natoms elements."""
+        x = np.asarray(x, float)
+        return self.lu.solve(x.reshape((-1, 3))).reshape(x.shape)
+
+    def dot(self, x):
+        """Return P x for x with 3 * natoms elements."""
+        x = np.asarray(x, float)
+        return (self.P * x.reshape((-1, 3))).reshape(x.shape)
+
+    def estimate_mu(self, atoms):
+        """Estimate mu from the curvature along a smooth displacement.
+
+        The atoms are displaced by a long wavelength sine wave, v, and
+        mu is chosen so that v.P.v matches the change of the gradient
+        along v.  Returns the estimated mu (at least 1 eV/Ang^2).  The
+        matrix must have been built for atoms.
+
+        This costs one extra force calculation.  Afterwards, the results
+        of the calculator are those for the original positions again, so
+        that the next call to atoms.get_forces() does not recalculate."""
+        r0 = atoms.get_positions()
+        f0 = atoms.get_forces()
+        calc = atoms.calc
+        state = None
+        if (getattr(calc, 'atoms', None) is not None and
+            hasattr(calc, 'results')):
+            state = calc.atoms, calc.results
+            calc.results = calc.results.copy()
+        L = r0.max(0) - r0.min(0) + self.r_NN
+        wave = np.sin(pi * (r0 - r0.min(0) + 0.5 * self.r_NN) / L).prod(1)
+        v = 1e-2 * self.r_NN * wave[:, np.newaxis] * np.ones(3)
+        atoms.set_positions(r0 + v)
+        v = atoms.get_positions() - r0  # constraints may change v
+        f = atoms.get_forces()
+        atoms.set_positions(r0)
+        if state is not None:
+            calc.atoms, calc.results = state
+
+        curvature = -np.vdot(v, f - f0)
+        mu = self.mu * curvature / np.vdot(v, self.dot(v))
+        return max(mu, 1.0)
+
+
+class Exp(Precon):
+    def __init__(self, A=3.0, r_cut=None, r_NN=None, mu=None, c_stab=0.1,
+                 skin=1.0):
+        """Exponential preconditioner.
+
+        c(r) = exp(-A (r / r_NN - 1)).  See :class:`Precon` for the other
+        parameters."""
+        Precon.__init__(self, r_cut, r_NN, mu, c_stab, skin)
+        self.A = A
+
+    def coefficients(self, r):
+        return np.exp(-self.A * (r / self.r_NN - 1))
+
+
+class C1(Precon):
+    """Connectivity Laplacian: c(r) = 1 for all pairs inside r_cut.
+
+    See :class:`Precon` for the parameters."""
+
+    def coefficients(self, r):
+        return np.ones_like(r)
+
+
+def estimate_nearest_neighbour_distance(atoms):
+    """Typical nearest neighbor distance.
+
+    Largest distance from an atom to its nearest neighbor (including
+    periodic images).  This is not sensitive to a few atoms being
+    close together."""
+    natoms = len(atoms)
+    r = 1.0
+    while r < 100:
+        nl = NeighborList([r] * natoms, skin=0.0, self_interaction=False)
+        nl.update(atoms)
+        i, j, offsets, d = nl.get_pairs(atoms)
+        d = np.sqrt((d**2).sum(1))
+        nearest = np.empty(natoms)
+        nearest[:] = np.inf
+        np.minimum.at(nearest, i[d > 0], d[d > 0])
+        np.minimum.at(nearest, j[d > 0], d[d > 0])
+        if np.isfinite(nearest).all():
+            return nearest.max()
+        r *= 2
+    raise ValueError('Atoms without neighbors')
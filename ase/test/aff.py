@@ -44,3 +44,65 @@ print(open('a.aff')[2].z)
 print(open('a.aff', index=3).proxy('psi')[0:3])
 for d in open('a.aff'):
     print(d)
+
+# Read-only zero-copy views of a memory map
+r = open('a.aff', mmap=True)
+x = r[3].proxy('psi')[::2]
+assert isinstance(x, np.memmap) and not x.flags.writeable
+assert (x == [[1, 1, 1], [3, 3, 3]]).all()
+assert (r[2].z == np.ones(7, int)).all()
+assert (r.a.x == np.ones((2, 3))).all()
+assert r[3].proxy('psi', 2)[1] == 3
+
+# Buffered writing must handle growing the offsets table:
+w = open('b.aff', 'w', buffersize=100)
+for i in range(100):
+    w.write(i=i)
+    w.sync()
+w.write(i=100)
+w.sync()
+assert len(open('b.aff')) == 100
+w.close()
+r = open('b.aff')
+assert [r[i].i for i in range(len(r))] == list(range(101))
+
+# Encoded arrays:
+import io
+from ase.io.aff import InvalidAFFError, writeint
+from ase.test import must_raise
+x = np.random.RandomState(17).rand(5, 4, 3)
+try:
+    import lzma  # noqa
+except ImportError:
+    lzma = None
+if lzma is None:
+    with must_raise(ValueError):
+        open('d.aff', 'w', codecs={'x': 'lzma'})
+    ycodec = 'float32+zlib'
+else:
+    ycodec = 'float32+lzma'
+w = open('c.aff', 'w', codecs={'x': 'delta=3+zlib', 'a.y': ycodec})
+for i in range(7):
+    w.write(x=x + i, z=np.arange(i))
+    w.child('a').write(y=x[0] * i)
+    w.sync()
+w.add_array('p', (5, 4, 3), codec='delta')
+w.fill(x[:2])
+w.fill(x[2:])
+w.close()
+r = open('c.aff')
+assert r._version == 3
+for i in [6, 0, 4, 3]:
+    assert (r[i].x == x + i).all()
+    assert abs(r[i].a.y - x[0] * i).max() < 1e-6
+assert r[3].a.y.dtype == float
+assert len(r[5]._data['x'].segments) == 3
+assert (r.stack('x', [2, 5]) == [x + 2, x + 5]).all()
+assert (r[6].proxy('x', 2)[1:] == x[2, 1:] + 6).all()
+assert (r[7].p == x).all()
+
+# Readers must refuse newer versions:
+with io.open('c.aff', 'r+b') as fd:
+    writeint(fd, 4, 24)
+with must_raise(InvalidAFFError):
+    open('c.aff')
@@ -1,4 +1,8 @@
+import numpy as np
+
 from ase import Atoms
+from ase.build import bulk
+from ase.geometry import get_distances_within
 
 # Setup a chain of H,O,C
 # H-O Dist = 2
@@ -35,3 +39,26 @@ assert (a.get_all_distances(mic=True) == [[0, 2, 4],
 assert (a.get_all_distances(mic=False) == [[0, 2, 5],
                                            [2, 0, 3],
                                            [5, 3, 0]]).all()
+
+# Only distances below a cutoff, as a sparse matrix
+assert (a.get_all_distances(mic=True, cutoff=4.5).toarray() ==
+        [[0, 2, 4],
+         [2, 0, 3],
+         [4, 3, 0]]).all()
+assert (a.get_all_distances(mic=False, cutoff=4.5).toarray() ==
+        [[0, 2, 0],
+         [2, 0, 3],
+         [0, 3, 0]]).all()
+
+# Compare sparse and dense distances for a skewed, periodic cell
+b = bulk('Cu', 'fcc', a=3.6).repeat((4, 3, 5))
+b.rattle(0.1, seed=1)
+b.cell[2] += [1.3, 0.4, 0.0]
+for mic in [True, False]:
+    dense = b.get_all_distances(mic=mic)
+    sparse = b.get_all_distances(mic=mic, cutoff=6.0).toarray()
+    assert abs(sparse - np.where(dense < 6.0, dense, 0.0)).max() < 1e-10
+i, j, d, D = get_distances_within(b.positions, 6.0, b.cell, b.pbc,
+                                  vector=True)
+assert (i < j).all()
+assert abs(np.sqrt((D**2).sum(1)) - d).max() < 1e-10
@@ -0,0 +1,123 @@
+import numpy as np
+try:
+    import scipy
+except ImportError:
+    scipy = None
+
+from ase import Atoms
+from ase.build import fcc111
+from ase.calculators.emt import EMT
+from ase.calculators.lj import LennardJones
+from ase.calculators.morse import MorsePotential
+from ase.calculators.test import TestPotential
+from ase.cluster import Icosahedron
+from ase.optimize import BFGS, FIRE
+from ase.optimize.batch import BatchOptimizer
+from ase.test import must_raise
+
+
+def images(calc):
+    images = []
+    for seed in range(4):
+        atoms = Icosahedron('Cu', 2)
+        if seed % 2:
+            atoms = fcc111('Cu', (2, 2, 3), vacuum=4.0)
+            atoms.numbers[-1] = 79
+        atoms.rattle(0.1, seed=seed)
+        atoms.calc = calc()
+        images.append(atoms)
+    return images
+
+
+def lj():
+    return LennardJones(sigma=2.3)
+
+
+def morse():
+    return MorsePotential(r0=2.5, rho0=5.0)
+
+
+def write_eam_potential(filename):
+    # Two-element potential with simple analytic functions:
+    from scipy.interpolate import InterpolatedUnivariateSpline as spline
+    from ase.calculators.eam import EAM
+    cutoff = 5.0
+    n = 200
+    rs = np.arange(n) * (cutoff / n)
+    rhos = np.arange(n) * (10.0 / n)
+    taper = (1 - rs / cutoff)**3
+
+    def density(r0):
+        return spline(rs, np.exp(-1.5 * (rs - r0)) * taper)
+
+    def pair(d, r0):
+        return spline(rs, d * np.exp(-3.0 * (rs - r0)) * taper)
+
+    calc = EAM(elements=['Cu', 'Au'],
+               embedded_energy=np.array([spline(rhos, -np.sqrt(rhos)),
+                                         spline(rhos, -1.2 * np.sqrt(rhos))]),
+               electron_density=np.array([density(2.55), density(2.88)]),
+               phi=np.array([[pair(0.3, 2.55), pair(0.35, 2.7)],
+                             [pair(0.35, 2.7), pair(0.4, 2.88)]]),
+               cutoff=cutoff, form='alloy',
+               Z=[29, 79], nr=n, nrho=n, dr=cutoff / n, drho=10.0 / n,
+               lattice=['fcc', 'fcc'], mass=[63.546, 196.97],
+               a=[3.61, 4.08])
+    # write_potential() needs a calculation first:
+    dimer = Atoms('CuAu', [(0, 0, 0), (0, 0, 2.7)], calculator=calc)
+    dimer.get_potential_energy()
+    calc.write_potential(filename)
+
+
+def eam():
+    from ase.calculators.eam import EAM
+    return EAM(potential='CuAu-test.eam.alloy')
+
+
+def testpotential():
+    # Calculator without calculate_batch() method:
+    images = []
+    for seed in range(3):
+        atoms = Atoms('H7', np.random.RandomState(seed).rand(7, 3) * 2)
+        atoms.calc = TestPotential()
+        images.append(atoms)
+    return images
+
+
+cases = [(EMT, BFGS, None),
+         (lj, FIRE, None),
+         (morse, BFGS, None),
+         (testpotential, BFGS, 2)]
+if scipy is not None:
+    write_eam_potential('CuAu-test.eam.alloy')
+    cases.append((eam, FIRE, None))
+
+for calc, optimizer, workers in cases:
+    if calc is testpotential:
+        batch = testpotential()
+        ref = testpotential()
+    else:
+        batch = images(calc)
+        ref = images(calc)
+
+    nsteps = []
+    for atoms in ref:
+        opt = optimizer(atoms, logfile=None)
+        opt.run(fmax=0.05)
+        nsteps.append(opt.nsteps)
+
+    opt = BatchOptimizer(batch, optimizer, workers=workers)
+    assert opt.run(fmax=0.05) == [True] * len(batch)
+    print(nsteps, opt.nsteps)
+    assert [o.nsteps for o in opt.optimizers] == nsteps
+    assert opt.nsteps == max(nsteps) + 1
+    for a, b in zip(batch, ref):
+        assert abs(a.positions - b.positions).max() < 1e-10
+
+# Not converged:
+batch = images(EMT)
+assert BatchOptimizer(batch, BFGS).run(fmax=0.05, steps=2) == [False] * 4
+
+with must_raise(ValueError):
+    batch[1].calc = batch[0].calc
+    BatchOptimizer(batch)
@@ -1,3 +1,5 @@
+import os
+
 import numpy as np
 
 from ase import Atoms
@@ -9,7 +11,7 @@ from ase.build import molecule
 from ase.test import must_raise
 
 
-for name in ['y2.json', 'y2.db']:
+for name in ['y2.json', 'y2.jsonl', 'y2.db']:
     c = connect(name)
     print(name, c)
 
@@ -62,3 +64,89 @@ for name in ['y2.json', 'y2.db']:
     id = c.write(Atoms(), key=7)
     c.update(id, delete_keys=['key'])
     assert 'key' not in c[id]
+
+# Bulk insert:
+for name in ['bulk.json', 'bulk.jsonl', 'bulk.db']:
+    c = connect(name)
+    c.write(Atoms('H'))
+    images = [molecule('H2O'), (molecule('CH4'), {'x': 1.5, 's': 'abc'}),
+              (Atoms('Cu2'), {'x': 2}, {'d': [1, 2]})]
+    ids = c.write_many(images * 3)
+    assert ids == list(range(2, 11))
+    assert c.count(x=2) == 3
+    assert c.count('H>3') == 3
+    row = c.get(id=9)
+    assert row.s == 'abc' and row.formula == 'CH4'
+    assert list(c.get(id=10).data.d) == [1, 2]
+    with must_raise(ValueError):
+        c.write_many([(Atoms(), {'id': 3})])
+    assert c.count() == 10
+
+    # Column projection:
+    h2o = molecule('H2O', calculator=EMT())
+    h2o.get_forces()
+    c.write(h2o, x=3, data={'d': 7})
+    rows = list(c.select('x', sort='x', columns=['energy', 'x', 'natoms']))
+    assert [row.x for row in rows] == [1.5] * 3 + [2] * 3 + [3]
+    row = rows[-1]
+    assert 'positions' not in row and 'cell' not in row
+    assert row.natoms == 3 and row.energy == h2o.get_potential_energy()
+    assert row.key_value_pairs == {'x': 3}
+    row = next(c.select(x=3, columns=['fmax', 'data']))
+    assert row.data.d == 7 and row.fmax > 0 and 'numbers' not in row
+    if name.endswith('.db'):
+        assert 'forces' not in row  # fmax is a stored column
+    row = next(c.select(s='abc', columns=['x']))
+    assert row.key_value_pairs == {'x': 1.5}
+    row = next(c.select(s='abc', columns=['key_value_pairs']))
+    assert row.key_value_pairs == {'x': 1.5, 's': 'abc'}
+
+    # Aggregation:
+    assert c.aggregate('count', 'x') == 7
+    assert c.aggregate('max', 'x', selection='H>3') == 1.5
+    assert c.aggregate('min', 'energy') == h2o.get_potential_energy()
+    assert c.aggregate('min', 'energy', selection='Cu') is None
+    assert c.aggregate('count', 'id', groupby='x') == {1.5: 3, 2: 3, 3: 1}
+    assert c.aggregate('mean', 'x', groupby='s') == {'abc': 1.5}
+    assert c.aggregate('count', 'x', groupby='formula') == {'CH4': 3,
+                                                             'Cu2': 3,
+                                                             'H2O': 1}
+    assert c.aggregate('max', 'natoms', groupby='natoms')[5] == 5
+    assert (c.select_array('x', 'x>1.7') == [2, 2, 2, 3]).all()
+    assert c.select_array('id', x=2).tolist() == [4, 7, 10]
+    assert c.select_array('fmax', 'x>2')[0] > 0
+    c.write_many([(Atoms(), {'y': 1}), (Atoms(), {'y': 'a'}),
+                  (Atoms(), {'y': 2})])
+    assert c.aggregate('count', 'y') == 3
+    assert c.aggregate('count', 'id', groupby='y') == {1: 1, 'a': 1, 2: 1}
+    assert c.select_array('y').tolist() == ['1', 'a', '2']
+
+# Copying rows to a .jsonl file appends them:
+c = connect('bulk.jsonl')
+c2 = connect('copy.jsonl')
+rows = list(c.select())
+c2.write(rows[0])
+inode = os.stat('copy.jsonl').st_ino
+for row in rows[1:]:
+    c2.write(row)
+assert os.stat('copy.jsonl').st_ino == inode
+with open('copy.jsonl') as fd:
+    assert fd.readline().startswith('{"id": 1,')
+assert c2.count() == len(rows)
+# ... and rows with a known unique_id replace the old ones:
+c2.write(rows[2], x=42)
+assert c2.count() == len(rows) and c2.get(id=3).x == 42
+assert os.stat('copy.jsonl').st_ino != inode
+
+# Covering indices:
+c = connect('bulk.db')
+c.create_covering_indices()
+assert c.count('x>1,s=abc') == 3
+plan = [row['explain'][3] for row in c.select('x>1,s=abc', explain=True)]
+assert 'COVERING INDEX' in plan[0] and plan[-1].startswith('3 rows')
+assert c.aggregate('count', 'x', groupby='s') == {'abc': 3}
+c = connect('covering.db')
+c.create_covering_indices()
+c.write_many(images)
+plan = [row['explain'][3] for row in c.select('x>1,s=abc', explain=True)]
+assert 'COVERING INDEX' in plan[0] and plan[-1].startswith('1 rows')
@@ -0,0 +1,32 @@
+import numpy as np
+from ase.build import bulk
+from ase.calculators.emt import EMT
+
+# Reference energies from the old loop-based implementation:
+for fixed_cutoff, eref in [(True, 8.604010591839614),
+                           (False, 8.604010591839614)]:
+    atoms = bulk('Cu', 'fcc', a=3.7) * (3, 3, 3)
+    atoms.rattle(0.1, seed=1)
+    atoms.numbers = np.random.RandomState(0).choice([29, 47, 79, 28, 46, 78],
+                                                    len(atoms))
+    atoms.calc = EMT(fixed_cutoff=fixed_cutoff)
+    e = atoms.get_potential_energy()
+    print(e - eref)
+    assert abs(e - eref) < 1e-10
+    assert abs(atoms.get_potential_energies().sum() - e) < 1e-10
+
+    f = atoms.get_forces()
+    fnum = atoms.calc.calculate_numerical_forces(atoms, 1e-5)
+    print(abs(f - fnum).max())
+    assert abs(f - fnum).max() < 1e-6
+
+# An isolated atom has no neighbors:
+atoms = bulk('Au', 'fcc', a=4.1) * (2, 2, 2)
+atoms.pbc = False
+atoms.positions[0] += 40
+atoms.calc = EMT()
+eref = 10.897056659206232
+e = atoms.get_potential_energy()
+print(e - eref)
+assert abs(e - eref) < 1e-10
+assert abs(atoms.get_forces()[0]).max() == 0.0
@@ -0,0 +1,76 @@
+"""Convert directory trees and chunked trajectories with a process pool."""
+import multiprocessing
+import os
+
+import numpy as np
+
+from ase.build import bulk
+from ase.calculators.emt import EMT
+from ase.io import Trajectory
+from ase.io.convert import convert, imap_bounded
+from ase.io.pickletrajectory import PickleTrajectory
+
+atoms = bulk('Cu', cubic=True)
+atoms.set_calculator(EMT())
+atoms.info['step'] = 0
+
+os.makedirs('tree/sub')
+for name in ['tree/a.traj', 'tree/sub/b.traj']:
+    t = PickleTrajectory(name, 'w', _warn=False)
+    for i in range(3):
+        atoms.get_forces()
+        t.write(atoms)
+    t.close()
+
+t = Trajectory('long.traj', 'w')
+for i in range(25):
+    atoms.positions[0, 0] = 0.01 * i
+    atoms.info['step'] = i
+    atoms.get_forces()
+    t.write(atoms)
+t.close()
+
+for workers in [1, 2]:
+    frames = convert(['tree', 'long.traj'], outdir='out{0}'.format(workers),
+                     workers=workers, chunksize=10, maxtasks=2, log=None)
+    assert frames == {'tree/a.traj': 3, 'tree/sub/b.traj': 3,
+                      'long.traj': 25}
+    b = Trajectory('out{0}/sub/b.traj'.format(workers))
+    assert len(b) == 3
+    old = PickleTrajectory('tree/sub/b.traj', _warn=False)[1]
+    assert abs(b[1].get_forces() - old.get_forces()).max() == 0
+    long = Trajectory('out{0}/long.traj'.format(workers))
+    x = np.array([a.positions[0, 0] for a in long])
+    assert (x == 0.01 * np.arange(25)).all()
+    assert long[24].info['step'] == 24
+    assert long[13].get_potential_energy() == Trajectory('long.traj')[13] \
+        .get_potential_energy()
+
+# Existing files are overwritten:
+assert convert(['long.traj'], outdir='out1', workers=1,
+               log=None) == {'long.traj': 25}
+assert len(Trajectory('out1/long.traj')) == 25
+
+# Convert old files in place:
+convert(['tree'], workers=2, log=None)
+assert os.path.isfile('tree/sub/b.traj.old')
+assert len(Trajectory('tree/sub/b.traj')) == 3
+# Nothing left to do:
+assert convert(['tree'], log=None) == {}
+
+# At most maxtasks tasks are in flight:
+submitted = []
+
+
+def tasks():
+    for i in range(10):
+        submitted.append(i)
+        yield i
+
+
+pool = multiprocessing.Pool(2)
+for n, x in enumerate(imap_bounded(pool, abs, tasks(), 3)):
+    # n + 1 results taken and 3 waiting:
+    assert x == n and len(submitted) <= n + 1 + 3
+pool.close()
+pool.join()
@@ -0,0 +1,68 @@
+# Random access to frames of extended XYZ files using the sidecar index
+import os
+
+from ase.build import bulk
+from ase.io.extxyz import read_xyz, write_xyz, get_frame_index
+
+images = []
+for i in range(20):
+    atoms = bulk('Cu', cubic=True).repeat((1, 1, i % 3 + 1))
+    atoms.rattle(0.01, seed=i)
+    atoms.info['step'] = i
+    images.append(atoms)
+
+
+def steps(index):
+    return [atoms.info['step'] for atoms in read_xyz('md.xyz', index)]
+
+
+write_xyz('md.xyz', images[:10])
+assert steps(slice(None)) == list(range(10))
+assert os.path.isfile('md.xyz.idx')
+assert steps(-1) == [9]
+assert steps(3) == [3]
+assert steps(slice(2, 8, 3)) == [2, 5]
+assert steps(slice(None)) == steps(slice(None)) == list(range(10))
+a = next(read_xyz('md.xyz', 4))
+assert abs(a.positions - images[4].positions).max() < 1e-6
+
+# Appending frames extends the index
+with open('md.xyz', 'a') as fd:
+    write_xyz(fd, images[10:])
+assert steps(-1) == [19]
+assert steps(slice(-3, None)) == [17, 18, 19]
+assert (get_frame_index('md.xyz')[:, 1] == [len(a) for a in images]).all()
+
+# An incomplete last frame is ignored until it has been written
+with open('md.xyz', 'a') as fd:
+    fd.write('2\ncomment\nCu 0.0 0.0 0.0\n')
+assert steps(-1) == [19]
+with open('md.xyz', 'a') as fd:
+    fd.write('Cu 1.0 1.0 1.0\n')
+assert len(next(read_xyz('md.xyz', -1))) == 2
+
+# Overwriting the file invalidates the index
+write_xyz('md.xyz', images[:3])
+assert steps(slice(None)) == [0, 1, 2]
+assert len(get_frame_index('md.xyz')) == 3
+
+# A frame whose last line is cut short is not indexed
+with open('md.xyz', 'rb') as fd:
+    data = fd.read()
+with open('md.xyz', 'wb') as fd:
+    fd.write(data[:-10])
+assert len(get_frame_index('md.xyz')) == 2
+with open('md.xyz', 'ab') as fd:
+    fd.write(data[-10:])
+with open('md.xyz', 'a') as fd:
+    write_xyz(fd, images[3:4])
+assert len(get_frame_index('md.xyz')) == 4
+assert steps(slice(None)) == [0, 1, 2, 3]
+assert len(list(read_xyz('md.xyz', slice(None), use_index=False))) == 4
+
+# Broken index files are ignored
+with open('md.xyz.idx', 'w') as fd:
+    fd.write('garbage')
+assert steps(-1) == [3]
+os.remove('md.xyz')
+os.remove('md.xyz.idx')
@@ -4,6 +4,7 @@ import os
 from ase import Atom, Atoms
 from ase.io import Trajectory, read
 from ase.constraints import FixBondLength
+from ase.calculators.emt import EMT
 
 co = Atoms([Atom('C', (0, 0, 0)),
             Atom('O', (0, 0, 1.2))])
@@ -76,3 +77,75 @@ t = Trajectory('constraint.traj', 'w', a)
 t.write()
 b = read('constraint.traj')
 assert not (b.get_momenta() - a.get_momenta()).any()
+
+# Memory-mapped reading, also of frames appended after opening:
+co.set_calculator(EMT())
+t = Trajectory('3.traj', 'w', co)
+co.get_forces()
+t.write()
+r = Trajectory('3.traj', mmap=True)
+for i in range(3):
+    co.positions[1, 2] += 0.1
+    co.get_forces()
+    t.write()
+assert len(r) == 1
+r = Trajectory('3.traj', mmap=True)
+assert len(r) == 4
+p = r.backend[3].positions
+assert not p.flags.writeable
+assert abs(p - co.positions).max() < 1e-14
+assert abs(r[-1].get_forces() - co.get_forces()).max() < 1e-14
+t.write()
+assert abs(r.backend[3].calculator.forces -
+           Trajectory('3.traj')[3].get_forces()).max() == 0
+
+# Columnar extraction of quantities without creating Atoms objects:
+for mmap in [False, True]:
+    r = Trajectory('3.traj', mmap=mmap)
+    images = list(r)
+    P = r.get_array('positions')
+    assert P.shape == (5, 2, 3)
+    assert (P == [atoms.positions for atoms in images]).all()
+    E = r.get_array('energy', slice(1, None, 2))
+    assert (E == [atoms.get_potential_energy()
+                  for atoms in images[1::2]]).all()
+    F = r.get_array('forces', [-1, 0])
+    assert (F[0] == images[-1].get_forces()).all()
+    assert r.get_array('cell').shape == (5, 3, 3)
+    with must_raise(KeyError):
+        r.get_array('stress')
+
+# Buffered writing commits several frames at a time:
+t = Trajectory('4.traj', 'w', co, buffersize=3)
+for i in range(5):
+    t.write()
+    assert len(t) == i + 1
+assert len(Trajectory('4.traj')) == 3
+t.flush()
+assert len(Trajectory('4.traj')) == 5
+t.write()
+t.write()
+# A crash leaves uncommitted frames behind, but the file is still valid:
+t.backend.fd.close()
+assert len(Trajectory('4.traj')) == 5
+t = Trajectory('4.traj', 'a', buffersize=10)
+for i in range(50):
+    t.write(co)
+t.close()
+r = Trajectory('4.traj')
+assert len(r) == 55
+assert abs(r[54].positions - co.positions).max() == 0
+
+# Compressed arrays:
+t = Trajectory('5.traj', 'w', co, codecs={'positions': 'delta+zlib',
+                                          'calculator.forces': 'float32+zlib'})
+for i in range(12):
+    co.positions[0, 0] += 0.01
+    co.get_forces()
+    t.write()
+t.close()
+r = Trajectory('5.traj')
+assert abs(r[11].positions - co.positions).max() == 0
+assert abs(r[-1].get_forces() - co.get_forces()).max() < 1e-5
+x = r.get_array('positions')[:, 0, 0]
+assert (x[1:] > x[:-1]).all()
@@ -0,0 +1,19 @@
+from ase.build import bulk
+from ase.calculators.lj import LennardJones
+
+for pbc in [True, (1, 0, 1), False]:
+    atoms = bulk('Ar', 'fcc', a=5.26) * (2, 2, 3)
+    atoms.set_cell(atoms.cell + [[0, 0, 0], [0, 0, 0], [1.0, 0, 0]])
+    atoms.rattle(0.2, seed=2)
+    atoms.pbc = pbc
+    atoms.calc = LennardJones(sigma=3.4, epsilon=0.01, rc=8.0)
+    e = atoms.get_potential_energy()
+    energies = atoms.get_potential_energies()
+    print(e, energies.sum() - e)
+    assert abs(energies.sum() - e) < 1e-12
+
+    f = atoms.get_forces()
+    fnum = atoms.calc.calculate_numerical_forces(atoms, 1e-5)
+    print(abs(f - fnum).max())
+    assert abs(f - fnum).max() < 1e-7
+    assert abs(f.sum(0)).max() < 1e-12
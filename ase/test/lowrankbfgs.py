@@ -0,0 +1,37 @@
+from ase.build import fcc111, add_adsorbate
+from ase.calculators.emt import EMT
+from ase.constraints import FixAtoms
+from ase.optimize.bfgs import BFGS, LowRankBFGS
+
+
+def slab(size=(2, 2, 3)):
+    atoms = fcc111('Cu', size, vacuum=5.0)
+    add_adsorbate(atoms, 'Au', 2.0, 'fcc')
+    atoms.rattle(0.05, seed=1)
+    atoms.set_constraint(FixAtoms(indices=range(size[0] * size[1])))
+    atoms.calc = EMT()
+    return atoms
+
+
+# Same steps as BFGS (97 atoms):
+trajectories = []
+for opt in [BFGS, LowRankBFGS]:
+    atoms = slab((4, 4, 6))
+    dyn = opt(atoms)
+    positions = []
+    dyn.attach(lambda: positions.append(atoms.get_positions()))
+    dyn.run(fmax=0.01, steps=30)
+    trajectories.append(positions)
+assert len(trajectories[0]) == len(trajectories[1])
+for p1, p2 in zip(*trajectories):
+    assert abs(p1 - p2).max() < 1e-8
+
+# Limited memory and restart:
+atoms = slab()
+dyn = LowRankBFGS(atoms, memory=3, restart='lowrank.pckl')
+dyn.run(fmax=0.01, steps=5)
+assert len(dyn.H.B) <= 6
+dyn = LowRankBFGS(atoms, memory=3, restart='lowrank.pckl')
+assert dyn.H is not None
+dyn.run(fmax=0.01)
+assert (atoms.get_forces()**2).sum(1).max() < 0.01**2
@@ -19,3 +19,16 @@ md.attach(Trajectory('Cu2.traj', 'w', fcc).write, interval=3)
 md.run(steps=20)
 fcc2 = Trajectory('Cu2.traj', 'r')[-1]
 
+
+# Log neighbor-list statistics:
+from ase.md import MDLogger
+md.attach(MDLogger(md, fcc, 'md.log', mode='w',
+                   neighborlist=fcc.calc.nl))
+md.run(steps=5)
+with open('md.log') as fd:
+    lines = fd.readlines()
+print(''.join(lines))
+assert 'dmax/skin' in lines[0]
+assert len(lines) == 6
+stats = fcc.calc.nl.stats
+assert int(lines[-1].split()[7]) == stats.nchecks == 25
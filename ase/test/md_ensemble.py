@@ -0,0 +1,93 @@
+import numpy as np
+
+from ase import Atoms
+from ase.calculators.emt import EMT
+from ase.calculators.lj import LennardJones
+from ase.calculators.test import TestPotential
+from ase.cluster import Icosahedron
+from ase.constraints import FixAtoms
+from ase.md import VelocityVerlet, Langevin
+from ase.md.ensemble import VelocityVerletEnsemble, LangevinEnsemble
+from ase.md.velocitydistribution import MaxwellBoltzmannDistribution
+from ase.test import must_raise
+from ase.units import fs, kB
+
+
+class CountingLJ(LennardJones):
+    nbatches = 0
+
+    def calculate_batch(self, images):
+        CountingLJ.nbatches += 1
+        LennardJones.calculate_batch(self, images)
+
+
+def images(calc, nrep=4):
+    images = []
+    for seed in range(nrep):
+        atoms = Icosahedron('Cu', 2)
+        atoms.rattle(0.05, seed=seed)
+        np.random.seed(seed)
+        MaxwellBoltzmannDistribution(atoms, 300 * kB)
+        atoms.calc = calc()
+        images.append(atoms)
+    return images
+
+
+def lj():
+    return CountingLJ(sigma=2.3)
+
+
+# Same trajectories as one replica at a time:
+for calc in [lj, EMT, TestPotential]:
+    batch = images(calc)
+    ref = images(calc)
+    for atoms in ref:
+        VelocityVerlet(atoms, 2 * fs).run(20)
+    CountingLJ.nbatches = 0
+    dyn = VelocityVerletEnsemble(batch, 2 * fs, logfile='-', loginterval=10)
+    dyn.run(20)
+    if calc is lj:
+        assert CountingLJ.nbatches == 21
+    for a, b in zip(batch, ref):
+        assert abs(a.positions - b.positions).max() < 1e-10
+        assert abs(a.get_momenta() - b.get_momenta()).max() < 1e-10
+    assert (dyn.positions[2] == batch[2].positions).all()
+    T = [atoms.get_temperature() for atoms in batch]
+    assert abs(dyn.get_temperatures() - T).max() < 1e-10
+
+# One replica gives the same trajectory as Langevin:
+for fixcm in [True, False]:
+    atoms = images(EMT, 1)[0]
+    np.random.seed(42)
+    Langevin(atoms, 2 * fs, 300 * kB, 0.02, fixcm=fixcm).run(20)
+    batch = images(EMT, 1)
+    np.random.seed(42)
+    LangevinEnsemble(batch, 2 * fs, 300 * kB, 0.02, fixcm=fixcm).run(20)
+    assert abs(atoms.positions - batch[0].positions).max() < 1e-10
+
+# One temperature per replica:
+batch = images(lj, 16)
+temperatures = np.linspace(100, 800, 16)
+dyn = LangevinEnsemble(batch, 5 * fs, temperatures * kB, 0.05,
+                       rng=np.random.RandomState(7))
+T = 0.0
+for i in range(20):
+    dyn.run(10)
+    T += dyn.get_temperatures() / 20
+print(T)
+assert abs(T / temperatures - 1).mean() < 0.25
+assert np.corrcoef(T, temperatures)[0, 1] > 0.9
+
+# Constraints:
+batch = images(EMT, 3)
+batch[1].set_constraint(FixAtoms([0, 5]))
+r0 = batch[1].get_positions()
+dyn = LangevinEnsemble(batch, 5 * fs, 300 * kB, 0.02)
+dyn.run(20)
+assert (batch[1].positions[[0, 5]] == r0[[0, 5]]).all()
+assert (batch[1].get_momenta()[[0, 5]] == 0.0).all()
+assert abs(batch[0].positions - r0).max() > 0.01
+
+with must_raise(ValueError):
+    VelocityVerletEnsemble([Atoms('H', calculator=EMT()),
+                            Atoms('H2', calculator=EMT())], fs)
@@ -1,6 +1,10 @@
-import ase
+from itertools import product
+
 import numpy as np
 
+import ase
+from ase.geometry import find_mic, minkowski_reduce
+
 tol = 1e-9
 cell = np.array([[1., 0., 0.],
                  [0.5, np.sqrt(3) / 2, 0.],
@@ -113,3 +117,21 @@ assert abs(a.get_distance(0, 1, mic=True) - np.sqrt(46)) < tol
 # set_distance(mic=True)
 a.set_distance(0, 1, 3., mic=True)
 assert abs(a.get_distance(0, 1, mic=True) - 3.) < tol
+
+# Compare find_mic with a brute-force search for skewed cells
+rng = np.random.RandomState(42)
+for pbc in [True, (1, 1, 0), (0, 1, 1), (1, 0, 0)]:
+    cell = np.array([[4.0, 0.0, 0.0],
+                     [3.1, 3.0, 0.0],
+                     [-2.5, 1.9, 3.5]])
+    rcell, op = minkowski_reduce(cell, pbc)
+    assert np.allclose(np.dot(op, cell), rcell)
+    assert abs(abs(np.linalg.det(op)) - 1) < tol
+    D = rng.randn(100, 3) * 5
+    D_min, D_min_len = find_mic(D, cell, pbc)
+    ranges = [range(-10, 11) if p else [0]
+              for p in np.array(pbc, bool) * np.ones(3, bool)]
+    images = np.dot(list(product(*ranges)), cell)
+    lengths = np.sqrt(((D[:, np.newaxis] + images)**2).sum(2)).min(1)
+    assert abs(D_min_len - lengths).max() < tol
+    assert abs(np.sqrt((D_min**2).sum(1)) - D_min_len).max() < tol
@@ -24,27 +24,48 @@ def count(nl, atoms):
         d += (((R[i] + np.dot(offsets, cell) - R[a])**2).sum(1)**0.5).sum()
     return d, c
 
-for sorted in [False, True]:
-    for p1 in range(2):
-        for p2 in range(2):
-            for p3 in range(2):
-                print(p1, p2, p3)
-                atoms.set_pbc((p1, p2, p3))
-                nl = NeighborList(atoms.numbers * 0.2 + 0.5,
-                                  skin=0.0, sorted=sorted)
-                nl.update(atoms)
-                d, c = count(nl, atoms)
-                atoms2 = atoms.repeat((p1 + 1, p2 + 1, p3 + 1))
-                nl2 = NeighborList(atoms2.numbers * 0.2 + 0.5,
-                                   skin=0.0, sorted=sorted)
-                nl2.update(atoms2)
-                d2, c2 = count(nl2, atoms2)
-                c2.shape = (-1, 10)
-                dd = d * (p1 + 1) * (p2 + 1) * (p3 + 1) - d2
-                print(dd)
-                print(c2 - c)
-                assert abs(dd) < 1e-10
-                assert not (c2 - c).any()
+for method in ['cells', 'images']:
+    for sorted in [False, True]:
+        for p1 in range(2):
+            for p2 in range(2):
+                for p3 in range(2):
+                    print(method, p1, p2, p3)
+                    atoms.set_pbc((p1, p2, p3))
+                    nl = NeighborList(atoms.numbers * 0.2 + 0.5,
+                                      skin=0.0, sorted=sorted, method=method)
+                    nl.update(atoms)
+                    d, c = count(nl, atoms)
+                    atoms2 = atoms.repeat((p1 + 1, p2 + 1, p3 + 1))
+                    nl2 = NeighborList(atoms2.numbers * 0.2 + 0.5,
+                                       skin=0.0, sorted=sorted, method=method)
+                    nl2.update(atoms2)
+                    d2, c2 = count(nl2, atoms2)
+                    c2.shape = (-1, 10)
+                    dd = d * (p1 + 1) * (p2 + 1) * (p3 + 1) - d2
+                    print(dd)
+                    print(c2 - c)
+                    assert abs(dd) < 1e-10
+                    assert not (c2 - c).any()
+
+# The two methods must give identical lists:
+big = atoms * (3, 2, 2)
+big.rattle(0.1)
+for pbc in [(1, 1, 1), (1, 0, 1), (0, 0, 0)]:
+    big.set_pbc(pbc)
+    for kwargs in [{}, {'bothways': True}, {'sorted': True},
+                   {'self_interaction': False}]:
+        nl1 = NeighborList(big.numbers * 0.05 + 0.4, method='images',
+                           **kwargs)
+        nl2 = NeighborList(big.numbers * 0.05 + 0.4, method='cells',
+                           **kwargs)
+        nl1.update(big)
+        nl2.update(big)
+        assert nl1.nneighbors == nl2.nneighbors
+        for a in range(len(big)):
+            i1, offsets1 = nl1.get_neighbors(a)
+            i2, offsets2 = nl2.get_neighbors(a)
+            assert (i1 == i2).all()
+            assert (offsets1 == offsets2).all()
 
 h2 = Atoms('H2', positions=[(0, 0, 0), (0, 0, 1)])
 nl = NeighborList([0.5, 0.5], skin=0.1, sorted=True, self_interaction=False)
@@ -74,3 +95,48 @@ for a in range(27):
     assert len(nl.get_neighbors(a)[0]) == 12
 assert not np.any(nl.get_neighbors(13)[1])
 
+
+# All pairs at once:
+nl = NeighborList(big.numbers * 0.05 + 0.4, bothways=True)
+nl.update(big)
+i, j, offsets, d = nl.get_pairs(big)
+first, indices, offsets2 = nl.get_all_neighbors()
+assert (indices == j).all() and (offsets2 == offsets).all()
+for a in range(len(big)):
+    j1, offsets1 = nl.get_neighbors(a)
+    assert (j[first[a]:first[a + 1]] == j1).all()
+    assert (i[first[a]:first[a + 1]] == a).all()
+    d1 = big.positions[j1] + np.dot(offsets1, big.cell) - big.positions[a]
+    assert abs(d[i == a] - d1).max() < 1e-12
+
+# Incremental updates:
+rng = np.random.RandomState(42)
+cu = bulk('Cu', 'fcc', a=3.6) * (4, 3, 3)
+cu.set_cell(cu.cell + [[0, 0, 0], [0, 0, 0], [1.0, 0.3, 0]],
+            scale_atoms=True)
+for pbc in [(1, 1, 1), (1, 0, 1)]:
+    cu.pbc = pbc
+    nl = NeighborList([1.4] * len(cu), skin=0.3, bothways=True,
+                      incremental=True)
+    nl.update(cu)
+    for step in range(20):
+        cu.positions += rng.normal(0, 0.02, (len(cu), 3))
+        cu.positions[rng.randint(len(cu), size=2)] += 0.4
+        if step % 3 == 0:
+            strain = np.eye(3) + rng.normal(0, 0.003, (3, 3))
+            cu.set_cell(np.dot(cu.cell, strain), scale_atoms=True)
+        nl.update(cu)
+        nl0 = NeighborList([1.4] * len(cu), skin=0.0, bothways=True)
+        nl0.update(cu)
+        pairs = []
+        for nl1 in [nl, nl0]:
+            i, j, offsets, d = nl1.get_pairs(cu)
+            mask = (d**2).sum(1) < 2.8**2
+            pairs.append(set(zip(i[mask], j[mask],
+                                 [tuple(o) for o in offsets[mask]])))
+        assert pairs[0] == pairs[1]
+    print(nl.stats)
+    assert nl.stats.npartialbuilds > 0
+    assert nl.stats.nbuilds + nl.stats.npartialbuilds == nl.nupdates
+    assert nl.stats.nchecks == 20
+    assert 0.0 < nl.stats.max_displacement < 10.0
@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+
+from ase.build import fcc100, add_adsorbate
+from ase.calculators.emt import EMT
+from ase.constraints import FixAtoms
+from ase.optimize import BFGS, LBFGS, FIRE, MDMin
+from ase.optimize.bfgs import LowRankBFGS
+
+
+def slab():
+    atoms = fcc100('Cu', (2, 2, 2), vacuum=4.0)
+    add_adsorbate(atoms, 'Au', 1.6, 'hollow')
+    atoms.set_constraint(FixAtoms(range(4)))
+    atoms.calc = EMT()
+    return atoms
+
+
+for opt in [BFGS, LBFGS, FIRE, MDMin, LowRankBFGS]:
+    for name in ['opt.pckl', 'opt.aff']:
+        for background in [False, True]:
+            if os.path.isfile(name):
+                os.remove(name)
+
+            # Reference: uninterrupted run
+            atoms = slab()
+            dyn = opt(atoms, logfile=None)
+            dyn.run(fmax=0.01, steps=12)
+            r1 = atoms.get_positions()
+
+            # Six steps, checkpoint every fourth step, and six more steps:
+            atoms = slab()
+            dyn = opt(atoms, restart=name, logfile=None)
+            dyn.set_checkpoint_policy(interval=4, background=background)
+            dyn.run(fmax=0.01, steps=6)
+            assert not os.path.isfile(name + '.tmp')
+            dyn = opt(atoms, restart=name, logfile=None)
+            dyn.run(fmax=0.01, steps=6)
+            r2 = atoms.get_positions()
+            print(opt.__name__, name, background, abs(r1 - r2).max())
+            assert abs(r1 - r2).max() < 1e-10
+
+# A long interval writes only when run() returns:
+atoms = slab()
+dyn = BFGS(atoms, restart='bfgs.aff', logfile=None)
+dyn.set_checkpoint_policy(interval=1000, seconds=1000)
+steps = []
+dyn.attach(lambda: steps.append(os.path.isfile('bfgs.aff')))
+dyn.run(fmax=0.01, steps=5)
+assert steps == [False] * 5 and os.path.isfile('bfgs.aff')
+H = BFGS(atoms, restart='bfgs.aff', logfile=None).H
+assert H.shape == (27, 27) and np.allclose(H, dyn.H)
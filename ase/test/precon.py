@@ -0,0 +1,61 @@
+import numpy as np
+
+from ase.build import bulk, fcc111, add_adsorbate
+from ase.calculators.emt import EMT
+from ase.constraints import FixAtoms
+from ase.optimize import LBFGS
+from ase.optimize.precon import Exp, C1
+
+
+def vacancy():
+    atoms = bulk('Cu', cubic=True) * (3, 3, 3)
+    del atoms[0]
+    atoms.rattle(0.1, seed=1)
+    atoms.calc = EMT()
+    return atoms
+
+
+# Sparse matrix and its factorization:
+atoms = vacancy()
+precon = Exp(mu=2.0)
+precon.make_precon(atoms)
+assert abs(precon.r_NN - 2.55) < 0.1
+x = np.random.RandomState(0).rand(3 * len(atoms))
+assert abs(precon.solve(precon.dot(x)) - x).max() < 1e-10
+assert abs(precon.P - precon.P.T).max() < 1e-14
+precon.make_precon(atoms)
+assert precon.nfactorizations == 1
+
+# Estimating mu leaves the results of the calculator as they were:
+atoms = vacancy()
+f = atoms.get_forces()
+precon = Exp()
+precon.make_precon(atoms)
+assert precon.mu >= 1.0
+assert atoms.calc.check_state(atoms) == []
+assert (atoms.calc.results['forces'] == f).all()
+
+# Fewer steps with the preconditioner:
+results = []
+for precon in [None, Exp(), C1()]:
+    atoms = vacancy()
+    opt = LBFGS(atoms, maxstep=0.2, precon=precon)
+    opt.run(fmax=1e-3)
+    results.append((opt.nsteps, atoms.get_potential_energy()))
+    if precon is not None:
+        assert precon.mu >= 1.0
+        assert precon.nfactorizations < opt.nsteps / 2
+steps, energies = np.array(results).T
+assert abs(energies - energies[0]).max() < 1e-5
+assert 2 * steps[1] < steps[0]
+
+# Fixed atoms stay fixed:
+slab = fcc111('Cu', (2, 2, 4), vacuum=6.0)
+slab.set_constraint(FixAtoms(range(4)))
+add_adsorbate(slab, 'Au', 2.0, 'ontop')
+slab.rattle(0.05, seed=2)
+slab.calc = EMT()
+r0 = slab.get_positions()
+LBFGS(slab, maxstep=0.2, precon=Exp()).run(fmax=1e-3)
+r = slab.get_positions()
+assert (r[:4] == r0[:4]).all() and abs(r[4:] - r0[4:]).max() > 0.01
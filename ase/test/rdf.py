@@ -0,0 +1,69 @@
+import numpy as np
+
+from ase.build import bulk
+from ase.cluster import Icosahedron
+from ase.geometry.rdf import RDF
+from ase.xrdebye import XrDebye
+
+# Coordination numbers of fcc from the integral of the RDF
+atoms = bulk('Cu', 'fcc', a=3.6).repeat(4)
+rdf = RDF(rmax=5.0, nbins=500)
+rdf.add(atoms)
+r, g = rdf.get_rdf()
+rho = len(atoms) / atoms.get_volume()
+n = np.cumsum(rho * g * rdf.shells)
+assert abs(n[r < 3.0][-1] - 12) < 1e-10
+assert abs(n[r < 4.0][-1] - 18) < 1e-10
+assert abs(r[g.argmax()] - 3.6 / np.sqrt(2)) < rdf.dr
+
+# Partial RDFs of a random alloy.  Frames are rattled copies, so the
+# neighbor list is updated incrementally:
+atoms = bulk('Cu', 'fcc', a=3.6, cubic=True).repeat(3)
+rng = np.random.RandomState(17)
+atoms.numbers[rng.rand(len(atoms)) < 0.3] = 79
+rdf = RDF(rmax=5.0, nbins=50, skin=0.5)
+hist = 0
+for frame in range(5):
+    atoms.rattle(0.05, seed=frame)
+    rdf.add(atoms)
+    # Brute-force histogram with all images closer than rmax:
+    P = atoms.positions
+    images = np.dot([(a, b, c) for a in range(-2, 3)
+                     for b in range(-2, 3) for c in range(-2, 3)],
+                    atoms.cell)
+    d = np.sqrt(((P[np.newaxis, :, np.newaxis] + images -
+                  P[:, np.newaxis, np.newaxis])**2).sum(-1))
+    d = d[d > 1e-6]
+    hist += np.histogram(d, bins=50, range=(0.0, 5.0))[0]
+r, g = rdf.get_rdf()
+pairs = 0.5 * g * len(atoms)**2 / atoms.get_volume() * rdf.shells
+assert abs(pairs * 2 - hist / 5.0).max() < 1e-8
+
+x = {Z: (atoms.numbers == Z).mean() for Z in [29, 79]}
+gsum = sum(x[A] * x[B] * rdf.get_rdf((A, B))[1]
+           for A in [29, 79] for B in [29, 79])
+assert abs(gsum - g).max() < 1e-10
+assert (rdf.get_rdf(('Au', 'Cu'))[1] == rdf.get_rdf((29, 79))[1]).all()
+
+S = rdf.get_structure_factor(np.linspace(1.0, 8.0, 30))
+assert S.shape == (30,)
+
+# Debye formula: vectorized, histogram and simple double loop
+atoms = Icosahedron('Au', 3)
+atoms.numbers[::4] = 46
+s = np.linspace(0.1, 0.6, 5)
+xrd = XrDebye(wavelength=1.5)
+intensity = xrd.get(atoms, s)
+f = {Z: xrd.get_waasmaier(sym, s) for Z, sym in [(79, 'Au'), (46, 'Pd')]}
+ref = 0
+for a in atoms:
+    for b in atoms:
+        r = np.linalg.norm(a.position - b.position)
+        ref = ref + f[a.number] * f[b.number] * np.sinc(2 * s * r)
+sinth = 1.5 * s / 2
+cos2th = np.cos(2 * np.arccos(np.sqrt(1 - sinth**2)))
+ref *= (np.exp(-0.04 * s**2 / 2) * np.sqrt(1 - sinth**2) /
+       (1 + 1.01 * cos2th**2))
+assert abs(intensity / ref - 1).max() < 1e-12
+assert abs(xrd.get(atoms, s[2]) - intensity[2]) < 1e-12 * intensity[2]
+assert abs(xrd.get(atoms, s, binwidth=0.001) / intensity - 1).max() < 0.005
@@ -16,7 +16,7 @@ from ase.data import chemical_symbols
 
 __all__ = ['exec_', 'basestring', 'import_module', 'seterr', 'plural',
            'devnull', 'gcd', 'convert_string_to_fd', 'Lock',
-           'opencew', 'OpenLock', 'hill', 'rotate', 'irotate', 'givens',
+           'opencew', 'OpenLock', 'rename', 'hill', 'rotate', 'irotate', 'givens',
            'hsv2rgb', 'hsv']
 
 
@@ -139,6 +139,16 @@ def opencew(filename, world=None):
     return fd
 
 
+def rename(src, dst):
+    """Rename src to dst, overwriting dst if it exists.
+
+    os.rename() can't overwrite files on Windows, so there dst is
+    removed first."""
+    if os.name == 'nt' and os.path.isfile(dst):
+        os.remove(dst)
+    os.rename(src, dst)
+
+
 class Lock:
     def __init__(self, name='lock', world=None):
         self.name = name
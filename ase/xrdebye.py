@@ -1,5 +1,4 @@
 from __future__ import print_function
-from math import exp, pi, sin, sqrt, cos, acos
 import numpy as np
 
 from ase.data import atomic_numbers
@@ -37,67 +36,115 @@ class XrDebye:
     def set_damping(self, damping):
         self.damping = damping
 
-    def get(self, atoms, s):
+    def get(self, atoms, s, binwidth=None):
         """Get the powder x-ray (XRD) pattern using the Debye-Formula.
 
         After: T. Iwasa and K. Nobusada, J. Phys. Chem. C 111 (2007) 45
                s is assumed to be in 1/Angstrom
+
+        s can be a number or an array.  The pair distances are
+        calculated in chunks, so memory use stays bounded.  If a
+        binwidth (in Angstrom) is given, the pair distances are
+        histogrammed first.  That is much faster for large systems and
+        many values of s, and accurate as long as 2 pi s binwidth is
+        much smaller than one.
         """
 
+        s = np.asarray(s, float)
+        shape = s.shape
+        s = s.ravel()
         sinth = self.wavelength * s / 2.
-        costh = sqrt(1. - sinth**2)
-        cos2th = cos(2. * acos(costh))
-        pre = exp(- self.damping * s**2 / 2)
- 
+        costh = np.sqrt(1. - sinth**2)
+        cos2th = np.cos(2. * np.arccos(costh))
+        pre = np.exp(- self.damping * s**2 / 2)
+
         if self.method == 'Iwasa':
             pre *= costh / (1. + self.alpha * cos2th**2)
 
-        f = {}
-        def atomic(symbol):
-            if symbol not in f:
-                if self.method == 'Iwasa':
-                    f[symbol] = self.get_waasmaier(symbol, s)
-                else:
-                    f[symbol] = atomic_numbers[symbol]
-            return f[symbol]
-
-        def sinc(x):
-            if x < 1.e-6:
-                x2 = x * x
-                return 1 - x2 / 6. + x2 * x2 / 120.
-            else:
-                return sin(x) / x
-
-        I = 0.
-        for a in atoms:
-            fa = atomic(a.symbol)
-#            print a.symbol, fa
-            for b in atoms:
-                fb = atomic(b.symbol)
-
-                if a == b:
-                    twopisr = 0.
-                else:
-                    vrij = a.position - b.position
-                    rij = np.sqrt(np.dot(vrij, vrij))
-                    twopisr = 2 * pi * s * rij
-
-                I += fa * fb * sinc(twopisr)
-                    
-        return pre * I
+        symbols = atoms.get_chemical_symbols()
+        elements = sorted(set(symbols))
+        types = np.array([elements.index(symbol) for symbol in symbols], int)
+        if self.method == 'Iwasa':
+            f = np.array([self.get_waasmaier(symbol, s)
+                          for symbol in elements])
+        else:
+            f = np.array([atomic_numbers[symbol] * np.ones_like(s)
+                          for symbol in elements])
+        ff = f[:, np.newaxis] * f  # products for all pairs of elements
+
+        # Self terms:
+        I = np.dot(np.bincount(types, minlength=len(elements)), f**2)
+
+        # Pair terms:
+        if binwidth is None:
+            chunksize = max(1, 2**20 // len(s))
+            for t1, t2, r in self._get_pair_distances(atoms, types,
+                                                      chunksize):
+                sinc = np.sinc(2 * np.outer(r, s))
+                I += 2 * (ff[t1, t2] * sinc).sum(0)
+        else:
+            hist = self.get_histograms(atoms, binwidth)
+            r = np.arange(hist.shape[-1]) * binwidth
+            sinc = np.sinc(2 * np.outer(r, s))
+            I += 2 * (ff * np.dot(hist, sinc)).sum((0, 1))
+
+        return (pre * I).reshape(shape)
+
+    def get_histograms(self, atoms, binwidth):
+        """Histograms of pair distances for all pairs of elements.
+
+        Returns array of shape (nelements, nelements, nbins) with the
+        elements in alphabetic order.  Each pair is counted once and
+        bin k is centered at k * binwidth."""
+        symbols = atoms.get_chemical_symbols()
+        elements = sorted(set(symbols))
+        types = np.array([elements.index(symbol) for symbol in symbols], int)
+        nelements = len(elements)
+        positions = atoms.get_positions()
+        if len(atoms) > 0:
+            size = np.sqrt((np.ptp(positions, axis=0)**2).sum())
+        else:
+            size = 0.0
+        nbins = int(size / binwidth) + 2
+        hist = np.zeros(nelements**2 * nbins)
+        for t1, t2, r in self._get_pair_distances(atoms, types):
+            bins = np.rint(r / binwidth).astype(int)
+            hist += np.bincount((t1 * nelements + t2) * nbins + bins,
+                                minlength=len(hist))
+        return hist.reshape((nelements, nelements, nbins))
+
+    def _get_pair_distances(self, atoms, types, chunksize=2**20):
+        """Yield chunks of pair distances.
+
+        Yields the types of both atoms and the distance for all pairs
+        in chunks of about chunksize pairs."""
+        positions = atoms.get_positions()
+        natoms = len(positions)
+        i1 = 0
+        while i1 < natoms - 1:
+            # Rows i1 to i2 and their pairs with all atoms after them:
+            i2 = min(i1 + max(1, chunksize // (natoms - i1)), natoms - 1)
+            rows = np.arange(i1, i2)
+            counts = natoms - 1 - rows
+            i = np.repeat(rows, counts)
+            first = np.cumsum(counts) - counts
+            j = np.arange(len(i)) - np.repeat(first - rows - 1, counts)
+            r = np.sqrt(((positions[j] - positions[i])**2).sum(1))
+            yield types[i], types[j], r
+            i1 = i2
 
     def get_waasmaier(self, symbol, s):
         """Scattering factor for free atoms."""
         if symbol == 'H':
             # XXXX implement analytical H
-            return 0
+            return 0 * s
         elif symbol in waasmaier:
             abc = waasmaier[symbol]
             f = abc[10]
-            s2 = s*s
+            s2 = s * s
             for i in range(5):
-                f += abc[2 * i] * exp(-abc[2 * i + 1] * s2)
+                f += abc[2 * i] * np.exp(-abc[2 * i + 1] * s2)
             return f
         if self.warn:
             print('<xrdebye::get_atomic> Element', symbol, 'not available')
-        return 0
+        return 0 * s
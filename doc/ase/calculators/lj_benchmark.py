@@ -0,0 +1,33 @@
+"""Time per MD step for the Lennard-Jones calculator versus system size.
+
+Usage: python lj_benchmark.py [maxatoms]
+"""
+from __future__ import print_function
+import sys
+import time
+
+from ase.build import bulk
+from ase.calculators.lj import LennardJones
+from ase.md.velocitydistribution import MaxwellBoltzmannDistribution
+from ase.md.verlet import VelocityVerlet
+from ase.units import fs, kB
+
+maxatoms = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+nsteps = 20
+
+print('   natoms  s/step  us/step/atom')
+n = 3
+while True:
+    atoms = bulk('Ar', 'fcc', a=5.26, cubic=True) * (n, n, n)
+    natoms = len(atoms)
+    if natoms > maxatoms:
+        break
+    atoms.calc = LennardJones(sigma=3.4, epsilon=0.0104, rc=8.5)
+    MaxwellBoltzmannDistribution(atoms, 50 * kB)
+    md = VelocityVerlet(atoms, 5 * fs)
+    md.run(1)  # build the neighbor list
+    t0 = time.time()
+    md.run(nsteps)
+    t = (time.time() - t0) / nsteps
+    print('{0:9d} {1:7.3f} {2:13.2f}'.format(natoms, t, t / natoms * 1e6))
+    n = int(n * 1.5 + 0.5)
@@ -0,0 +1,46 @@
+"""Run MD for many small clusters one at a time and as an ensemble.
+
+Usage: python md_ensemble_benchmark.py [nreplicas]
+"""
+from __future__ import print_function
+import sys
+import time
+
+from ase.calculators.emt import EMT
+from ase.calculators.lj import LennardJones
+from ase.calculators.morse import MorsePotential
+from ase.cluster import Icosahedron
+from ase.md import VelocityVerlet, Langevin
+from ase.md.ensemble import VelocityVerletEnsemble, LangevinEnsemble
+from ase.units import fs, kB
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+steps = 100
+
+
+def clusters(calc):
+    images = []
+    for seed in range(n):
+        atoms = Icosahedron('Cu', 2)
+        atoms.rattle(0.05, seed=seed)
+        atoms.calc = calc()
+        images.append(atoms)
+    return images
+
+
+print('calculator dynamics        one at a time ensemble  (seconds)')
+for calc in [EMT,
+             lambda: LennardJones(sigma=2.3),
+             lambda: MorsePotential(r0=2.5, rho0=5.0)]:
+    for dynamics, ensemble, args in [
+            (VelocityVerlet, VelocityVerletEnsemble, ()),
+            (Langevin, LangevinEnsemble, (300 * kB, 0.002))]:
+        t0 = time.time()
+        for atoms in clusters(calc):
+            dynamics(atoms, 5 * fs, *args).run(steps)
+        t1 = time.time()
+        ensemble(clusters(calc), 5 * fs, *args).run(steps)
+        t2 = time.time()
+        print('{0:10} {1:15} {2:13.2f} {3:8.2f}'.format(
+            calc().__class__.__name__[:10], dynamics.__name__,
+            t1 - t0, t2 - t1))
@@ -0,0 +1,36 @@
+"""Compare the time it takes to build a neighbor list with the two methods.
+
+Usage: python neighborlist_benchmark.py [maxatoms]
+"""
+from __future__ import print_function
+import sys
+import time
+
+from ase.build import bulk
+from ase.neighborlist import NeighborList
+
+maxatoms = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+maximages = 4000  # the 'images' method is O(N^2)
+
+print('   natoms   images    cells')
+n = 2
+while True:
+    atoms = bulk('Cu', 'fcc', a=3.6, orthorhombic=True) * (n, n, n)
+    # Skew the cell to make it a bit harder:
+    atoms.set_cell(atoms.cell + [[0, 0, 0], [0, 0, 0], atoms.cell[0] / 3],
+                   scale_atoms=True)
+    atoms.rattle(0.05)
+    natoms = len(atoms)
+    if natoms > maxatoms:
+        break
+    times = []
+    for method in ['images', 'cells']:
+        if method == 'images' and natoms > maximages:
+            times.append(float('nan'))
+            continue
+        nl = NeighborList([1.4] * natoms, skin=0.3, method=method)
+        t0 = time.time()
+        nl.update(atoms)
+        times.append(time.time() - t0)
+    print('{0:9d} {1:8.3f} {2:8.3f}'.format(natoms, *times))
+    n = int(n * 1.5 + 0.5)
@@ -0,0 +1,39 @@
+"""Relax many small clusters one at a time and in a batch.
+
+Usage: python optimize_batch_benchmark.py [nclusters]
+"""
+from __future__ import print_function
+import sys
+import time
+
+from ase.calculators.emt import EMT
+from ase.calculators.lj import LennardJones
+from ase.cluster import Icosahedron
+from ase.optimize import BFGS, FIRE
+from ase.optimize.batch import BatchOptimizer
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+
+def clusters(calc):
+    images = []
+    for seed in range(n):
+        atoms = Icosahedron('Cu', 2)
+        atoms.rattle(0.1, seed=seed)
+        atoms.calc = calc()
+        images.append(atoms)
+    return images
+
+
+print('calculator optimizer  one at a time    batch  (seconds)')
+for calc in [EMT, lambda: LennardJones(sigma=2.3)]:
+    for optimizer in [BFGS, FIRE]:
+        t0 = time.time()
+        for atoms in clusters(calc):
+            optimizer(atoms, logfile=None).run(fmax=0.05)
+        t1 = time.time()
+        BatchOptimizer(clusters(calc), optimizer, logfile=None).run(fmax=0.05)
+        t2 = time.time()
+        print('{0:10} {1:9} {2:14.2f} {3:8.2f}'.format(
+            calc().__class__.__name__[:10], optimizer.__name__,
+            t1 - t0, t2 - t1))
@@ -0,0 +1,34 @@
+"""Compare the time per step of BFGS and LowRankBFGS for growing slabs.
+
+Usage: python optimize_benchmark.py [maxatoms]
+"""
+from __future__ import print_function
+import sys
+import time
+
+from ase.build import fcc111
+from ase.calculators.emt import EMT
+from ase.constraints import FixAtoms
+from ase.optimize.bfgs import BFGS, LowRankBFGS
+
+maxatoms = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+nsteps = 20
+
+print('   natoms     BFGS  LowRank   (seconds per step)')
+n = 4
+while True:
+    natoms = n * n * 4
+    if natoms > maxatoms:
+        break
+    times = []
+    for optimizer in [BFGS, LowRankBFGS]:
+        atoms = fcc111('Cu', (n, n, 4), vacuum=5.0)
+        atoms.rattle(0.05, seed=42)
+        atoms.set_constraint(FixAtoms(indices=range(n * n)))
+        atoms.calc = EMT()
+        opt = optimizer(atoms, logfile=None)
+        t0 = time.time()
+        opt.run(fmax=0.0, steps=nsteps)
+        times.append((time.time() - t0) / nsteps)
+    print('{0:9d} {1:8.4f} {2:8.4f}'.format(natoms, *times))
+    n = int(n * 1.5 + 0.5)
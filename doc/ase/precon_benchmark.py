@@ -0,0 +1,51 @@
+"""Count force calculations with and without a preconditioner.
+
+Usage: python precon_benchmark.py [size]
+"""
+from __future__ import print_function
+import sys
+
+from ase.build import bulk, fcc111, add_adsorbate
+from ase.calculators.emt import EMT
+from ase.constraints import FixAtoms
+from ase.optimize import LBFGS
+from ase.optimize.precon import Exp
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+
+class CountingEMT(EMT):
+    ncalls = 0
+
+    def calculate(self, *args, **kwargs):
+        CountingEMT.ncalls += 1
+        EMT.calculate(self, *args, **kwargs)
+
+
+def vacancy():
+    atoms = bulk('Cu', cubic=True) * (n, n, n)
+    del atoms[0]
+    atoms.rattle(0.1, seed=1)
+    return atoms
+
+
+def slab():
+    atoms = fcc111('Cu', (2 * n, 2 * n, 4), vacuum=6.0)
+    atoms.set_constraint(FixAtoms(range(4 * n**2)))
+    add_adsorbate(atoms, 'Au', 2.0, 'ontop')
+    atoms.rattle(0.05, seed=2)
+    return atoms
+
+
+print('system  natoms optimizer  force calls (no precon, Exp)')
+for system in [vacancy, slab]:
+    ncalls = []
+    for precon in [None, Exp()]:
+        atoms = system()
+        atoms.calc = CountingEMT()
+        CountingEMT.ncalls = 0
+        LBFGS(atoms, logfile=None, maxstep=0.2,
+              precon=precon).run(fmax=1e-3)
+        ncalls.append(CountingEMT.ncalls)
+    print('{0:8}{1:6} {2:10} {3:6} {4:6}'.format(
+        system.__name__, len(atoms), 'LBFGS', *ncalls))
@@ -87,7 +87,7 @@ if 0:
     name = 'python-ase'
     
 scripts = ['tools/ase-gui', 'tools/ase-db', 'tools/ase-info',
-           'tools/ase-build', 'tools/ase-run']
+           'tools/ase-build', 'tools/ase-run', 'tools/ase-convert']
 # provide bat executables in the tarball and always for Win
 if 'sdist' in sys.argv or os.name in ['ce', 'nt']:
     for s in scripts[:]:
@@ -1,10 +1,11 @@
 #!/usr/bin/env python
-"""Bash completion for ase-db, ase-run, ase-build, ase-info and ase-gui.
+"""Bash completion for ase-db, ase-run, ase-build, ase-info, ase-convert
+and ase-gui.
 
 Put this in your .bashrc::
     
     complete -o default -C _ase_bash_complete.py ase-db ase-run \
-    ase-build ase-info ase-gui
+    ase-build ase-info ase-convert ase-gui
 """
 
 import os
@@ -59,6 +60,11 @@ elif command == 'ase-info':
         words = options('h', 'help')
     else:
         words = match(word, '.traj')
+elif command == 'ase-convert':
+    if word[:1] == '-':
+        words = options('hjopfcq',
+                        'help jobs output-directory pattern format '
+                        'chunk-size codecs quiet')
 else:  # ase-gui
     if word[:1] == '-':
         words = options(